@@ -0,0 +1,338 @@
+"""
+Charts — historical series for the Charts tab, sized to the pixels drawn.
+
+``TieredSeries`` keeps the rollups as dense tiers of column arrays (one bucket
+per step, zeros where nothing happened): the three rollup resolutions, plus
+5-minute and 6-hour tiers summed from them so no window needs more than a
+couple of points per pixel:
+
+    minute   60 s      last 2 days     from the minute rollups
+    5min     5 min     last 2 days     derived from minute
+    hour     1 h       last 90 days    from the hour rollups
+    6hour    6 h       last 90 days    derived from hour
+    day      local day all history     from the day rollups
+
+Tiers are refreshed incrementally, re-reading only the newest rollup buckets
+(and re-summing only the derived buckets over them), at most once a second.
+
+A chart request picks the finest tier that covers its window in at most
+``MAX_POINTS_PER_PIXEL`` points per pixel, slices the columns by bisection,
+derives keys/min, clicks/min and idle share, and reduces each to the chart's
+width with largest-triangle-three-buckets (``lttb``), which keeps the peaks
+and dips a plain average would flatten. Top apps are summed over the same
+slice. A request costs O(pixels), however long the history, so zooming and
+panning across 90 days fits in one frame.
+
+``layout`` turns a chart into canvas coordinates, so a client can do that
+work off its UI thread and only create the items on it.
+"""
+
+import bisect
+import datetime
+import threading
+import time
+from array import array
+from itertools import accumulate
+
+from activity_manager.rollups import APP_PREFIX, BUCKET_SECONDS, DAY, HOUR, MINUTE, RETENTION, day_start
+
+# tier name -> (rollup resolution, buckets of it per tier bucket), finest first
+TIERS = {
+    "minute": (MINUTE, 1),
+    "5min": (MINUTE, 5),
+    "hour": (HOUR, 1),
+    "6hour": (HOUR, 6),
+    "day": (DAY, 1),
+}
+MAX_POINTS_PER_PIXEL = 2
+REFRESH_INTERVAL = 1.0  # seconds a refresh is reused for
+
+# series name -> (metric, scale): value = bucket total * scale / bucket seconds
+SERIES = {
+    "keys_per_min": ("keys", 60),
+    "clicks_per_min": ("clicks", 60),
+    "idle_share": ("idle_seconds", 1),
+}
+
+
+def lttb(xs, ys, threshold):
+    """
+    Largest-triangle-three-buckets: ``threshold`` of the (xs, ys) points that best
+    keep the shape of the line (first and last always included). O(len(xs)).
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(xs), list(ys)
+    every = (n - 2) / (threshold - 2)
+    sum_x = [0, *accumulate(xs)]
+    sum_y = [0, *accumulate(ys)]
+    out_x, out_y = [xs[0]], [ys[0]]
+    ax, ay = xs[0], ys[0]
+    start = 1
+    for i in range(threshold - 2):
+        # The triangle's third vertex is the average of the next bucket; its area
+        # against (xs[j], ys[j]) is |dx * ys[j] + dy * xs[j] - c| (times two)
+        lo = int((i + 1) * every) + 1
+        hi = min(int((i + 2) * every) + 1, n)
+        dx = ax - (sum_x[hi] - sum_x[lo]) / (hi - lo)
+        dy = (sum_y[hi] - sum_y[lo]) / (hi - lo) - ay
+        c = dx * ay + dy * ax
+        best, best_area = start, -1.0
+        for j in range(start, lo):
+            area = abs(dx * ys[j] + dy * xs[j] - c)
+            if area > best_area:
+                best, best_area = j, area
+        ax, ay = xs[best], ys[best]
+        out_x.append(ax)
+        out_y.append(ay)
+        start = lo
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
+
+def _zeros(n):
+    return array("d", bytes(8 * n))
+
+
+class _Tier:
+    """
+    Dense columns for one tier: times[i] is the i-th bucket's start, held[i]
+    whether any rollup bucket fell in it (else it's a zero-filled gap). Columns
+    are only extended when written, so they may be shorter than times.
+    """
+
+    def __init__(self, name, resolution, factor):
+        self.name = name
+        self.resolution = resolution
+        self.factor = factor
+        step = BUCKET_SECONDS.get(resolution)
+        self.step = step * factor if step else None  # None: local days, 23 to 25 hours
+        self.clear()
+
+    def clear(self):
+        self.times = array("q")
+        self.held = array("b")
+        self.columns = {}  # metric -> array("d")
+
+    def align(self, t):
+        return t - t % self.step if self.step else day_start(t)
+
+    def _next(self, t):
+        return t + self.step if self.step else day_start(t + 36 * 3600)
+
+    def put(self, t, metrics):
+        """Set bucket ``t`` (existing, or after the last one, zero-filling the gap); returns its index."""
+        times = self.times
+        if times and t <= times[-1]:
+            i = bisect.bisect_left(times, t)
+        else:
+            if times:
+                gap = self._next(times[-1])
+                while gap < t:
+                    times.append(gap)
+                    self.held.append(0)
+                    gap = self._next(gap)
+            times.append(t)
+            self.held.append(0)
+            i = len(times) - 1
+        self.held[i] = 1
+        for metric, value in metrics.items():
+            column = self.columns.get(metric)
+            if column is None:
+                column = self.columns[metric] = array("d")
+            if len(column) <= i:
+                column.extend(_zeros(i + 1 - len(column)))
+            column[i] = value
+        return i
+
+    def trim(self, oldest):
+        """Drop the buckets ending by ``oldest``; returns how many held data."""
+        k = bisect.bisect_right(self.times, oldest) - 1 if self.times and self.times[0] <= oldest else 0
+        if k > 0 and self._next(self.times[k - 1]) > oldest:
+            k -= 1
+        dropped = sum(self.held[:k])
+        del self.times[:k]
+        del self.held[:k]
+        for column in self.columns.values():
+            del column[:k]
+        return dropped
+
+    def derive(self, source, start, single=False):
+        """
+        Re-sum this tier's buckets from the one holding ``start`` on (or, if
+        ``single``, only that one, in place) from ``source``'s columns.
+        """
+        lo = self.align(start)
+        if not single:
+            k = bisect.bisect_left(self.times, lo)
+            del self.times[k:]
+            del self.held[k:]
+            for column in self.columns.values():
+                del column[k:]
+        i = bisect.bisect_left(source.times, lo)
+        n = len(source.times)
+        while i < n:
+            t = self.align(source.times[i])
+            j = bisect.bisect_left(source.times, self._next(t), i)
+            if single or any(source.held[i:j]):
+                sums = dict.fromkeys(self.columns, 0.0) if single else {}
+                sums.update((metric, sum(column[i:j])) for metric, column in source.columns.items()
+                            if len(column) > i)
+                self.put(t, sums)
+            if single:
+                return
+            i = j
+
+    def column(self, metric, first, last):
+        values = self.columns.get(metric, array("d"))[first:last]
+        if len(values) < last - first:
+            values.extend(_zeros(last - first - len(values)))
+        return values
+
+    def lengths(self, first, last):
+        """Seconds in each bucket from ``first`` up to ``last``."""
+        if self.step:
+            return [self.step] * (last - first)
+        return [self._next(t) - t for t in self.times[first:last]]
+
+    def span(self, lo, hi):
+        """(first, last + 1) indices of the buckets overlapping [lo, hi)."""
+        times = self.times
+        first = max(bisect.bisect_right(times, lo) - 1, 0)
+        if first < len(times) and self._next(times[first]) <= lo:
+            first += 1
+        return first, max(first, bisect.bisect_left(times, hi))
+
+
+class TieredSeries:
+    def __init__(self, rollups):
+        """:param rollups: RollupEngine the tiers are built from"""
+        self.rollups = rollups
+        self.tiers = {name: _Tier(name, resolution, factor) for name, (resolution, factor) in TIERS.items()}
+        self._refreshed = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """Bring every tier up to date with the rollups, re-reading only the latest buckets."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._refreshed is not None and now - self._refreshed < REFRESH_INTERVAL:
+                return
+            self._refreshed = now
+            for tier in self.tiers.values():
+                if tier.factor == 1:
+                    source, oldest = tier, tier.times[0] if tier.times else None
+                    changed = self._update(tier)
+                    continue
+                if source.times and source.times[0] != oldest:
+                    # The rollups pruned the source: drop those buckets, re-sum the one it cut into
+                    tier.trim(source.times[0])
+                    tier.derive(source, source.times[0], single=True)
+                if changed is not None:
+                    tier.derive(source, changed)
+
+    def _update(self, tier):
+        """Update a tier read straight from the rollups; returns the first bucket start changed (or None)."""
+        oldest, present = self.rollups.extent(tier.resolution)
+        held = sum(tier.held)
+        if tier.times and oldest is not None and oldest > tier.times[0]:
+            held -= tier.trim(oldest)  # pruned by the rollups
+        since = tier.times[-1] if tier.times else 0
+        rows = self.rollups.query(tier.resolution, since, float("inf"))
+        added = sum(1 for t, _ in rows if not tier.times or t > tier.times[-1])
+        if present != held + added:
+            # Buckets filled in before the last one (or one added meanwhile): rebuild
+            tier.clear()
+            rows = self.rollups.query(tier.resolution, 0, float("inf"))
+        for t, metrics in rows:
+            tier.put(t, metrics)
+        return rows[0][0] if rows else None
+
+    def _pick(self, lo, hi, width, now):
+        """Finest tier that still holds ``lo`` and spans [lo, hi) in few enough points."""
+        for tier in self.tiers.values():
+            keep = RETENTION[tier.resolution]
+            if keep is not None and lo < now - keep:
+                continue
+            if (hi - lo) / (tier.step or 86400) <= width * MAX_POINTS_PER_PIXEL:
+                return tier
+        return self.tiers["day"]
+
+    def chart(self, lo, hi, width=800, top_apps=5, now=None):
+        """
+        Series over [lo, hi) downsampled to ``width`` points.
+
+        :return: {"start", "end", "tier", "series": {name: [times, values]},
+                  "apps": [[app, seconds], ...] (most used first)}
+        """
+        now = time.time() if now is None else now
+        self.refresh()
+        with self._lock:
+            tier = self._pick(lo, hi, width, now)
+            first, last = tier.span(lo, hi)
+            times = tier.times[first:last].tolist()
+            lengths = tier.lengths(first, last)
+            if lengths and times[-1] + lengths[-1] > now:
+                lengths[-1] = max(1.0, now - times[-1])  # the current bucket, still filling
+            series = {}
+            for name, (metric, scale) in SERIES.items():
+                ys = [v * scale / n for v, n in zip(tier.column(metric, first, last), lengths)]
+                xs, ys = lttb(times, ys, width)
+                series[name] = [xs, [round(y, 3) for y in ys]]
+            apps = [(metric[len(APP_PREFIX):], sum(column[first:last]))
+                    for metric, column in tier.columns.items() if metric.startswith(APP_PREFIX)]
+        apps = sorted((app for app in apps if app[1] > 0), key=lambda app: app[1], reverse=True)
+        return {"start": lo, "end": hi, "tier": tier.name, "series": series,
+                "apps": [[name, round(seconds, 1)] for name, seconds in apps[:top_apps]]}
+
+
+# ---- Layout -----------------------------------------------------------------
+PANELS = (("keys_per_min", "keys/min"), ("clicks_per_min", "clicks/min"), ("idle_share", "idle share"))
+
+
+def layout(chart, width, height, margin=40):
+    """
+    Canvas drawing operations for a chart, as plain tuples:
+
+        ("line", series, [x0, y0, x1, y1, ...])   one series in its panel
+        ("text", x, y, text, anchor)              labels
+        ("rect", x0, y0, x1, y1)                  a top-apps bar
+
+    Three line panels stacked above a bar panel of top apps; the series are
+    expected at about ``width - 2 * margin`` points.
+    """
+    ops = []
+    lo, hi = chart["start"], chart["end"]
+    span = (hi - lo) or 1
+    plot_w = max(1, width - 2 * margin)
+    panel_h = (height - margin) / (len(PANELS) + 1)
+    for p, (name, label) in enumerate(PANELS):
+        top = p * panel_h + 20
+        bottom = top + panel_h - 20
+        xs, ys = chart["series"][name]
+        peak = max(ys, default=0) or 1
+        coords = []
+        for t, v in zip(xs, ys):
+            coords.append(margin + (t - lo) / span * plot_w)
+            coords.append(bottom - v / peak * (bottom - top))
+        if len(coords) >= 4:
+            ops.append(("line", name, coords))
+        ops.append(("text", margin, top, f"{label} (max {peak:,.4g})", "sw"))
+
+    top = len(PANELS) * panel_h + 20
+    apps = chart["apps"]
+    if apps:
+        longest = apps[0][1] or 1
+        bar_h = (panel_h - 20) / len(apps)
+        for i, (app, seconds) in enumerate(apps):
+            y = top + i * bar_h
+            ops.append(("rect", margin + 140, y + 2, margin + 140 + seconds / longest * (plot_w - 140),
+                        y + bar_h - 2))
+            ops.append(("text", margin, y + bar_h / 2, f"{str(app)[:16]} {seconds / 3600:.1f}h", "w"))
+
+    fmt = "%b %d %H:%M" if span < 7 * 86400 else "%b %d"
+    ops.append(("text", margin, height - margin / 2, datetime.datetime.fromtimestamp(lo).strftime(fmt), "w"))
+    ops.append(("text", width - margin, height - margin / 2,
+                datetime.datetime.fromtimestamp(hi).strftime(fmt) + f"  ({chart['tier']} buckets)", "e"))
+    return ops
@@ -0,0 +1,216 @@
+"""
+Sync Collector — reference server merging delta batches from many devices.
+
+Accepts the compressed batches SyncClient posts (see sync.py) on ``/sync`` and
+merges each one into SQLite in a single transaction, keyed by device:
+
+    rollups   (device, resolution, bucket, metric) -> value   replaced (values are absolute)
+    sessions  (device, start) -> end, app_name, bundle_id     replaced
+    idle      (device, start) -> end                          replaced
+    devices   device -> last batch, last seen
+
+so a batch applied twice leaves the same rows. A batch numbered below the
+device's last one is a stale duplicate (a retry overtaken by later batches)
+and is acknowledged without applying it. ``GET /devices`` lists the devices.
+
+Plain HTTP on localhost by default; put it behind TLS to collect over a network.
+
+    python -m activity_manager.collector --db logs/collector.db --port 8765
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_BODY = 16 * 1024 * 1024     # compressed bytes accepted per batch
+MAX_PAYLOAD = 256 * 1024 * 1024  # bytes a batch may decompress to
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rollups (
+        device TEXT NOT NULL,
+        resolution TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        metric TEXT NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (device, resolution, bucket, metric)
+    );
+    CREATE TABLE IF NOT EXISTS sessions (
+        device TEXT NOT NULL,
+        start REAL NOT NULL,
+        end REAL NOT NULL,
+        app_name TEXT,
+        bundle_id TEXT,
+        PRIMARY KEY (device, start)
+    );
+    CREATE TABLE IF NOT EXISTS idle (
+        device TEXT NOT NULL,
+        start REAL NOT NULL,
+        end REAL NOT NULL,
+        PRIMARY KEY (device, start)
+    );
+    CREATE TABLE IF NOT EXISTS devices (
+        device TEXT PRIMARY KEY,
+        last_batch INTEGER NOT NULL,
+        last_seen REAL NOT NULL
+    );
+"""
+
+
+class PayloadError(ValueError):
+    """A batch that can't be decoded or doesn't have the expected shape."""
+
+
+def decode(body, encoding=None):
+    """Compressed (``encoding`` "deflate") or plain JSON request body -> batch dict."""
+    if encoding == "deflate":
+        inflater = zlib.decompressobj()
+        try:
+            body = inflater.decompress(body, MAX_PAYLOAD)
+        except zlib.error as e:
+            raise PayloadError(f"Bad compressed body: {e}") from e
+        if inflater.unconsumed_tail:
+            raise PayloadError("Batch too large")
+    elif encoding not in (None, "identity"):
+        raise PayloadError(f"Unsupported Content-Encoding: {encoding}")
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise PayloadError(f"Bad JSON: {e}") from e
+    if not isinstance(payload, dict) or not isinstance(payload.get("device"), str) \
+            or not isinstance(payload.get("batch"), int):
+        raise PayloadError("Batch needs a device id and a batch number")
+    return payload
+
+
+class Collector:
+    def __init__(self, path="logs/collector.db"):
+        """:param path: SQLite database the batches are merged into"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._lock = threading.Lock()  # one merge at a time, so batch order checks hold
+
+    def merge(self, payload):
+        """Apply one decoded batch; returns {"rollups", "sessions", "idle"} row counts (or "stale")."""
+        device, batch = payload["device"], payload["batch"]
+        try:
+            rollups = [(device, res, bucket, metric, value)
+                       for res, bucket, metric, value in payload.get("rollups", ())]
+            sessions = [(device, start, end, app, bundle)
+                        for start, end, app, bundle in payload.get("sessions", ())]
+            idle = [(device, start, end) for start, end in payload.get("idle", ())]
+        except (TypeError, ValueError) as e:
+            raise PayloadError(f"Bad rows: {e}") from e
+
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT last_batch FROM devices WHERE device = ?", (device,)).fetchone()
+            if row is not None and batch < row[0]:
+                return {"stale": True}
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO rollups (device, resolution, bucket, metric, value) VALUES (?, ?, ?, ?, ?)",
+                rollups,
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO sessions (device, start, end, app_name, bundle_id) VALUES (?, ?, ?, ?, ?)",
+                sessions,
+            )
+            self.conn.executemany("INSERT OR REPLACE INTO idle (device, start, end) VALUES (?, ?, ?)", idle)
+            self.conn.execute("INSERT OR REPLACE INTO devices (device, last_batch, last_seen) VALUES (?, ?, ?)",
+                              (device, batch, time.time()))
+        return {"rollups": len(rollups), "sessions": len(sessions), "idle": len(idle)}
+
+    def devices(self):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT device, last_batch, last_seen FROM devices ORDER BY device").fetchall()
+        return [{"device": device, "last_batch": batch, "last_seen": seen} for device, batch, seen in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ActivityCollector/1"
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        token = self.server.token
+        return token is None or self.headers.get("Authorization") == f"Bearer {token}"
+
+    def do_POST(self):
+        if self.path != "/sync":
+            return self._reply(404, {"error": "not found"})
+        if not self._authorized():
+            return self._reply(401, {"error": "unauthorized"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self.close_connection = True
+            return self._reply(413, {"error": "batch too large"})
+        body = self.rfile.read(length)
+        try:
+            result = self.server.collector.merge(decode(body, self.headers.get("Content-Encoding")))
+        except PayloadError as e:
+            return self._reply(400, {"error": str(e)})
+        self._reply(200, result)
+
+    def do_GET(self):
+        if self.path != "/devices":
+            return self._reply(404, {"error": "not found"})
+        if not self._authorized():
+            return self._reply(401, {"error": "unauthorized"})
+        self._reply(200, self.server.collector.devices())
+
+    def log_message(self, format, *args):
+        pass  # one line per batch would drown the console
+
+
+def serve(collector, host="127.0.0.1", port=8765, token=None):
+    """An HTTP server (not yet serving) merging into ``collector``; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.collector = collector
+    server.token = token
+    return server
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Collect delta syncs from many devices into SQLite.")
+    parser.add_argument("--db", default="logs/collector.db", help="SQLite database to merge into")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", help="bearer token clients must send")
+    args = parser.parse_args()
+
+    collector = Collector(args.db)
+    server = serve(collector, args.host, args.port, args.token)
+    print(f"[Collector] Listening on http://{args.host}:{server.server_address[1]}/sync")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        collector.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Capture Daemon — headless owner of the TrackerManager.
+
+Capture, storage and rollups run here, independently of any GUI: a slow or
+crashed client never stalls the event-tap callbacks, and closing the window
+loses nothing. Clients attach over a Unix domain socket (see ipc.py for the
+protocol) and detach at will.
+
+One thread serves every client with a selector loop. Each ``tick`` it builds,
+per subscribed client, a single ``update`` frame holding only what changed
+since that client's previous frame (snapshot fields, event counts from the
+metrics registry, today's rollup totals), and skips clients whose previous
+frame hasn't drained yet, so a slow client is coalesced rather than buffered.
+Calls that may load history from storage (``SLOW_METHODS``) run one at a time
+on a worker thread; their replies are handed back to the loop, so updates keep
+flowing to every client meanwhile.
+The serving thread is a worker: the main thread runs the Cocoa run loop, which
+NSWorkspace needs to deliver app activation notifications.
+
+    python daemon.py [--socket logs/activity.sock] [--trackers keyboard,mouse,app,idle]
+"""
+
+import os
+import selectors
+import signal
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from activity_manager.ipc import DEFAULT_SOCKET, FrameReader, encode, snapshot_fields
+from activity_manager.trackers.event_source import EVENT_COUNTERS
+
+# TrackerManager methods clients may call
+METHODS = {
+    "get_stats", "get_rollups", "get_metrics", "get_pipeline_stats", "get_dashboard_data",
+    "get_enabled_trackers", "start_tracker", "stop_tracker", "get_app_activity", "get_timeline",
+    "get_chart",
+}
+# Of those, the ones that may read history from storage: not run on the serving thread
+SLOW_METHODS = {"get_app_activity", "get_timeline", "get_chart"}
+MAX_PENDING = 1024 * 1024  # bytes queued for one client before it is disconnected
+
+
+class _Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = FrameReader()
+        self.out = bytearray()
+        self.events = False
+        self.rollups = False
+        self.subscribed = False
+        self.snapshot = {}  # fields last sent
+        self.counters = {}  # event counters last sent
+        self.totals = {}    # rollup totals last sent
+
+
+class CaptureDaemon:
+    def __init__(self, manager, socket_path=DEFAULT_SOCKET, tick=0.1, rollup_interval=1.0):
+        """
+        :param manager: TrackerManager doing the capture
+        :param socket_path: Unix domain socket clients connect to (created mode 0600)
+        :param tick: how often (in seconds) subscribers are sent their updates
+        :param rollup_interval: how often (in seconds) today's rollup totals are recomputed
+        """
+        self.manager = manager
+        self.socket_path = socket_path
+        self.tick = tick
+        self.rollup_interval = rollup_interval
+        self.clients = {}  # socket -> _Client
+        self.running = False
+        self._selector = selectors.DefaultSelector()
+        self._listener = None
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._calls = ThreadPoolExecutor(max_workers=1, thread_name_prefix="CaptureDaemon-call")
+        self._replies = deque()  # (client, reply) of finished slow calls, sent by the loop
+        self._totals = {}
+        self._totals_at = 0.0
+
+        manager.metrics.gauge("ipc.clients", lambda: len(self.clients))
+
+    # ---- Lifecycle --------------------------------------------------------
+    def _listen(self):
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)  # stale socket from a daemon that died
+            else:
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            finally:
+                probe.close()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        listener.listen()
+        listener.setblocking(False)
+        self._listener = listener
+        self._selector.register(listener, selectors.EVENT_READ, "accept")
+        self._selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+
+    def serve_forever(self):
+        """Serve clients until ``stop()``."""
+        self._listen()
+        self.running = True
+        print(f"[CaptureDaemon] Listening on {self.socket_path}")
+        next_tick = time.monotonic() + self.tick
+        try:
+            while self.running:
+                timeout = max(0.0, next_tick - time.monotonic())
+                for key, mask in self._selector.select(timeout):
+                    if key.data == "accept":
+                        self._accept()
+                    elif key.data == "wake":
+                        self._wake_r.recv(64)
+                        self._send_replies()
+                    else:
+                        if mask & selectors.EVENT_READ:
+                            self._read(key.data)
+                        if mask & selectors.EVENT_WRITE:
+                            self._flush(key.data)
+                if time.monotonic() >= next_tick:
+                    self._publish()
+                    next_tick = time.monotonic() + self.tick
+        finally:
+            self._shutdown()
+
+    def stop(self):
+        """Ask the serving loop to exit (safe from signal handlers and other threads)."""
+        self.running = False
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _shutdown(self):
+        self._calls.shutdown(wait=False, cancel_futures=True)
+        for client in list(self.clients.values()):
+            self._drop(client)
+        if self._listener is not None:
+            self._selector.unregister(self._listener)
+            self._listener.close()
+            self._listener = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+        self._selector.close()
+        print("[CaptureDaemon] Stopped.")
+
+    # ---- Connections ------------------------------------------------------
+    def _accept(self):
+        try:
+            sock, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        client = self.clients[sock] = _Client(sock)
+        self._selector.register(sock, selectors.EVENT_READ, client)
+
+    def _drop(self, client):
+        self.clients.pop(client.sock, None)
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(client)
+            return
+        try:
+            messages = client.reader.feed(data)
+        except ValueError as e:
+            print(f"[CaptureDaemon] ERROR: Bad frame from client: {e}")
+            self._drop(client)
+            return
+        for message in messages:
+            self._handle(client, message)
+
+    def _send(self, client, message):
+        frame = encode(message)
+        self.manager.metrics.count("ipc.bytes_sent", len(frame))
+        client.out += frame
+        if len(client.out) > MAX_PENDING:
+            print("[CaptureDaemon] Client stopped reading; disconnecting it.")
+            self._drop(client)
+            return
+        self._flush(client)
+
+    def _flush(self, client):
+        if client.sock not in self.clients:
+            return
+        try:
+            sent = client.sock.send(client.out)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self._drop(client)
+            return
+        del client.out[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.out else 0)
+        self._selector.modify(client.sock, events, client)
+
+    # ---- Requests ---------------------------------------------------------
+    def _handle(self, client, message):
+        op = message.get("op")
+        if op == "subscribe":
+            client.subscribed = True
+            client.events = bool(message.get("events", True))
+            client.rollups = bool(message.get("rollups", True))
+            client.snapshot, client.counters, client.totals = {}, self._counters(), {}
+        elif op == "unsubscribe":
+            client.subscribed = False
+        elif op == "snapshot":
+            snapshot = self.manager.get_snapshot()
+            self._send(client, {"op": "snapshot", "id": message.get("id"), "v": snapshot.version,
+                                "snapshot": snapshot_fields(snapshot)})
+        elif op == "call":
+            if message.get("method") in SLOW_METHODS:
+                future = self._calls.submit(self._call, message)
+                future.add_done_callback(lambda f: f.cancelled() or self._reply_later(client, f.result()))
+            else:
+                self._send(client, self._call(message))
+        else:
+            self._send(client, {"op": "reply", "id": message.get("id"), "error": f"unknown op {op!r}"})
+
+    def _call(self, message):
+        """Run a requested TrackerManager method; returns the reply."""
+        reply = {"op": "reply", "id": message.get("id")}
+        method = message.get("method")
+        if method not in METHODS:
+            reply["error"] = f"unknown method {method!r}"
+        else:
+            try:
+                result = getattr(self.manager, method)(*message.get("args", ()))
+                reply["result"] = None if method in ("start_tracker", "stop_tracker") else result
+            except Exception as e:
+                reply["error"] = f"{type(e).__name__}: {e}"
+        return reply
+
+    def _reply_later(self, client, reply):
+        """Worker thread: queue a finished call's reply for the serving loop."""
+        self._replies.append((client, reply))
+        self._wake()
+
+    def _send_replies(self):
+        while self._replies:
+            client, reply = self._replies.popleft()
+            if self.clients.get(client.sock) is client:  # still connected
+                self._send(client, reply)
+
+    # ---- Update stream ----------------------------------------------------
+    def _counters(self):
+        counters = self.manager.metrics.counters
+        return {kind: counters.get(name, 0) for kind, name in EVENT_COUNTERS.items()}
+
+    def _publish(self):
+        """Send each subscribed client one frame with what changed since its last frame."""
+        subscribers = [c for c in self.clients.values() if c.subscribed]
+        if not subscribers:
+            return
+        snapshot = self.manager.get_snapshot()
+        fields = snapshot_fields(snapshot)
+        counters = self._counters()
+        totals = None
+        if any(c.rollups for c in subscribers):
+            now = time.monotonic()
+            if now - self._totals_at >= self.rollup_interval:
+                self._totals = self.manager.get_rollups(days=1)
+                self._totals_at = now
+            totals = self._totals
+
+        for client in subscribers:
+            if client.out:
+                continue  # previous frame still draining; this tick folds into the next one
+            update = {}
+            changed = {k: v for k, v in fields.items() if client.snapshot.get(k) != v}
+            if changed:
+                update["snapshot"] = changed
+                client.snapshot = fields
+            if client.events:
+                deltas = {k: v - client.counters.get(k, 0) for k, v in counters.items()
+                          if v != client.counters.get(k, 0)}
+                if deltas:
+                    update["events"] = deltas
+                    client.counters = counters
+            if client.rollups and totals is not None:
+                changed = {k: v for k, v in totals.items() if client.totals.get(k) != v}
+                if changed:
+                    update["rollups"] = changed
+                    client.totals = totals
+            if update:
+                update["op"] = "update"
+                update["v"] = snapshot.version
+                self._send(client, update)
+
+
+def run_main_loop(thread, interval=0.5):
+    """
+    Run the Cocoa run loop on the (main) calling thread until ``thread`` exits.
+
+    NSWorkspace only delivers app activation notifications, and keeps
+    ``frontmostApplication()`` current, while the main thread's run loop runs.
+    Without AppKit this just waits for the thread.
+    """
+    try:
+        from Foundation import NSDate, NSDefaultRunLoopMode, NSRunLoop
+    except ImportError:
+        run_loop = None
+    else:
+        run_loop = NSRunLoop.currentRunLoop()
+    while thread.is_alive():
+        # Returns at least every ``interval`` so signal handlers get to run
+        if run_loop is None or not run_loop.runMode_beforeDate_(
+                NSDefaultRunLoopMode, NSDate.dateWithTimeIntervalSinceNow_(interval)):
+            thread.join(interval)  # no run loop, or nothing attached to it yet
+
+
+def main():
+    import argparse
+
+    from activity_manager.storage.segments import LogRotation
+    from activity_manager.storage.wal_ring import FSYNC_POLICIES
+    from activity_manager.tracker_manager import TrackerManager
+    from activity_manager.trackers.registry import DEFAULT_TRACKERS
+
+    parser = argparse.ArgumentParser(description="Headless Activity Manager capture daemon.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix domain socket path")
+    parser.add_argument("--trackers", default=",".join(DEFAULT_TRACKERS),
+                        help="comma-separated trackers to enable")
+    parser.add_argument("--storage-mode", default="file", choices=("file", "sqlite", "binary"))
+    parser.add_argument("--storage-path", default="logs/activity.log")
+    parser.add_argument("--tick", type=float, default=0.1, help="seconds between client updates")
+    parser.add_argument("--wal-fsync", default="interval", choices=FSYNC_POLICIES,
+                        help="when storage is fsync'ed and the write-ahead ring checkpointed")
+    parser.add_argument("--sync-url", help="collector to sync rollups and sessions to, "
+                                           "e.g. http://127.0.0.1:8765/sync")
+    parser.add_argument("--sync-token", help="bearer token the collector expects")
+    parser.add_argument("--retention-days", type=int,
+                        help="delete sealed log segments older than this (default: keep everything)")
+    args = parser.parse_args()
+
+    trackers = [name for name in args.trackers.split(",") if name]
+    manager = TrackerManager(storage_mode=args.storage_mode, storage_path=args.storage_path,
+                             trackers=trackers, refresh_interval=args.tick, wal_fsync=args.wal_fsync,
+                             rotation=LogRotation(retention_days=args.retention_days),
+                             sync_url=args.sync_url, sync_token=args.sync_token)
+    daemon = CaptureDaemon(manager, socket_path=args.socket, tick=args.tick)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+
+    errors = []
+
+    def serve():
+        try:
+            daemon.serve_forever()
+        except BaseException as e:
+            errors.append(e)
+
+    server = threading.Thread(target=serve, name="CaptureDaemon", daemon=True)
+    server.start()
+    try:
+        run_main_loop(server)
+    finally:
+        daemon.stop()
+        server.join()
+        manager.close()
+    if errors:
+        raise errors[0]
+
+
+if __name__ == "__main__":
+    main()
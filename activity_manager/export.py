@@ -0,0 +1,185 @@
+"""
+Report Export — streaming CSV and PDF summaries of stored activity.
+
+Every day is aggregated independently in a worker process that streams its
+events straight from storage (``read_events``), so memory stays flat however
+long the history is. CSV rows are written as days complete, in date order;
+the PDF summarizes the same per-day rows.
+
+Interval events (app sessions, idle periods) count towards the day they end in.
+"""
+
+import csv
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from activity_manager.storage.storage_manager import read_events
+
+FIELDS = [
+    "date", "keys", "clicks", "scrolls", "mouse_moves", "idle_seconds", "app_switches",
+    "first_activity", "last_activity", "top_apps",
+]
+TOP_APPS = 5
+
+
+def aggregate_day(mode, path, day, key=None):
+    """Aggregate one local day of stored events into a CSV row dict (runs in a worker)."""
+    start = datetime.datetime.combine(day, datetime.time())
+    end = start + datetime.timedelta(days=1)
+
+    counts = {"key": 0, "click": 0, "scroll": 0, "app_switch": 0}
+    moves = 0
+    idle = 0.0
+    apps = {}
+    first = last = None
+    for event in read_events(mode, path, start, end, key=key):
+        kind = event["type"]
+        details = event["details"] or {}
+        if kind in counts:
+            counts[kind] += details.get("count", 1)
+        elif kind == "mouse_moves":
+            moves += details.get("count", 0)
+        elif kind == "idle":
+            idle += details.get("duration", 0)
+        elif kind == "app_session":
+            name = details.get("app_name")
+            apps[name] = apps.get(name, 0) + details.get("duration", 0)
+        if first is None:
+            first = event["time"]
+        last = event["time"]
+
+    top = sorted(apps.items(), key=lambda item: item[1], reverse=True)[:TOP_APPS]
+    return {
+        "date": day.isoformat(),
+        "keys": counts["key"],
+        "clicks": counts["click"],
+        "scrolls": counts["scroll"],
+        "mouse_moves": moves,
+        "idle_seconds": round(idle, 1),
+        "app_switches": counts["app_switch"],
+        "first_activity": first[11:19] if first else "",
+        "last_activity": last[11:19] if last else "",
+        "top_apps": "; ".join(f"{name}={seconds:.0f}s" for name, seconds in top),
+    }
+
+
+def days_between(start, end):
+    """Local dates in [start, end)."""
+    day = _to_date(start)
+    end = _to_date(end)
+    while day < end:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+def export_report(mode, path, start, end, csv_path, pdf_path=None, workers=None, key=None):
+    """
+    Export one row per day in [start, end) to ``csv_path`` (and a PDF summary).
+
+    :param mode: storage mode ("file", "sqlite" or "binary")
+    :param path: storage path
+    :param start: first day (date, datetime or ISO string)
+    :param end: day after the last one (exclusive)
+    :param workers: worker processes (None = one per core, 1 = aggregate in-process)
+    :param key: encryption key (bytes) if the storage is encrypted
+    :return: number of days exported
+    """
+    days = list(days_between(start, end))
+    rows = []
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        if workers == 1:
+            results = map(aggregate_day, repeat(mode), repeat(path), days, repeat(key))
+            _write_rows(writer, f, results, rows)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(aggregate_day, repeat(mode), repeat(path), days, repeat(key))
+                _write_rows(writer, f, results, rows)
+
+    if pdf_path:
+        write_pdf_summary(pdf_path, rows, days[0] if days else None, days[-1] if days else None)
+    return len(rows)
+
+
+def _write_rows(writer, f, results, rows):
+    for row in results:
+        writer.writerow(row)
+        f.flush()
+        rows.append(row)
+
+
+def _to_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+# ---- PDF summary ----------------------------------------------------------
+LINES_PER_PAGE = 60
+
+
+def write_pdf_summary(pdf_path, rows, first_day, last_day):
+    """Render totals and a per-day table as a plain, dependency-free PDF."""
+    totals = {key: sum(row[key] for row in rows)
+              for key in ("keys", "clicks", "scrolls", "mouse_moves", "idle_seconds", "app_switches")}
+    lines = [
+        "Activity Manager report",
+        f"{first_day} to {last_day} ({len(rows)} days)" if rows else "No days in range",
+        "",
+        f"Keys: {totals['keys']:,}   Clicks: {totals['clicks']:,}   Scrolls: {totals['scrolls']:,}",
+        f"Mouse moves: {totals['mouse_moves']:,}   Idle: {totals['idle_seconds'] / 3600:.1f} h   "
+        f"App switches: {totals['app_switches']:,}",
+        "",
+        f"{'Date':<12}{'Keys':>9}{'Clicks':>8}{'Scrolls':>8}{'Moves':>10}{'Idle h':>8}  Top app",
+    ]
+    for row in rows:
+        top_app = row["top_apps"].split(";")[0]
+        lines.append(f"{row['date']:<12}{row['keys']:>9}{row['clicks']:>8}{row['scrolls']:>8}"
+                     f"{row['mouse_moves']:>10}{row['idle_seconds'] / 3600:>8.1f}  {top_app}")
+    _write_pdf(pdf_path, lines)
+
+
+def _write_pdf(path, lines):
+    """Minimal PDF 1.4: Letter pages of Courier text, LINES_PER_PAGE lines each."""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    objects = []  # object bodies; object n is objects[n - 1]
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    page_tree = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>")
+    kids = []
+    for page in pages:
+        text = ["BT /F1 9 Tf 11 TL 40 760 Td"]
+        for line in page:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            text.append(f"({escaped}) '")
+        text.append("ET")
+        stream = "\n".join(text).encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (page_tree, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    objects[page_tree - 1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids)
+                              + b"] /Count %d >>" % len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
@@ -1,22 +1,177 @@
 """
 Graphical User Interface for Activity Manager.
 Built with ttkbootstrap (modern Tkinter styling).
+
+The GUI is a thin client of the capture daemon (daemon.py): it attaches over
+the daemon's socket, starting the daemon if none is running, and renders the
+snapshots streamed to it. Closing the window only detaches; capture goes on.
+
+Charts, history and metrics are fetched (and charts laid out), and trackers
+toggled, on worker threads with their own daemon connections; the Tk loop only
+applies the results, so zooming, panning, switching tabs and ticking Settings
+boxes never wait on the daemon.
 """
 
+import datetime
+import os
+import subprocess
+import sys
+import threading
+import time
+
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 
-from activity_manager.tracker_manager import TrackerManager
+from activity_manager.ipc import DEFAULT_SOCKET, DaemonClient
+from activity_manager.trackers.registry import DEFAULT_TRACKERS, available_trackers
+
+ATTACH_POLL_MS = 50  # how often the socket is retried while a daemon we started comes up
+
+# History tab window -> (hours, days) arguments of TrackerManager.get_app_activity
+HISTORY_WINDOWS = {"Last hour": (1, None), "Today": (None, 1), "Last 7 days": (None, 7)}
+HISTORY_REFRESH = 5.0  # seconds between history fetches while the tab is visible
+
+# Charts tab window -> seconds before now; the wheel zooms and dragging pans from there
+CHART_WINDOWS = {"Last 6 hours": 6 * 3600, "Last 2 days": 2 * 86400, "Last 30 days": 30 * 86400,
+                 "Last 90 days": 90 * 86400}
+CHART_SPAN = (600, 400 * 86400)  # narrowest and widest zoom, in seconds
+CHART_MARGIN = 40
+CHART_COLORS = {"keys_per_min": "#2780e3", "clicks_per_min": "#ff7518", "idle_share": "#868e96"}
+CHART_POLL_MS = 16  # how often a pending worker result is checked for, about once a frame
+
+
+class DaemonWorker:
+    """
+    Serves requests to the daemon on its own thread and connection, so the Tk
+    loop never waits on IPC. Only the newest request is served; those it
+    overtook are dropped. Subclasses implement ``fetch``.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self._request = None
+        self._result = None  # (value, error)
+        self._busy = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def request(self, *request):
+        with self._lock:
+            self._request = request
+        self._wake.set()
+
+    def take(self):
+        """The newest finished (value, error), or None."""
+        with self._lock:
+            result, self._result = self._result, None
+        return result
+
+    @property
+    def idle(self):
+        with self._lock:
+            return self._request is None and not self._busy and self._result is None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        if self.thread:
+            self.thread.join()
+
+    def fetch(self, client, *request):
+        raise NotImplementedError
+
+    def _run(self):
+        client = None
+        while self.running:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                request, self._request = self._request, None
+                self._busy = request is not None
+            if request is None:
+                continue
+            try:
+                if client is None:
+                    client = DaemonClient(self.socket_path).connect()
+                result = (self.fetch(client, *request), None)
+            except (OSError, TimeoutError, RuntimeError) as e:
+                if client is not None:
+                    client.close()
+                    client = None
+                result = (None, str(e))
+            with self._lock:
+                self._result = result
+                self._busy = False
+        if client is not None:
+            client.close()
+
+
+class ChartWorker(DaemonWorker):
+    """Fetches a chart window and lays it out: request(start, end, width, height)."""
+
+    def fetch(self, client, start, end, width, height):
+        from activity_manager.charts import layout
+
+        chart = client.call("get_chart", start, end, max(1, width - 2 * CHART_MARGIN))
+        return layout(chart, width, height, CHART_MARGIN)
+
+
+class HistoryWorker(DaemonWorker):
+    """Fetches per-app activity and sessions: request(hours, days)."""
+
+    def fetch(self, client, hours, days):
+        return client.call("get_app_activity", hours, days), client.call("get_timeline", hours, days)
+
+
+class MetricsWorker(DaemonWorker):
+    """Fetches the daemon's metrics snapshot: request()."""
+
+    def fetch(self, client):
+        return client.call("get_metrics")
+
+
+class TrackerWorker(DaemonWorker):
+    """
+    Starts and stops trackers until the daemon runs the wanted set: request({name: enabled}).
+    The whole set is sent, so a toggle overtaken by a newer one is not lost. Returns
+    the trackers enabled afterwards.
+    """
+
+    def fetch(self, client, wanted):
+        enabled = set(client.call("get_enabled_trackers"))
+        for name, on in wanted.items():
+            if on != (name in enabled):
+                client.call("start_tracker" if on else "stop_tracker", name)
+        return set(client.call("get_enabled_trackers"))
 
 
 class ActivityManagerApp:
-    def __init__(self):
+    def __init__(self, refresh_ms=1000, trackers=DEFAULT_TRACKERS, socket_path=DEFAULT_SOCKET):
+        """
+        :param refresh_ms: dashboard refresh period in milliseconds
+        :param trackers: trackers enabled when the daemon has to be started
+                         (toggled at runtime in Settings)
+        :param socket_path: Unix domain socket of the capture daemon
+        """
         self.root = ttk.Window(themename="cosmo")
         self.root.title("Activity Manager")
         self.root.geometry("900x600")
+        self.refresh_ms = refresh_ms
+        self.initial_trackers = tuple(trackers)
+        self.socket_path = socket_path
 
-        # Tracker Manager (handles all trackers)
-        self.manager = TrackerManager()
+        # Connection to the capture daemon; attached once the window has painted
+        self.client = None
+        self._attaching = False  # waiting for a daemon we started
+        self._shown = None  # last snapshot rendered
 
         # Tabs
         self.notebook = ttk.Notebook(self.root)
@@ -41,6 +196,9 @@ class ActivityManagerApp:
         self.idle_time_label = ttk.Label(self.dashboard, text="Idle Time: -", font=("Segoe UI", 12))
         self.idle_time_label.pack(pady=10)
 
+        self.daemon_label = ttk.Label(self.dashboard, text="Daemon: detached", font=("Segoe UI", 10))
+        self.daemon_label.pack(side=BOTTOM, pady=10)
+
         # Settings tab
         self.settings = ttk.Frame(self.notebook)
         self.notebook.add(self.settings, text="Settings")
@@ -48,34 +206,360 @@ class ActivityManagerApp:
         self.file_path_label = ttk.Label(self.settings, text="Log File Location: logs/keystrokes.log")
         self.file_path_label.pack(pady=10)
 
-        # Polling update
+        ttk.Label(self.settings, text="Trackers", font=("Segoe UI", 12)).pack(pady=(20, 5))
+        self.tracker_vars = {}
+        for name in available_trackers():
+            var = ttk.BooleanVar(value=name in self.initial_trackers)
+            ttk.Checkbutton(self.settings, text=name.capitalize(), variable=var,
+                            command=lambda name=name: self.toggle_tracker(name)).pack(anchor=W, padx=20)
+            self.tracker_vars[name] = var
+        self.tracker_worker = TrackerWorker(socket_path)
+
+        self.attach_button = ttk.Button(self.settings, text="Detach", command=self.toggle_attach)
+        self.attach_button.pack(pady=20)
+
+        # Diagnostics tab (live performance metrics)
+        self.diagnostics = ttk.Frame(self.notebook)
+        self.notebook.add(self.diagnostics, text="Diagnostics")
+
+        self.metrics_label = ttk.Label(self.diagnostics, text="Metrics: -", font=("Menlo", 11),
+                                       justify=LEFT, anchor=NW)
+        self.metrics_label.pack(fill=BOTH, expand=True, padx=10, pady=10)
+        self.metrics_worker = MetricsWorker(socket_path)
+
+        # History tab (active time per app and recent sessions, from the daemon's timeline)
+        self.history = ttk.Frame(self.notebook)
+        self.notebook.add(self.history, text="History")
+
+        self.history_window = ttk.StringVar(value="Today")
+        window = ttk.Combobox(self.history, textvariable=self.history_window, state="readonly",
+                              values=list(HISTORY_WINDOWS), width=14)
+        window.pack(anchor=W, padx=10, pady=(10, 0))
+        window.bind("<<ComboboxSelected>>", lambda _: self.request_history())
+        self.history_worker = HistoryWorker(socket_path)
+        self._history_at = 0.0
+
+        self.history_label = ttk.Label(self.history, text="History: -", font=("Menlo", 11),
+                                       justify=LEFT, anchor=NW)
+        self.history_label.pack(fill=BOTH, expand=True, padx=10, pady=10)
+
+        # Charts tab (keys/min, clicks/min, idle share and top apps over days to months)
+        self.charts = ttk.Frame(self.notebook)
+        self.notebook.add(self.charts, text="Charts")
+
+        self.chart_window = ttk.StringVar(value="Last 2 days")
+        window = ttk.Combobox(self.charts, textvariable=self.chart_window, state="readonly",
+                              values=list(CHART_WINDOWS), width=14)
+        window.pack(anchor=W, padx=10, pady=(10, 0))
+        window.bind("<<ComboboxSelected>>", lambda _: self.reset_chart())
+
+        self.chart_canvas = ttk.Canvas(self.charts, highlightthickness=0)
+        self.chart_canvas.pack(fill=BOTH, expand=True, padx=10, pady=10)
+        self.chart_canvas.bind("<Configure>", lambda _: self.request_chart())
+        self.chart_canvas.bind("<MouseWheel>", lambda e: self.zoom_chart(e.x, 0.8 if e.delta > 0 else 1.25))
+        self.chart_canvas.bind("<Button-4>", lambda e: self.zoom_chart(e.x, 0.8))   # X11 wheel
+        self.chart_canvas.bind("<Button-5>", lambda e: self.zoom_chart(e.x, 1.25))
+        self.chart_canvas.bind("<ButtonPress-1>", lambda e: setattr(self, "_drag_x", e.x))
+        self.chart_canvas.bind("<B1-Motion>", self.pan_chart)
+        self.notebook.bind("<<NotebookTabChanged>>", lambda _: self.request_chart())
+
+        self.chart_worker = ChartWorker(socket_path)
+        self._chart_end = None     # None: the window ends now and follows it
+        self._chart_span = CHART_WINDOWS["Last 2 days"]
+        self._chart_at = 0.0
+        self._drag_x = 0
+        self._polling = set()  # workers whose results are being waited for
+
+        # Paint the empty dashboard first, then attach to the daemon
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after_idle(self.start)
+
+    def start(self):
+        self.attach()
         self.update_dashboard()
 
+    # ---- Daemon connection ------------------------------------------------
+    def attach(self, timeout=10.0):
+        """
+        Connect to the capture daemon, starting it first if it isn't running.
+        While it starts up, the socket is retried from the Tk loop for up to ``timeout`` seconds.
+        """
+        if self._attaching:
+            return
+        client = DaemonClient(self.socket_path)
+        try:
+            client.connect()
+        except OSError:
+            self.start_daemon()
+            self._attaching = True
+            self.daemon_label.config(text="Daemon: starting...")
+            self.root.after(ATTACH_POLL_MS, self._retry_attach, client, time.monotonic() + timeout)
+            return
+        self._attached(client)
+
+    def _retry_attach(self, client, deadline):
+        try:
+            client.connect()
+        except OSError:
+            if time.monotonic() > deadline:
+                self._attaching = False
+                self.daemon_label.config(text="Daemon: failed to start (see logs/daemon.log)")
+            else:
+                self.root.after(ATTACH_POLL_MS, self._retry_attach, client, deadline)
+            return
+        self._attaching = False
+        self._attached(client)
+
+    def _attached(self, client):
+        client.subscribe(events=False, rollups=False)
+        client.get_snapshot()
+        enabled = set(client.call("get_enabled_trackers"))
+        for name, var in self.tracker_vars.items():
+            var.set(name in enabled)
+        self.client = client
+        self.chart_worker.start()
+        self.history_worker.start()
+        self.metrics_worker.start()
+        self.tracker_worker.start()
+        self._shown = None
+        self.daemon_label.config(text=f"Daemon: attached ({self.socket_path})")
+        self.attach_button.config(text="Detach")
+
+    def detach(self):
+        """Disconnect from the daemon; capture keeps running there."""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        self.chart_worker.stop()
+        self.history_worker.stop()
+        self.metrics_worker.stop()
+        self.tracker_worker.stop()
+        self.daemon_label.config(text="Daemon: detached")
+        self.attach_button.config(text="Attach")
+
+    def toggle_attach(self):
+        if self.client is None:
+            self.attach()
+        else:
+            self.detach()
+
+    def start_daemon(self):
+        """Launch the capture daemon in its own session, so it outlives the window."""
+        enabled = [name for name, var in self.tracker_vars.items() if var.get()]
+        os.makedirs("logs", exist_ok=True)
+        with open("logs/daemon.log", "a") as log:
+            subprocess.Popen(
+                [sys.executable, "-m", "activity_manager.daemon", "--socket", self.socket_path,
+                 "--trackers", ",".join(enabled)],
+                stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, start_new_session=True,
+            )
+
+    def on_close(self):
+        self.detach()
+        self.root.destroy()
+
+    def toggle_tracker(self, name):
+        """Settings checkbox: start or stop one tracker at runtime (in the daemon)."""
+        if self.client is None:
+            return
+        self.tracker_worker.request({name: var.get() for name, var in self.tracker_vars.items()})
+        self._watch(self.tracker_worker, self.show_trackers)
+
+    def show_trackers(self, enabled, error=None):
+        if not self.tracker_worker.idle:
+            return  # a newer toggle is on its way; its result sets the boxes
+        if error is not None:
+            self.daemon_label.config(text=f"Daemon: {error}")
+            return
+        for name, var in self.tracker_vars.items():
+            var.set(name in enabled)
+
+    # ---- Rendering --------------------------------------------------------
     def update_dashboard(self):
-        data = self.manager.get_dashboard_data()
+        try:
+            if self.client is not None:
+                self.client.poll()
+                self.render(self.client.snapshot)
+                # Metrics are only fetched while the Diagnostics tab is visible
+                if self.notebook.select() == str(self.diagnostics):
+                    self.metrics_worker.request()
+                    self._watch(self.metrics_worker, self.show_metrics)
+                elif (self.notebook.select() == str(self.history)
+                      and time.monotonic() - self._history_at >= HISTORY_REFRESH):
+                    self.request_history()
+                elif (self.notebook.select() == str(self.charts) and self._chart_end is None
+                      and time.monotonic() - self._chart_at >= HISTORY_REFRESH):
+                    self.request_chart()
+        except (ConnectionError, TimeoutError):
+            self.detach()
+            self.daemon_label.config(text="Daemon: connection lost")
+        except RuntimeError as e:
+            self.daemon_label.config(text=f"Daemon: {e}")  # the call failed; the connection is fine
+        finally:
+            # Schedule next update, whatever happened to this one
+            self.root.after(self.refresh_ms, self.update_dashboard)
+
+    def _watch(self, worker, apply):
+        """Hand ``worker``'s results to ``apply`` on the Tk loop until it has nothing pending."""
+        if worker in self._polling:
+            return
+        self._polling.add(worker)
+
+        def poll():
+            result = worker.take()
+            if result is not None:
+                apply(*result)
+            if worker.idle:
+                self._polling.discard(worker)
+            else:
+                self.root.after(CHART_POLL_MS, poll)
+
+        self.root.after(CHART_POLL_MS, poll)
+
+    def request_history(self):
+        """Ask the worker for the selected window's activity; the tab is updated when it's ready."""
+        if self.client is None:
+            return
+        self.history_worker.request(*HISTORY_WINDOWS[self.history_window.get()])
+        self._history_at = time.monotonic()
+        self._watch(self.history_worker, self.show_history)
 
-        # Active app
-        self.active_app_label.config(text=f"Active App: {data['active_app']}")
+    def show_metrics(self, metrics, error=None):
+        if error is not None:
+            self.metrics_label.config(text=f"Metrics unavailable: {error}")
+            return
+        self.metrics_label.config(text=format_metrics(metrics))
 
-        # Recent apps
-        recent_apps = ", ".join(data['recent_apps'][:5]) if data['recent_apps'] else "-"
-        self.recent_apps_label.config(text=f"Recent Apps: {recent_apps}")
+    def show_history(self, history, error=None):
+        if error is not None:
+            self.history_label.config(text=f"History unavailable: {error}")
+            return
+        self.history_label.config(text=format_history(*history))
 
-        # Last keys
-        self.last_keys_label.config(text=f"Last Keys: {data['last_keys']}")
+    # ---- Charts -----------------------------------------------------------
+    def reset_chart(self):
+        """Charts window combobox: show the chosen span, ending now."""
+        self._chart_span = CHART_WINDOWS[self.chart_window.get()]
+        self._chart_end = None
+        self.request_chart()
 
-        # Mouse stats
-        mouse_stats = data['mouse_stats']
-        self.stats_label.config(
-            text=f"Mouse — Clicks: {mouse_stats['Clicks']} | Moves: {mouse_stats['Moves']} | Scrolls: {mouse_stats['Scrolls']}"
-        )
+    def _chart_range(self):
+        end = time.time() if self._chart_end is None else self._chart_end
+        return end - self._chart_span, end
 
-        # Idle time
-        self.idle_time_label.config(text=f"Idle Time: {data['idle_time']}s")
+    def zoom_chart(self, x, factor):
+        """Mouse wheel: narrow (factor < 1) or widen the window around the time under ``x``."""
+        start, end = self._chart_range()
+        plot_w = max(1, self.chart_canvas.winfo_width() - 2 * CHART_MARGIN)
+        fraction = min(1.0, max(0.0, (x - CHART_MARGIN) / plot_w))
+        pivot = start + fraction * (end - start)
+        span = min(CHART_SPAN[1], max(CHART_SPAN[0], self._chart_span * factor))
+        self._set_chart_end(pivot + (1 - fraction) * span, span)
 
-        # Schedule next update
-        self.root.after(1000, self.update_dashboard)
+    def pan_chart(self, event):
+        """Drag: move the window by the time under the pointer's travel."""
+        plot_w = max(1, self.chart_canvas.winfo_width() - 2 * CHART_MARGIN)
+        shift = (self._drag_x - event.x) / plot_w * self._chart_span
+        self._drag_x = event.x
+        self._set_chart_end(self._chart_range()[1] + shift, self._chart_span)
+
+    def _set_chart_end(self, end, span):
+        now = time.time()
+        self._chart_span = span
+        self._chart_end = None if end >= now else end  # dragged up to now: follow it again
+        self.request_chart()
+
+    def request_chart(self):
+        """Ask the worker for the current window; the canvas is redrawn when it's ready."""
+        if self.client is None or self.notebook.select() != str(self.charts):
+            return
+        width, height = self.chart_canvas.winfo_width(), self.chart_canvas.winfo_height()
+        if width < 2 * CHART_MARGIN or height < 2 * CHART_MARGIN:
+            return  # not laid out yet
+        start, end = self._chart_range()
+        self.chart_worker.request(start, end, width, height)
+        self._chart_at = time.monotonic()
+        self._watch(self.chart_worker, self.draw_chart)
+
+    def draw_chart(self, ops, error=None):
+        canvas = self.chart_canvas
+        canvas.delete("all")
+        if error is not None:
+            canvas.create_text(CHART_MARGIN, CHART_MARGIN, text=f"Chart unavailable: {error}", anchor=W)
+            return
+        for op in ops:
+            if op[0] == "line":
+                canvas.create_line(*op[2], fill=CHART_COLORS[op[1]], width=1.5)
+            elif op[0] == "rect":
+                canvas.create_rectangle(*op[1:], fill=CHART_COLORS["keys_per_min"], outline="")
+            else:
+                _, x, y, text, anchor = op
+                canvas.create_text(x, y, text=text, anchor=anchor, font=("Segoe UI", 9))
+
+    def render(self, snapshot):
+        shown = self._shown
+
+        # Only touch widgets whose values changed since the last paint
+        if shown is None or snapshot.version != shown.version:
+            if shown is None or snapshot.active_app != shown.active_app:
+                self.active_app_label.config(text=f"Active App: {snapshot.active_app}")
+
+            if shown is None or snapshot.recent_apps != shown.recent_apps:
+                recent_apps = ", ".join(snapshot.recent_apps[:5]) if snapshot.recent_apps else "-"
+                self.recent_apps_label.config(text=f"Recent Apps: {recent_apps}")
+
+            if shown is None or snapshot.last_keys != shown.last_keys:
+                self.last_keys_label.config(text=f"Last Keys: {list(snapshot.last_keys)}")
+
+            if shown is None or snapshot.mouse_stats != shown.mouse_stats:
+                mouse_stats = dict(snapshot.mouse_stats)
+                self.stats_label.config(
+                    text=f"Mouse — Clicks: {mouse_stats['Clicks']} | Moves: {mouse_stats['Moves']} | Scrolls: {mouse_stats['Scrolls']}"
+                )
+
+            if shown is None or snapshot.idle_time != shown.idle_time:
+                self.idle_time_label.config(text=f"Idle Time: {snapshot.idle_time}s")
+
+            self._shown = snapshot
 
     def run(self):
         """Run the Tkinter main loop."""
         self.root.mainloop()
+
+
+def format_metrics(metrics):
+    """Render a TrackerManager.get_metrics() snapshot as aligned plain-text tables."""
+    lines = [f"Uptime: {metrics['uptime']:.0f}s", "", f"{'Counter':<32}{'total':>14}{'per sec':>12}"]
+    for name, value in sorted(metrics["counters"].items()):
+        lines.append(f"{name:<32}{value:>14,}{metrics['rates'].get(name, 0.0):>12,.1f}")
+
+    lines += ["", f"{'Gauge':<32}{'value':>14}"]
+    for name, value in sorted(metrics["gauges"].items()):
+        lines.append(f"{name:<32}{value:>14}")
+
+    lines += ["", f"{'Latency (us)':<32}{'count':>10}{'mean':>10}{'p50':>10}{'p99':>10}{'max':>10}"]
+    for name, s in sorted(metrics["latency"].items()):
+        lines.append(f"{name:<32}{s['count']:>10,}{s['mean_us']:>10.1f}{s['p50_us']:>10.1f}"
+                     f"{s['p99_us']:>10.1f}{s['max_us']:>10.1f}")
+    return "\n".join(lines)
+
+
+def format_history(activity, sessions, recent=10):
+    """Render get_app_activity() and the last ``recent`` get_timeline() sessions as plain text."""
+    lines = [f"{'App':<28}{'active':>10}{'idle':>10}{'sessions':>10}{'inputs/min':>12}"]
+    for app, totals in activity.items():
+        lines.append(f"{str(app)[:27]:<28}{_duration(totals['active']):>10}{_duration(totals['idle']):>10}"
+                     f"{totals['sessions']:>10,}{totals['inputs_per_min']:>12.1f}")
+    lines += ["", f"{'Recent sessions':<28}{'from':>10}{'to':>10}{'active':>10}{'inputs':>12}"]
+    for session in reversed(sessions[-recent:]):
+        start = datetime.datetime.fromtimestamp(session["start"]).strftime("%H:%M:%S")
+        end = datetime.datetime.fromtimestamp(session["end"]).strftime("%H:%M:%S")
+        lines.append(f"{str(session['app'])[:27]:<28}{start:>10}{end:>10}"
+                     f"{_duration(session['active']):>10}{session['inputs']:>12,}")
+    return "\n".join(lines)
+
+
+def _duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
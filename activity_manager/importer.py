@@ -0,0 +1,539 @@
+"""
+History Import — bulk-load existing JSON-lines logs into SQLite and the rollups.
+
+Every tracker log (and each of its rotated segments) is split into byte
+ranges that end on line boundaries; a process pool parses the ranges, maps
+each log's own schema onto the normalized storage events
+
+    keyboard.log      {"timestamp", "key"}                   -> key
+    mouse.log         {"ts", "event": click|scroll|mouse_moves} -> click / scroll / mouse_moves
+    apps.log          {"timestamp": "Y-m-d H:M:S", "app_name", ...} -> app_switch
+    app_sessions.log  {"start", "end", "duration", "app_name", ...} -> app_session
+    idle.log          {"start", "end", "duration"}           -> idle
+    activity.log      {"time", "type", "details"}            -> as stored
+
+and pre-aggregates the rollup counters per minute. The parent process then
+inserts each range's rows — and records the range as done — in one
+transaction, so an interrupted import resumes exactly where it stopped and
+never inserts a row twice. Rollup credits are checkpointed the same way in
+the rollups database.
+
+The tracker logs overlap what live capture already stored: a RollupEngine
+counts the same events, and a "sqlite" storage backend holds them as rows.
+The first import into a database therefore fixes a cutoff there
+(``import_cutoff``) at the earliest time its live writer covers: the
+earliest activity row, and the earliest rollup bucket narrowed to the finest
+resolution still kept. Only older events are imported into it (events from
+the cutoff on are counted in ``covered``), so nothing is counted twice;
+credits in the bucket holding the cutoff are left to the live counts. A
+database that was empty on its first import has no cutoff.
+
+activity.log is the storage backend's copy of the same events the tracker
+logs hold, so it is only imported when asked for (``--include-activity``).
+Import while the daemon is stopped: a running RollupEngine would overwrite
+the credited buckets it holds in memory.
+
+    python -m activity_manager.importer logs --db logs/activity.db --workers 8
+"""
+
+import datetime
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from activity_manager.rollups import APP_PREFIX, BUCKET_SECONDS, DAY, HOUR, MINUTE, RETENTION, day_start
+from activity_manager.storage.encryption import ChunkCipher, is_encrypted
+from activity_manager.storage.segments import open_segment_binary, segments_between
+from activity_manager.storage.sqlite_storage import SQLiteStorage, seal_chunk
+
+LOGS = {
+    "keyboard.log": "keyboard",
+    "mouse.log": "mouse",
+    "apps.log": "apps",
+    "app_sessions.log": "app_sessions",
+    "idle.log": "idle",
+}
+ACTIVITY_LOG = ("activity.log", "activity")
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# normalized event type -> rollup metric counted per event (``count`` events if coalesced)
+COUNTED = {"key": "keys", "click": "clicks", "scroll": "scrolls"}
+
+
+# ---- Schema normalization (runs in workers) --------------------------------
+def normalize(kind, record):
+    """Map one record of a ``kind`` log to (time, type, details), or None to skip it."""
+    if kind == "keyboard":
+        details = {"key": record["key"]}
+        if "count" in record:  # collapsed auto-repeats
+            details["count"] = record["count"]
+        return record["timestamp"], "key", details
+    if kind == "mouse":
+        event = record.get("event")
+        if event in ("click", "scroll"):
+            details = {"x": record.get("x"), "y": record.get("y")}
+            if "count" in record:  # coalesced by an overload policy
+                details["count"] = record["count"]
+            return record["ts"], event, details
+        if event == "mouse_moves":
+            return record["ts"], "mouse_moves", {"count": record.get("count", 0)}
+        return None
+    if kind == "apps":
+        details = {"app_name": record.get("app_name"), "bundle_id": record.get("bundle_id")}
+        return record["timestamp"].replace(" ", "T"), "app_switch", details
+    if kind == "app_sessions":
+        details = {k: record.get(k) for k in ("app_name", "bundle_id", "start", "end", "duration")}
+        return record["end"], "app_session", details
+    if kind == "idle":
+        if "end" not in record:
+            return None  # early versions logged raw idle samples, not intervals
+        return record["end"], "idle", {k: record[k] for k in ("start", "end", "duration")}
+    if kind == "activity":
+        event_type, details = record["type"], record.get("details") or {}
+        if event_type == "keyboard":  # early versions stored the raw key record
+            return record["time"], "key", {"key": details.get("key")}
+        if event_type == "idle" and "end" not in details:
+            return None
+        return record["time"], event_type, details
+    raise ValueError(f"Unknown log kind: {kind!r}")
+
+
+class _Credits:
+    """Per-minute rollup credits for one range: {(minute start, metric): amount}."""
+
+    def __init__(self):
+        self.amounts = {}
+        self._minutes = {}  # "YYYY-MM-DDTHH:MM" -> minute start (UNIX time)
+
+    def count(self, iso, metric, amount=1):
+        prefix = iso[:16]
+        minute = self._minutes.get(prefix)
+        if minute is None:
+            minute = self._minutes[prefix] = int(datetime.datetime.fromisoformat(prefix).timestamp())
+        key = (minute, metric)
+        self.amounts[key] = self.amounts.get(key, 0) + amount
+
+    def interval(self, start_iso, end_iso, metric):
+        """Credit the seconds in [start, end), split across minute boundaries."""
+        t = datetime.datetime.fromisoformat(start_iso).timestamp()
+        end = datetime.datetime.fromisoformat(end_iso).timestamp()
+        while t < end:
+            boundary = min(end, (int(t) // 60 + 1) * 60)
+            key = (int(t) - int(t) % 60, metric)
+            self.amounts[key] = self.amounts.get(key, 0) + boundary - t
+            t = boundary
+
+    def add(self, event_type, iso, details):
+        metric = COUNTED.get(event_type)
+        if metric is not None:
+            self.count(iso, metric, details.get("count", 1))
+        elif event_type == "mouse_moves":
+            self.count(iso, "moves", details.get("count", 0))
+        elif event_type == "idle":
+            self.interval(details["start"], details["end"], "idle_seconds")
+        elif event_type == "app_session":
+            self.interval(details["start"], details["end"], APP_PREFIX + str(details.get("app_name")))
+
+
+def parse_segment(path, kind, ranges, done=None, chunk_size=CHUNK_SIZE, key=None):
+    """
+    Worker: parse byte ranges of one segment.
+
+    Plain files are read range by range. Compressed or encrypted segments can't
+    be seeked into, so they are read whole and — when ``done`` is given — their
+    not yet imported ranges are planned here, over the plaintext offsets.
+
+    :return: [(start, end, rows, credits, skipped)] with rows as (time, type, details JSON)
+    """
+    if done is None:
+        blobs = []
+        with open_segment_binary(path) as f:  # a .gz if compressed since it was planned
+            for start, end in ranges:
+                f.seek(start)
+                blobs.append((start, end, f.read(end - start)))
+    else:
+        with open_segment_binary(path, ChunkCipher(key) if key else None) as f:
+            data = f.read()
+        ranges = list(ranges) + plan_ranges(io.BytesIO(data), len(data), done, chunk_size)
+        blobs = [(start, end, data[start:end]) for start, end in ranges]
+    return [(start, end, *parse_lines(kind, blob)) for start, end, blob in blobs]
+
+
+def parse_lines(kind, data):
+    """Normalize the JSON lines in ``data``; returns (rows, per-minute credits, skipped)."""
+    rows = []
+    credits = _Credits()
+    skipped = 0
+    loads = json.loads
+    dumps = json.dumps
+    for line in data.decode("utf-8", "replace").split("\n"):
+        if not line.strip():
+            continue
+        try:
+            event = normalize(kind, loads(line))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            event = None
+        if event is None:
+            skipped += 1
+            continue
+        iso, event_type, details = event
+        try:
+            credits.add(event_type, iso, details)
+        except (ValueError, KeyError, TypeError):
+            skipped += 1
+            continue
+        rows.append((iso, event_type, dumps(details)))
+    return rows, credits.amounts, skipped
+
+
+# ---- Planning ---------------------------------------------------------------
+def plan_ranges(f, size, done, chunk_size=CHUNK_SIZE):
+    """
+    Byte ranges of binary file ``f`` (``size`` bytes) not yet imported
+    (``done`` = imported [start, end) pairs).
+
+    Ranges end just after a newline, so a line is never split and a partly
+    written last line is left for the next import.
+    """
+    eof = _line_end_before(f, size)
+    ranges = []
+    pos = 0
+    for done_start, done_end in sorted(done) + [(eof, eof)]:
+        gap_end = min(done_start, eof)
+        while pos < gap_end:
+            end = gap_end
+            if end - pos > chunk_size:
+                f.seek(pos + chunk_size)
+                f.readline()
+                end = min(f.tell(), gap_end)
+            ranges.append((pos, end))
+            pos = end
+        pos = max(pos, done_end)
+    return ranges
+
+
+def _line_end_before(f, size):
+    """Offset just past the last newline at or before ``size``."""
+    pos = size
+    while pos > 0:
+        step = min(65536, pos)
+        f.seek(pos - step)
+        block = f.read(step)
+        i = block.rfind(b"\n")
+        if i >= 0:
+            return pos - step + i + 1
+        pos -= step
+    return 0
+
+
+def log_files(log_dir, include_activity=False):
+    """(segment path, kind) for every segment of every known log in ``log_dir``."""
+    logs = dict(LOGS)
+    if include_activity:
+        logs[ACTIVITY_LOG[0]] = ACTIVITY_LOG[1]
+    files = []
+    for name, kind in logs.items():
+        for segment in segments_between(os.path.join(log_dir, name)):
+            files.append((segment, kind))
+    return files
+
+
+# ---- Checkpointed writers -----------------------------------------------------
+PROGRESS_TABLE = """
+    CREATE TABLE IF NOT EXISTS import_progress (
+        file TEXT NOT NULL,
+        start INTEGER NOT NULL,
+        end INTEGER NOT NULL,
+        PRIMARY KEY (file, start)
+    )
+"""
+
+
+CUTOFF_TABLE = """
+    CREATE TABLE IF NOT EXISTS import_cutoff (
+        before REAL  -- UNIX time live capture covers from; NULL = import everything
+    )
+"""
+
+
+def _cutoff(conn, live_since):
+    """Import cutoff of a target database, fixed by the first import into it (see module docstring)."""
+    conn.execute(CUTOFF_TABLE)
+    row = conn.execute("SELECT before FROM import_cutoff").fetchone()
+    if row is not None:
+        return row[0]
+    # Databases imported into before cutoffs existed can't tell live rows from imported ones
+    imported = conn.execute("SELECT 1 FROM import_progress LIMIT 1").fetchone()
+    before = None if imported else live_since(conn)
+    with conn:
+        conn.execute("INSERT INTO import_cutoff (before) VALUES (?)", (before,))
+    return before
+
+
+def rows_since(conn):
+    """Time of the earliest stored activity row or sealed chunk (None if there are none)."""
+    firsts = [first for (first,) in conn.execute(
+        "SELECT MIN(time) FROM activity UNION ALL SELECT MIN(start) FROM activity_chunks") if first]
+    return datetime.datetime.fromisoformat(min(firsts)).timestamp() if firsts else None
+
+
+def rollups_since(conn):
+    """
+    Start of the earliest rollup bucket (None if there are none): the earliest day,
+    narrowed to its earliest hour and minute while those resolutions still reach back.
+    """
+    since = until = None
+    for resolution in (DAY, HOUR, MINUTE):
+        (bucket,) = conn.execute("SELECT MIN(bucket) FROM rollups WHERE resolution = ?",
+                                 (resolution,)).fetchone()
+        if bucket is None or (until is not None and bucket >= until):
+            break  # this resolution's retention no longer reaches the earliest day/hour
+        since = bucket
+        if resolution == DAY:
+            until = day_start(bucket + 36 * 3600)  # next midnight, DST-safe
+        else:
+            until = bucket + BUCKET_SECONDS[resolution]
+    return since
+
+
+def _progress(conn, file_id):
+    return [(start, end) for start, end in
+            conn.execute("SELECT start, end FROM import_progress WHERE file = ?", (file_id,))]
+
+
+def file_id(path, kind, cipher=None):
+    """
+    Checkpoint key of a segment: its kind and a hash of its first line. A log
+    keeps its identity when the active file is sealed, renamed and compressed,
+    so rotation between two imports never re-imports it. None if still empty.
+    """
+    with open_segment_binary(path, cipher) as f:
+        first = next(iter(f), b"")
+    if not first.endswith(b"\n"):
+        return None
+    return f"{kind}:{hashlib.sha1(first).hexdigest()}"
+
+
+def _rollup_keys(minute, cache):
+    """Bucket start per resolution for a minute start (day starts cached: DST-safe and cheap)."""
+    hour = minute - minute % 3600
+    day = cache.get(hour)
+    if day is None:
+        day = cache[hour] = day_start(hour)
+    return ((MINUTE, minute), (HOUR, hour), (DAY, day))
+
+
+class Importer:
+    def __init__(self, db_path="logs/activity.db", rollups_path="logs/rollups.db", workers=None,
+                 chunk_size=CHUNK_SIZE, key=None):
+        """
+        :param db_path: SQLite storage database the events are inserted into
+        :param rollups_path: RollupEngine database credited with the counters (None = skip)
+        :param workers: parser processes (None = one per core, 1 = parse in-process)
+        :param chunk_size: bytes per parsed range
+        :param key: encryption key for encrypted segments and an encrypted database
+        """
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.key = key
+        self.cipher = ChunkCipher(key) if key else None
+
+        SQLiteStorage(db_path).close()  # create the schema the backend expects
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(PROGRESS_TABLE)
+        before = _cutoff(self.db, rows_since)
+        self.rows_before = None if before is None else datetime.datetime.fromtimestamp(before).isoformat()
+        if before is not None:
+            print(f"[Importer] {db_path} holds live events from {self.rows_before}; importing older ones only")
+
+        self.rollups = None
+        self.rollups_before = None
+        if rollups_path:
+            from activity_manager.rollups import RollupEngine
+
+            RollupEngine(rollups_path).close()  # create its schema
+            self.rollups = sqlite3.connect(rollups_path)
+            self.rollups.execute("PRAGMA journal_mode=WAL")
+            self.rollups.execute(PROGRESS_TABLE)
+            self.rollups_before = _cutoff(self.rollups, rollups_since)
+            if self.rollups_before is not None:
+                since = datetime.datetime.fromtimestamp(self.rollups_before).isoformat()
+                print(f"[Importer] {rollups_path} holds live rollups from {since}; crediting older events only")
+        self._days = {}
+
+        self.done_rows = {}     # file id -> imported ranges
+        self.done_rollups = {}  # file id -> credited ranges
+        self.rows = 0
+        self.skipped = 0
+        self.covered = 0  # rows left out because live storage already holds them
+
+    def close(self):
+        self.db.close()
+        if self.rollups is not None:
+            self.rollups.close()
+
+    # ---- Planning ---------------------------------------------------------
+    def _tasks(self, files):
+        """(path, kind, id, ranges, done) parse tasks for everything not imported yet."""
+        tasks = []
+        for path, kind in files:
+            fid = file_id(path, kind, self.cipher)
+            if fid is None:
+                continue
+            done_rows = self.done_rows[fid] = set(_progress(self.db, fid))
+            done_rollups = self.done_rollups[fid] = (set(_progress(self.rollups, fid))
+                                                     if self.rollups is not None else done_rows)
+            # Ranges done for one database only are re-parsed as they were, for the other
+            redo = sorted(done_rows ^ done_rollups)
+            done = done_rows | done_rollups
+            if path.endswith(".gz") or is_encrypted(path):
+                tasks.append((path, kind, fid, redo, done))  # planned in the worker
+                continue
+            try:
+                with open(path, "rb") as f:
+                    planned = plan_ranges(f, os.fstat(f.fileno()).st_size, done, self.chunk_size)
+            except FileNotFoundError:
+                tasks.append((path + ".gz", kind, fid, redo, done))  # compressed since it was listed
+                continue
+            tasks.extend((path, kind, fid, [r], None) for r in redo + planned)
+        return tasks
+
+    # ---- Running ----------------------------------------------------------
+    def run(self, files, progress=None):
+        """
+        Import ``files`` ((path, kind) pairs); returns the number of rows inserted.
+
+        :param progress: optional callable(done tasks, total tasks, rows) called as ranges land
+        """
+        tasks = self._tasks(files)
+        total = len(tasks)
+        done = 0
+        if self.workers == 1:
+            for path, kind, fid, ranges, planned_done in tasks:
+                self._commit(fid, parse_segment(path, kind, ranges, planned_done, self.chunk_size, self.key))
+                done += 1
+                if progress:
+                    progress(done, total, self.rows)
+            return self.rows
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = {}
+            pending = iter(tasks)
+            limit = 2 * (self.workers or os.cpu_count() or 1)  # bounds parsed-but-unwritten memory
+            while True:
+                for path, kind, fid, ranges, planned_done in pending:
+                    future = pool.submit(parse_segment, path, kind, ranges, planned_done,
+                                         self.chunk_size, self.key)
+                    in_flight[future] = fid
+                    if len(in_flight) >= limit:
+                        break
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._commit(in_flight.pop(future), future.result())
+                    done += 1
+                    if progress:
+                        progress(done, total, self.rows)
+        return self.rows
+
+    def _commit(self, fid, results):
+        """Write each parsed range with its checkpoint, in one transaction per database."""
+        for start, end, rows, credits, skipped in results:
+            if (start, end) not in self.done_rows[fid]:
+                if self.rows_before is not None:
+                    kept = [row for row in rows if row[0] < self.rows_before]
+                    self.covered += len(rows) - len(kept)
+                    rows = kept
+                with self.db:
+                    if self.cipher is None:
+                        self.db.executemany("INSERT INTO activity (time, type, details) VALUES (?, ?, ?)", rows)
+                    elif rows:  # one sealed chunk per parsed range
+                        self.db.execute("INSERT INTO activity_chunks (start, end, data) VALUES (?, ?, ?)",
+                                        seal_chunk(self.cipher, rows))
+                    self.db.execute("INSERT INTO import_progress (file, start, end) VALUES (?, ?, ?)",
+                                    (fid, start, end))
+                self.done_rows[fid].add((start, end))
+                self.rows += len(rows)
+                self.skipped += skipped
+            if self.rollups is not None and (start, end) not in self.done_rollups[fid]:
+                with self.rollups:
+                    self.rollups.executemany(
+                        "INSERT INTO rollups (resolution, bucket, metric, value) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (resolution, bucket, metric) DO UPDATE SET value = value + excluded.value",
+                        self._rollup_rows(credits),
+                    )
+                    self.rollups.execute("INSERT INTO import_progress (file, start, end) VALUES (?, ?, ?)",
+                                         (fid, start, end))
+                self.done_rollups[fid].add((start, end))
+
+    def _rollup_rows(self, credits):
+        """Fold per-minute credits into minute/hour/day buckets, skipping expired resolutions."""
+        now = time.time()
+        cutoffs = {res: now - keep for res, keep in RETENTION.items() if keep is not None}
+        live = self.rollups_before
+        buckets = {}
+        for (minute, metric), amount in credits.items():
+            if live is not None and minute >= live:
+                continue
+            for resolution, bucket in _rollup_keys(minute, self._days):
+                if bucket < cutoffs.get(resolution, bucket):
+                    continue
+                key = (resolution, bucket, metric)
+                buckets[key] = buckets.get(key, 0) + amount
+        return [(res, bucket, metric, value) for (res, bucket, metric), value in buckets.items()]
+
+
+def import_history(log_dir="logs", db_path="logs/activity.db", rollups_path="logs/rollups.db",
+                   workers=None, include_activity=False, key=None, progress=None):
+    """
+    Import every log in ``log_dir`` (resuming a previous run); returns (rows, skipped).
+    Rows live storage already holds are neither imported nor counted as skipped.
+    """
+    importer = Importer(db_path, rollups_path, workers=workers, key=key)
+    try:
+        importer.run(log_files(log_dir, include_activity), progress=progress)
+        return importer.rows, importer.skipped
+    finally:
+        importer.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import JSON-lines history into SQLite and the rollups.")
+    parser.add_argument("log_dir", nargs="?", default="logs")
+    parser.add_argument("--db", default="logs/activity.db", help="SQLite storage database")
+    parser.add_argument("--rollups", default="logs/rollups.db", help="rollups database ('' to skip)")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: cores)")
+    parser.add_argument("--include-activity", action="store_true",
+                        help="also import activity.log (duplicates the tracker logs it was written with)")
+    parser.add_argument("--key-file", help="encryption key for encrypted logs and database")
+    args = parser.parse_args()
+
+    key = None
+    if args.key_file:
+        with open(args.key_file, "rb") as f:
+            key = f.read()
+
+    started = time.perf_counter()
+
+    def progress(done, total, rows):
+        print(f"\r[Importer] {done}/{total} tasks, {rows:,} rows", end="", flush=True)
+
+    rows, skipped = import_history(args.log_dir, args.db, args.rollups or None, workers=args.workers,
+                                   include_activity=args.include_activity, key=key, progress=progress)
+    elapsed = time.perf_counter() - started
+    print(f"\n[Importer] Imported {rows:,} rows ({skipped:,} skipped) in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
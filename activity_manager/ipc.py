@@ -0,0 +1,186 @@
+"""
+IPC — compact framed messages between the capture daemon and its clients.
+
+Every message is a JSON object (no whitespace) behind a 4-byte little-endian
+length, sent over a Unix domain socket. Clients send requests:
+
+    {"op": "subscribe", "events": true, "rollups": true}
+    {"op": "unsubscribe"}
+    {"op": "snapshot", "id": 1}
+    {"op": "call", "id": 2, "method": "get_metrics", "args": []}
+
+and the daemon answers calls with ``{"op": "reply", "id": ..., "result": ...}``
+(or ``"error"``). Subscribers get at most one ``update`` frame per daemon tick,
+carrying only what changed since the previous frame sent to that client:
+
+    {"op": "update", "v": 42,
+     "snapshot": {"active_app": "Xcode"},        # changed dashboard fields
+     "events": {"key": 31, "move": 410},          # events captured since
+     "rollups": {"keys": 5120}}                   # changed totals for today
+
+so a quiet tick costs nothing and a busy one costs one small frame.
+"""
+
+import json
+import select
+import socket
+import struct
+import time
+
+from activity_manager.snapshot import EMPTY_SNAPSHOT
+
+DEFAULT_SOCKET = "logs/activity.sock"
+FRAME = struct.Struct("<I")
+MAX_FRAME = 16 * 1024 * 1024
+
+# Snapshot fields sent as lists that are tuples in DashboardSnapshot
+_TUPLE_FIELDS = ("recent_apps", "last_keys", "mouse_stats")
+
+
+def encode(message) -> bytes:
+    body = json.dumps(message, separators=(",", ":"), default=str).encode("utf-8")
+    return FRAME.pack(len(body)) + body
+
+
+class FrameReader:
+    """Reassembles messages from a byte stream that may split or merge frames."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Add received bytes; returns the complete messages now available."""
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        pos = 0
+        while len(buffer) - pos >= FRAME.size:
+            (length,) = FRAME.unpack_from(buffer, pos)
+            if length > MAX_FRAME:
+                raise ValueError(f"IPC frame too large: {length} bytes")
+            end = pos + FRAME.size + length
+            if end > len(buffer):
+                break
+            messages.append(json.loads(bytes(buffer[pos + FRAME.size:end])))
+            pos = end
+        del buffer[:pos]
+        return messages
+
+
+def snapshot_fields(snapshot):
+    """DashboardSnapshot -> dict of its content fields (JSON-friendly)."""
+    fields = snapshot._asdict()
+    del fields["version"]
+    return fields
+
+
+class DaemonClient:
+    """
+    Client side of the daemon socket: mirrors the daemon's dashboard snapshot,
+    event counts and today's rollups from the update stream.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET):
+        self.path = path
+        self.sock = None
+        self.reader = FrameReader()
+        self.snapshot = EMPTY_SNAPSHOT
+        self.events = {}   # kind -> events captured since subscribing
+        self.rollups = {}  # today's totals
+        self._next_id = 0
+        self._replies = {}
+
+    # ---- Connection -------------------------------------------------------
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.reader = FrameReader()
+        return self
+
+    @property
+    def connected(self):
+        return self.sock is not None
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+    def subscribe(self, events=True, rollups=True):
+        self._send({"op": "subscribe", "events": events, "rollups": rollups})
+
+    def unsubscribe(self):
+        self._send({"op": "unsubscribe"})
+
+    # ---- Requests ---------------------------------------------------------
+    def call(self, method, *args, timeout=5.0):
+        """Call a TrackerManager method in the daemon and wait for its result."""
+        return self._request({"op": "call", "method": method, "args": list(args)}, timeout)
+
+    def get_snapshot(self, timeout=5.0):
+        """Fetch the full current snapshot (without subscribing)."""
+        self._request({"op": "snapshot"}, timeout)
+        return self.snapshot
+
+    def _request(self, message, timeout):
+        self._next_id += 1
+        request_id = message["id"] = self._next_id
+        self._send(message)
+        deadline = time.monotonic() + timeout
+        while request_id not in self._replies:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"No reply from the daemon to {message['op']!r}")
+            self._receive(remaining)
+        reply = self._replies.pop(request_id)
+        if "error" in reply:
+            raise RuntimeError(f"Daemon error: {reply['error']}")
+        return reply.get("result")
+
+    # ---- Receiving --------------------------------------------------------
+    def poll(self):
+        """Apply every update already received, without blocking; returns how many."""
+        count = 0
+        while self._receive(0):
+            count += 1
+        return count
+
+    def _receive(self, timeout):
+        """Read once (waiting up to ``timeout``) and apply the messages; False if nothing came."""
+        if self.sock is None:
+            raise ConnectionError("Not connected to the daemon")
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return False
+        data = self.sock.recv(65536)
+        if not data:
+            self.close()
+            raise ConnectionError("The daemon closed the connection")
+        for message in self.reader.feed(data):
+            self._apply(message)
+        return True
+
+    def _apply(self, message):
+        op = message.get("op")
+        if op == "update" or op == "snapshot":
+            fields = {name: tuple(tuple(v) if isinstance(v, list) else v for v in value)
+                      if name in _TUPLE_FIELDS else value
+                      for name, value in message.get("snapshot", {}).items()}
+            self.snapshot = self.snapshot._replace(version=message["v"], **fields)
+            for kind, count in message.get("events", {}).items():
+                self.events[kind] = self.events.get(kind, 0) + count
+            self.rollups.update(message.get("rollups", {}))
+        if "id" in message:
+            self._replies[message["id"]] = message
+
+    def _send(self, message):
+        if self.sock is None:
+            raise ConnectionError("Not connected to the daemon")
+        self.sock.sendall(encode(message))
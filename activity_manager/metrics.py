@@ -0,0 +1,184 @@
+"""
+Metrics — low-overhead performance instrumentation shared by trackers and storage.
+
+Three kinds of metric, all keyed by a dotted name:
+
+- counters   ``count(name, n)``: monotonically increasing totals (events by
+             type, bytes written); their per-second rates are derived when a
+             snapshot is taken
+- latencies  ``observe_ns(name, ns)``: fixed-size histograms with power-of-two
+             nanosecond buckets (bucket b covers [2**(b-1), 2**b) ns), so
+             recording is one ``int.bit_length()`` and one array increment
+- gauges     ``gauge(name, fn)``: callables read only at snapshot time (queue
+             depth, dropped events, tap re-enables), costing nothing in between
+
+Each metric is expected to be updated from one thread (the tap thread, the
+pipeline writer, ...), so no locks are taken on the hot path. ``start()``
+writes ``snapshot()`` as JSON to ``path`` every ``interval`` seconds.
+"""
+
+import json
+import os
+import threading
+import time
+from array import array
+
+LATENCY_BUCKETS = 48  # up to 2**47 ns (~39 h); longer observations land in the last bucket
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = array("q", bytes(8 * LATENCY_BUCKETS))
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        b = ns.bit_length()
+        self.buckets[b if b < LATENCY_BUCKETS else LATENCY_BUCKETS - 1] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, pct):
+        """Approximate latency (ns, bucket midpoint) at percentile ``pct``."""
+        if not self.count:
+            return 0
+        rank = self.count * pct / 100
+        seen = 0
+        for b, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return 0 if b == 0 else min(3 * 2 ** (b - 2), self.max_ns)
+        return self.max_ns
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_us": round(self.total_ns / self.count / 1000, 2) if self.count else 0.0,
+            "p50_us": round(self.percentile(50) / 1000, 2),
+            "p99_us": round(self.percentile(99) / 1000, 2),
+            "max_us": round(self.max_ns / 1000, 2),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, path="logs/metrics.json", interval=10.0):
+        """
+        :param path: JSON file the periodic snapshot is written to (replaced atomically)
+        :param interval: how often (in seconds) ``start()`` exports a snapshot
+        """
+        self.path = path
+        self.interval = interval
+        self.counters = {}
+        self.latencies = {}
+        self.gauges = {}
+        self.started = time.time()
+
+        self._rates = {}
+        self._rate_counters = {}
+        self._rate_time = time.monotonic()
+
+        self.running = False
+        self.thread = None
+        self._stop = threading.Event()
+
+    # ---- Recording --------------------------------------------------------
+    def count(self, name, n=1):
+        counters = self.counters
+        counters[name] = counters.get(name, 0) + n
+
+    def histogram(self, name):
+        """The LatencyHistogram for ``name`` (hot paths can hold on to it and call ``add``)."""
+        histogram = self.latencies.get(name)
+        if histogram is None:
+            histogram = self.latencies[name] = LatencyHistogram()
+        return histogram
+
+    def observe_ns(self, name, ns):
+        self.histogram(name).add(ns)
+
+    def gauge(self, name, fn):
+        """Register ``fn()`` to be read as ``name`` in every snapshot."""
+        self.gauges[name] = fn
+
+    def timed(self, name, fn):
+        """Wrap ``fn`` so each call's latency is observed as ``name``."""
+        perf_counter_ns = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            t0 = perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe_ns(name, perf_counter_ns() - t0)
+
+        return wrapper
+
+    # ---- Reading ----------------------------------------------------------
+    def _update_rates(self):
+        """Per-second rate of every counter since the previous update (at most once a second)."""
+        now = time.monotonic()
+        elapsed = now - self._rate_time
+        if elapsed < 1.0:
+            return
+        counters = dict(self.counters)
+        previous = self._rate_counters
+        self._rates = {name: round((value - previous.get(name, 0)) / elapsed, 1)
+                       for name, value in counters.items()}
+        self._rate_counters = counters
+        self._rate_time = now
+
+    def snapshot(self):
+        """Point-in-time view of every metric, as plain JSON-serializable data."""
+        self._update_rates()
+        gauges = {}
+        for name, fn in list(self.gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        return {
+            "time": time.time(),
+            "uptime": round(time.time() - self.started, 1),
+            "counters": dict(self.counters),
+            "rates": dict(self._rates),
+            "gauges": gauges,
+            "latency": {name: h.summary() for name, h in list(self.latencies.items())},
+        }
+
+    # ---- Periodic export --------------------------------------------------
+    def export(self):
+        """Write one snapshot to ``path`` (via a temporary file, so readers never see it half-written)."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(tmp, self.path)
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop exporting; the final snapshot is written on the way out."""
+        self.running = False
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            stopping = self._stop.wait(self.interval)
+            try:
+                self.export()
+            except Exception as e:
+                print(f"[Metrics] ERROR: Failed to export snapshot: {e}")
+            if stopping:
+                return
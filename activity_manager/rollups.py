@@ -0,0 +1,252 @@
+"""
+Rollup Engine — incremental per-minute / per-hour / per-day activity counters.
+
+Trackers feed events as they arrive; each event updates one bucket per
+resolution, so "last N hours/days" queries cost O(buckets), never O(events).
+Buckets are persisted to SQLite (dirty ones only) by a background thread.
+
+Metrics: keys, clicks, scrolls, moves, distance (cursor path, px), idle_seconds
+and "app:<name>" (foreground seconds per app).
+
+Every row written or changed in the database gets the next change sequence
+number (``seq``, assigned by triggers whichever process writes), so sync.py can
+read just the rows changed since its checkpoint.
+"""
+
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+MINUTE = "minute"
+HOUR = "hour"
+DAY = "day"
+
+BUCKET_SECONDS = {MINUTE: 60, HOUR: 3600}
+
+# How much history each resolution keeps in memory and on disk (seconds; None = forever)
+RETENTION = {MINUTE: 2 * 86400, HOUR: 90 * 86400, DAY: None}
+
+APP_PREFIX = "app:"
+
+# Change tracking: rollup_seq holds the last sequence number handed out
+SEQ_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rollup_seq (value INTEGER NOT NULL);
+    INSERT INTO rollup_seq (value) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM rollup_seq);
+    CREATE INDEX IF NOT EXISTS rollups_by_seq ON rollups (seq);
+    CREATE TRIGGER IF NOT EXISTS rollups_seq_insert AFTER INSERT ON rollups BEGIN
+        UPDATE rollup_seq SET value = value + 1;
+        UPDATE rollups SET seq = (SELECT value FROM rollup_seq) WHERE rowid = NEW.rowid;
+    END;
+    CREATE TRIGGER IF NOT EXISTS rollups_seq_update AFTER UPDATE OF value ON rollups BEGIN
+        UPDATE rollup_seq SET value = value + 1;
+        UPDATE rollups SET seq = (SELECT value FROM rollup_seq) WHERE rowid = NEW.rowid;
+    END;
+"""
+
+
+def day_start(ts) -> int:
+    """Local midnight (as a UNIX timestamp) of the day containing ``ts``."""
+    d = datetime.datetime.fromtimestamp(ts).date()
+    return int(datetime.datetime(d.year, d.month, d.day).timestamp())
+
+
+class RollupEngine:
+    def __init__(self, path="logs/rollups.db", flush_interval=30):
+        """
+        :param path: SQLite file the buckets are persisted to (None = memory only)
+        :param flush_interval: how often (in seconds) dirty buckets are written
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buckets = {MINUTE: {}, HOUR: {}, DAY: {}}  # resolution -> bucket start -> {metric: value}
+        self._dirty = set()  # (resolution, bucket start)
+        self._lock = threading.Lock()
+        self._day = (0, 0)  # cached [start, end) of the current local day
+
+        self.running = False
+        self.thread = None
+        self._stop = threading.Event()
+
+        self.conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS rollups (
+                    resolution TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    metric TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    seq INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (resolution, bucket, metric)
+                )
+            """)
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(rollups)")]
+            if "seq" not in columns:  # databases from before change tracking
+                self.conn.execute("ALTER TABLE rollups ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+            self.conn.executescript(SEQ_SCHEMA)
+            self.conn.commit()
+            self._load()
+
+    # ---- Bucketing --------------------------------------------------------
+    def _keys(self, ts):
+        """Bucket start for every resolution."""
+        t = int(ts)
+        day_lo, day_hi = self._day
+        if not day_lo <= t < day_hi:
+            day_lo = day_start(t)
+            self._day = (day_lo, day_start(day_lo + 36 * 3600))  # next midnight, DST-safe
+        return ((MINUTE, t - t % 60), (HOUR, t - t % 3600), (DAY, day_lo))
+
+    def _bump(self, metric, ts, amount):
+        for resolution, key in self._keys(ts):
+            bucket = self.buckets[resolution].get(key)
+            if bucket is None:
+                bucket = self.buckets[resolution][key] = {}
+            bucket[metric] = bucket.get(metric, 0) + amount
+            self._dirty.add((resolution, key))
+
+    # ---- Ingest -----------------------------------------------------------
+    def add(self, metric, ts, amount=1):
+        """Count ``amount`` of ``metric`` at time ``ts``."""
+        with self._lock:
+            self._bump(metric, ts, amount)
+
+    def add_interval(self, metric, start, end):
+        """Add the seconds in [start, end) to ``metric``, split across minute boundaries."""
+        if end <= start:
+            return
+        with self._lock:
+            t = start
+            while t < end:
+                boundary = min(end, (int(t) // 60 + 1) * 60)
+                self._bump(metric, t, boundary - t)
+                t = boundary
+
+    def add_app_time(self, app_name, start, end):
+        """Credit foreground seconds in [start, end) to ``app_name``."""
+        self.add_interval(APP_PREFIX + str(app_name), start, end)
+
+    # ---- Queries ----------------------------------------------------------
+    def query(self, resolution, start, end):
+        """Return [(bucket_start, {metric: value})] for buckets starting in [start, end)."""
+        with self._lock:
+            rows = [(key, dict(bucket)) for key, bucket in self.buckets[resolution].items()
+                    if start <= key < end]
+        rows.sort()
+        return rows
+
+    def extent(self, resolution):
+        """(oldest bucket start or None, number of buckets) held for ``resolution``."""
+        with self._lock:
+            buckets = self.buckets[resolution]
+            return (min(buckets) if buckets else None), len(buckets)
+
+    def totals(self, hours=None, days=None, now=None):
+        """
+        Sum the last ``hours`` hour buckets or last ``days`` day buckets (both include
+        the current, partial bucket). Apps are returned under "apps" as {name: seconds}.
+        """
+        now = time.time() if now is None else now
+        if hours is not None:
+            current = int(now) - int(now) % 3600
+            keys = [(HOUR, current - i * 3600) for i in range(hours)]
+        else:
+            today = datetime.datetime.fromtimestamp(now).date()
+            keys = []
+            for i in range(days or 1):
+                d = today - datetime.timedelta(days=i)
+                keys.append((DAY, int(datetime.datetime(d.year, d.month, d.day).timestamp())))
+
+        totals = {"keys": 0, "clicks": 0, "scrolls": 0, "moves": 0, "distance": 0.0, "idle_seconds": 0.0}
+        apps = {}
+        with self._lock:
+            for resolution, key in keys:
+                for metric, value in self.buckets[resolution].get(key, {}).items():
+                    if metric.startswith(APP_PREFIX):
+                        name = metric[len(APP_PREFIX):]
+                        apps[name] = apps.get(name, 0) + value
+                    else:
+                        totals[metric] = totals.get(metric, 0) + value
+        totals["apps"] = dict(sorted(apps.items(), key=lambda item: item[1], reverse=True))
+        return totals
+
+    # ---- Persistence ------------------------------------------------------
+    def _load(self):
+        now = time.time()
+        for resolution, keep in RETENTION.items():
+            since = now - keep if keep else 0
+            cur = self.conn.execute(
+                "SELECT bucket, metric, value FROM rollups WHERE resolution = ? AND bucket >= ?",
+                (resolution, since),
+            )
+            for bucket, metric, value in cur:
+                self.buckets[resolution].setdefault(bucket, {})[metric] = value
+
+    def flush(self):
+        """Write dirty buckets and prune expired ones."""
+        with self._lock:
+            rows = []
+            for resolution, key in self._dirty:
+                for metric, value in self.buckets[resolution].get(key, {}).items():
+                    rows.append((resolution, key, metric, value))
+            self._dirty.clear()
+            expired = self._prune()
+
+        if self.conn is None:
+            return
+        with self.conn:
+            # Unchanged values are left alone, so they keep their change sequence number
+            self.conn.executemany(
+                "INSERT INTO rollups (resolution, bucket, metric, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (resolution, bucket, metric) DO UPDATE SET value = excluded.value "
+                "WHERE value != excluded.value",
+                rows,
+            )
+            for resolution, cutoff in expired:
+                self.conn.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                                  (resolution, cutoff))
+
+    def _prune(self):
+        now = time.time()
+        expired = []
+        for resolution, keep in RETENTION.items():
+            if keep is None:
+                continue
+            cutoff = now - keep
+            buckets = self.buckets[resolution]
+            for key in [k for k in buckets if k < cutoff]:
+                del buckets[key]
+            expired.append((resolution, cutoff))
+        return expired
+
+    # ---- Lifecycle --------------------------------------------------------
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            print("[RollupEngine] Started.")
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+        self.flush()
+        print("[RollupEngine] Stopped.")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
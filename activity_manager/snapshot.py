@@ -0,0 +1,72 @@
+"""
+Dashboard Snapshot — immutable, versioned view of tracker state.
+
+A publisher thread rebuilds the snapshot off the GUI thread and swaps it into
+a two-slot buffer by flipping a single index, so readers never see a
+half-updated state and never take a lock. The version only increases when
+the content actually changed, letting the GUI skip unchanged ticks with one
+integer comparison.
+"""
+
+import threading
+from collections import namedtuple
+
+DashboardSnapshot = namedtuple(
+    "DashboardSnapshot",
+    ["version", "active_app", "recent_apps", "last_keys", "mouse_stats", "idle_time"],
+)
+
+EMPTY_SNAPSHOT = DashboardSnapshot(0, "Unknown", (), (), (("Clicks", 0), ("Moves", 0), ("Scrolls", 0)), 0)
+
+
+class SnapshotBuffer:
+    def __init__(self, build, interval=1.0):
+        """
+        :param build: callable returning a DashboardSnapshot (its version is ignored)
+        :param interval: how often (in seconds) to republish
+        """
+        self.build = build
+        self.interval = interval
+        self._slots = [EMPTY_SNAPSHOT, EMPTY_SNAPSHOT]
+        self._front = 0
+
+        self.running = False
+        self.thread = None
+        self._stop = threading.Event()
+
+    def get(self) -> DashboardSnapshot:
+        """Current snapshot (lock-free)."""
+        return self._slots[self._front]
+
+    def publish(self):
+        """Build a new snapshot into the back slot and flip it to the front if it changed."""
+        current = self._slots[self._front]
+        fresh = self.build()
+        if fresh[1:] == current[1:]:
+            return current
+        back = 1 - self._front
+        self._slots[back] = fresh._replace(version=current.version + 1)
+        self._front = back
+        return self._slots[back]
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"[SnapshotBuffer] ERROR: Failed to publish snapshot: {e}")
+            if self._stop.wait(self.interval):
+                return
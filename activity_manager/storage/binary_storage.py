@@ -0,0 +1,813 @@
+"""
+Binary Storage — compact append-only segment format with an mmap reader.
+
+A segment is three files:
+
+    <path>          16-byte header + fixed-width 5-byte records
+    <path>.strings  append-only interned string table (length-prefixed UTF-8)
+    <path>.extras   append-only side stream: time bases and packed details
+
+Each record is ``RECORD`` = (tick, symbol): the microseconds since the current
+time base, and the string id of the interned (event type, label) pair -- the key
+label of a key, the app name of an app_switch / app_session. Everything else an
+event carries goes into ``.extras`` as an entry keyed by the record's index, and
+only when there is something to store: the count of a coalesced record, a
+click's position, an interval's start and duration, a typing record's rhythm
+fields (see ``PACKERS``). Events of other types keep their details as JSON there.
+A time base entry is written whenever a tick would not fit in 32 bits (about 71
+minutes), and a symbol id entry for ids that don't fit the record's byte, so
+keystrokes, the bulk of the history, take 5 bytes each.
+``to_event`` rebuilds the same details the JSON-lines and SQLite backends return.
+
+String id 0 means "absent"; a segment holds at most 65535 distinct strings.
+Version 1 and 2 segments (``RECORD_V1``, ``RECORD_V2``: 18 and 32-byte records
+carrying their fields inline) stay readable, and a writer appending to one keeps
+writing its version.
+With a ChunkCipher all files are written as encrypted chunks (one per batch)
+and the reader decrypts them into memory instead of mapping them.
+Strings and extras are always written before the records
+that reference them, so a reader never sees a dangling id.
+
+Convert existing JSON-lines logs with:
+
+    python -m activity_manager.storage.binary_storage logs logs/history.bin
+"""
+
+import argparse
+import bisect
+import datetime
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+
+from activity_manager.storage.encryption import EncryptedFile, is_encrypted, read_all
+from activity_manager.storage.segments import MAX_LATENESS, open_segment, segments_between
+
+MAGIC = b"AMSEG1\0\0"
+HEADER = struct.Struct("<8sII")      # magic, version, record size
+RECORD = struct.Struct("<IB")        # tick (us past the time base), symbol id (5 bytes)
+RECORD_V2 = struct.Struct("<qHHHdq")  # ts_ns, type_id, a_id, b_id, value, aux (32 bytes)
+RECORD_V1 = struct.Struct("<qHHHf")  # ts_ns, type_id, a_id, b_id, value (18 bytes)
+RECORDS = {1: RECORD_V1, 2: RECORD_V2, 3: RECORD}
+POINT = struct.Struct("<ff")         # click / scroll position, packed into a version 2 aux field
+STRING_LEN = struct.Struct("<I")
+VERSION = 3
+MAX_STRINGS = 0xFFFF  # string ids are uint16
+TICKS = 1 << 32       # a tick is a uint32
+WIDE = 0xFF           # record symbol byte of an id stored in .extras
+
+# .extras entries: header, then ``length`` bytes of payload
+EXTRA = struct.Struct("<IBH")  # record index, kind, payload length
+BASE, PACKED, RAW, RESET, SYMBOL = range(5)  # RAW: details as JSON
+BASE_US = struct.Struct("<q")    # a time base: microseconds since the epoch
+SYMBOL_ID = struct.Struct("<H")  # a symbol id of WIDE or more
+
+# details keys that map onto the fixed record fields, in priority order
+A_KEYS = ("key", "app_name", "app")
+B_KEYS = ("bundle_id",)
+VALUE_KEYS = ("count", "idle_seconds", "duration", "value")
+TS_KEYS = ("timestamp", "ts", "time")
+
+INTERVAL_TYPES = ("app_session", "idle")
+POINT_TYPES = ("click", "scroll")
+
+
+def iso_to_ns(value) -> int:
+    """ISO-8601 string -> integer nanoseconds since the epoch (local time if naive)."""
+    dt = datetime.datetime.fromisoformat(value)
+    return int(dt.replace(microsecond=0).timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+
+
+def ns_to_iso(ts_ns) -> str:
+    seconds, ns = divmod(ts_ns, 1_000_000_000)
+    return datetime.datetime.fromtimestamp(seconds).replace(microsecond=ns // 1000).isoformat()
+
+
+def to_ns(value) -> int:
+    """ISO string, float seconds or int nanoseconds -> integer nanoseconds."""
+    if isinstance(value, str):
+        return iso_to_ns(value)
+    if isinstance(value, int):
+        return value
+    return int(value * 1_000_000_000)
+
+
+def pack_point(x, y) -> int:
+    """(x, y) -> aux field; a missing coordinate is stored as NaN."""
+    point = POINT.pack(math.nan if x is None else x, math.nan if y is None else y)
+    return int.from_bytes(point, "little", signed=True)
+
+
+def unpack_point(aux):
+    x, y = POINT.unpack(aux.to_bytes(8, "little", signed=True))
+    return (None if math.isnan(x) else x), (None if math.isnan(y) else y)
+
+
+def segment_info(path, cipher=None):
+    """(record format version, records) of an existing segment; (None, 0) if it is empty or missing."""
+    if not os.path.exists(path):
+        return None, 0
+    if is_encrypted(path):
+        data = read_all(path, cipher)
+        header, size = data[:HEADER.size], len(data)
+    else:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        size = os.path.getsize(path)
+    if len(header) < HEADER.size:
+        return None, 0
+    magic, version, record_size = HEADER.unpack(header)
+    record = RECORDS.get(version)
+    if magic != MAGIC or record is None or record.size != record_size:
+        raise ValueError(f"{path} is not an Activity Manager segment (version {version})")
+    return version, (size - HEADER.size) // record_size
+
+
+# ---- Packed details of version 3 records ------------------------------------
+# Each packer maps an event's details to (label, payload) and raises if they don't
+# fit its fields; the label goes into the record's symbol, a non-empty payload
+# into .extras. Its unpacker rebuilds the details.
+COUNT = struct.Struct("<I")
+POINT_COUNT = struct.Struct("<ffI")   # x, y (NaN = absent), count (0 = absent)
+BUNDLE = struct.Struct("<H")          # bundle id string
+INTERVAL = struct.Struct("<qd")       # start (us), duration
+SESSION = struct.Struct("<Hqd")       # bundle id string, start (us), duration
+# minute (s), keys, bursts, burst keys, burst seconds (1/100), pauses, pause seconds (1/100),
+# then that many TYPING_BUCKET and TYPING_APP entries
+TYPING = struct.Struct("<qIHIIHIBH")
+TYPING_BUCKET = struct.Struct("<BI")  # interval bucket, count
+TYPING_APP = struct.Struct("<HI")     # app name string, keys
+TYPING_KEYS = {"minute", "keys", "bursts", "burst_keys", "burst_seconds", "pauses", "pause_seconds",
+               "intervals", "apps"}
+
+
+def _pack_key(details, ts_us, intern):
+    count = details.get("count")
+    return details.get("key"), COUNT.pack(count) if count else b""
+
+
+def _unpack_key(label, payload, ts_us, strings):
+    details = {"key": label}
+    if payload:
+        details["count"] = COUNT.unpack(payload)[0]
+    return details
+
+
+def _pack_point(details, ts_us, intern):
+    x, y, count = details.get("x"), details.get("y"), details.get("count")
+    if x is None and y is None and not count:
+        return None, b""
+    return None, POINT_COUNT.pack(math.nan if x is None else x, math.nan if y is None else y, count or 0)
+
+
+def _unpack_point(label, payload, ts_us, strings):
+    if not payload:
+        return {"x": None, "y": None}
+    x, y, count = POINT_COUNT.unpack(payload)
+    details = {"x": None if math.isnan(x) else x, "y": None if math.isnan(y) else y}
+    if count:
+        details["count"] = count
+    return details
+
+
+def _pack_moves(details, ts_us, intern):
+    return None, COUNT.pack(details["count"])
+
+
+def _unpack_moves(label, payload, ts_us, strings):
+    return {"count": COUNT.unpack(payload)[0] if payload else 0}
+
+
+def _pack_switch(details, ts_us, intern):
+    bundle = intern(details.get("bundle_id"))
+    return details.get("app_name"), BUNDLE.pack(bundle) if bundle else b""
+
+
+def _unpack_switch(label, payload, ts_us, strings):
+    return {"app_name": label, "bundle_id": strings.get(BUNDLE.unpack(payload)[0]) if payload else None}
+
+
+def _interval(details, ts_us):
+    duration = float(_first(details, VALUE_KEYS) or 0.0)
+    start = details.get("start")
+    # Without a stored start, derive it from the rounded duration
+    return (to_ns(start) // 1000 if start is not None else ts_us - round(duration * 1_000_000)), duration
+
+
+def _interval_details(start_us, ts_us, duration):
+    return {"start": ns_to_iso(start_us * 1000), "end": ns_to_iso(ts_us * 1000), "duration": duration}
+
+
+def _pack_idle(details, ts_us, intern):
+    return None, INTERVAL.pack(*_interval(details, ts_us))
+
+
+def _unpack_idle(label, payload, ts_us, strings):
+    start_us, duration = INTERVAL.unpack(payload)
+    return _interval_details(start_us, ts_us, duration)
+
+
+def _pack_session(details, ts_us, intern):
+    return details.get("app_name"), SESSION.pack(intern(details.get("bundle_id")), *_interval(details, ts_us))
+
+
+def _unpack_session(label, payload, ts_us, strings):
+    bundle, start_us, duration = SESSION.unpack(payload)
+    return {"app_name": label, "bundle_id": strings.get(bundle), **_interval_details(start_us, ts_us, duration)}
+
+
+def _minute_iso(seconds):
+    return datetime.datetime.fromtimestamp(seconds).isoformat(timespec="minutes")
+
+
+def _hundredths(seconds):
+    value = round(seconds * 100)
+    if value / 100 != seconds:
+        raise ValueError(f"{seconds} is not rounded to hundredths")
+    return value
+
+
+def _pack_typing(details, ts_us, intern):
+    if details.keys() != TYPING_KEYS:
+        raise ValueError("not a TypingMetrics record")
+    minute = int(datetime.datetime.fromisoformat(details["minute"]).timestamp())
+    if _minute_iso(minute) != details["minute"]:
+        raise ValueError(f"{details['minute']} is not a minute")
+    intervals, apps = details["intervals"], details["apps"]
+    head = TYPING.pack(minute, details["keys"], details["bursts"], details["burst_keys"],
+                       _hundredths(details["burst_seconds"]), details["pauses"],
+                       _hundredths(details["pause_seconds"]), len(intervals), len(apps))
+    return None, b"".join([head, *(TYPING_BUCKET.pack(bucket, count) for bucket, count in intervals),
+                           *(TYPING_APP.pack(intern(app), keys) for app, keys in apps.items())])
+
+
+def _unpack_typing(label, payload, ts_us, strings):
+    minute, keys, bursts, burst_keys, burst_cs, pauses, pause_cs, n_intervals, n_apps = TYPING.unpack_from(payload)
+    offset = TYPING.size + n_intervals * TYPING_BUCKET.size
+    intervals = TYPING_BUCKET.iter_unpack(payload[TYPING.size:offset])
+    apps = TYPING_APP.iter_unpack(payload[offset:offset + n_apps * TYPING_APP.size])
+    return {
+        "minute": _minute_iso(minute),
+        "keys": keys,
+        "bursts": bursts,
+        "burst_keys": burst_keys,
+        "burst_seconds": burst_cs / 100,
+        "pauses": pauses,
+        "pause_seconds": pause_cs / 100,
+        "intervals": [[bucket, count] for bucket, count in intervals],
+        "apps": {strings.get(app): count for app, count in apps},
+    }
+
+
+# event type -> (packer, unpacker); other types keep their details as JSON
+PACKERS = {
+    "key": (_pack_key, _unpack_key),
+    "click": (_pack_point, _unpack_point),
+    "scroll": (_pack_point, _unpack_point),
+    "mouse_moves": (_pack_moves, _unpack_moves),
+    "app_switch": (_pack_switch, _unpack_switch),
+    "app_session": (_pack_session, _unpack_session),
+    "idle": (_pack_idle, _unpack_idle),
+    "typing": (_pack_typing, _unpack_typing),
+}
+PACK_ERRORS = (KeyError, TypeError, ValueError, OverflowError, AttributeError, struct.error)
+
+
+def _symbol(kind, label):
+    """String interned for an (event type, label) pair; the leading NUL tells symbols from plain strings."""
+    return f"\0{kind}" if label is None else f"\0{kind}\0{label}"
+
+
+def _extra(index, kind, payload):
+    return EXTRA.pack(index, kind, len(payload)) + payload
+
+
+class StringTable:
+    """Bidirectional intern table backed by the .strings file."""
+
+    def __init__(self, path, cipher=None):
+        self.path = path
+        self.ids = {}
+        self.strings = [None]  # id 0 = absent
+        if os.path.exists(path):
+            data = read_all(path, cipher)
+            offset = 0
+            while offset + STRING_LEN.size <= len(data):
+                (length,) = STRING_LEN.unpack_from(data, offset)
+                end = offset + STRING_LEN.size + length
+                if end > len(data):
+                    break  # torn tail write
+                self._add(data[offset + STRING_LEN.size:end].decode("utf-8"))
+                offset = end
+
+    def _add(self, value):
+        self.ids[value] = len(self.strings)
+        self.strings.append(value)
+        return self.ids[value]
+
+    def intern(self, value, pending):
+        """Return the id for ``value``, queuing its encoding in ``pending`` if new."""
+        if value is None:
+            return 0
+        value = str(value)
+        string_id = self.ids.get(value)
+        if string_id is None:
+            if len(self.strings) > MAX_STRINGS:
+                raise ValueError(f"String table {self.path} is full ({MAX_STRINGS} entries)")
+            string_id = self._add(value)
+            encoded = value.encode("utf-8")
+            pending.append(STRING_LEN.pack(len(encoded)) + encoded)
+        return string_id
+
+    def get(self, string_id):
+        return self.strings[string_id] if string_id < len(self.strings) else None
+
+
+class ExtrasTable:
+    """
+    Time bases and details of a version 3 segment, read from its .extras file.
+
+    Entries for records beyond ``count`` belong to a batch whose records were never
+    written (a crash between the two writes) and are left out; a writer reusing
+    those indexes first appends a RESET entry so later readers drop them as well.
+    """
+
+    def __init__(self, path, cipher=None, count=None):
+        self.path = path
+        self.base_index = []  # first record index of each time base
+        self.bases = []       # the bases, in microseconds since the epoch
+        self.details = {}     # record index -> (kind, payload offset, payload length)
+        self.symbols = {}     # record index -> symbol id, for ids of WIDE or more
+        self.last = -1        # highest record index with an entry
+        self.data = read_all(path, cipher) if os.path.exists(path) else b""
+        offset = 0
+        while offset + EXTRA.size <= len(self.data):
+            index, kind, length = EXTRA.unpack_from(self.data, offset)
+            start = offset + EXTRA.size
+            offset = start + length
+            if offset > len(self.data):
+                break  # torn tail write
+            if kind == RESET:
+                self.drop_from(index)
+                continue
+            if kind == BASE:
+                self.base_index.append(index)
+                self.bases.append(BASE_US.unpack_from(self.data, start)[0])
+            elif kind == SYMBOL:
+                self.symbols[index] = SYMBOL_ID.unpack_from(self.data, start)[0]
+            else:
+                self.details[index] = (kind, start, length)
+            self.last = max(self.last, index)
+        self.stale = count is not None and self.last >= count
+        if self.stale:
+            self.drop_from(count)
+
+    def drop_from(self, index):
+        """Forget the entries of records ``index`` onwards."""
+        keep = bisect.bisect_left(self.base_index, index)
+        del self.base_index[keep:], self.bases[keep:]
+        self.details = {i: entry for i, entry in self.details.items() if i < index}
+        self.symbols = {i: symbol for i, symbol in self.symbols.items() if i < index}
+        self.last = min(self.last, index - 1)
+
+    def base(self, index):
+        """Time base (us) of record ``index``."""
+        return self.bases[bisect.bisect_right(self.base_index, index) - 1]
+
+    def payload(self, index):
+        """(kind, payload) stored for record ``index``, or (None, b"")."""
+        entry = self.details.get(index)
+        if entry is None:
+            return None, b""
+        kind, start, length = entry
+        return kind, self.data[start:start + length]
+
+
+class BinaryStorage:
+    def __init__(self, path="logs/activity.bin", cipher=None):
+        """
+        :param cipher: optional ChunkCipher; every batch is sealed as one encrypted chunk
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.cipher = cipher
+        self.strings = StringTable(path + ".strings", cipher)
+        self._lock = threading.Lock()
+
+        version, self.count = segment_info(path, cipher)
+        self.version = version or VERSION
+        self.record = RECORDS[self.version]
+        if version is not None and not is_encrypted(path):
+            size = HEADER.size + self.count * self.record.size
+            if os.path.getsize(path) > size:
+                os.truncate(path, size)  # drop a torn tail record before appending
+        self.base = None
+        self.extras_file = None
+        reset = b""
+        if self.version == 3:
+            extras = ExtrasTable(path + ".extras", cipher, self.count)
+            if extras.bases:
+                self.base = extras.bases[-1]
+            if extras.stale:
+                reset = _extra(self.count, RESET, b"")
+        if cipher is not None:
+            self.file = EncryptedFile(path, cipher)
+            self.strings_file = EncryptedFile(path + ".strings", cipher)
+            if self.version == 3:
+                self.extras_file = EncryptedFile(path + ".extras", cipher)
+        else:
+            self.file = open(path, "ab")
+            self.strings_file = open(path + ".strings", "ab")
+            if self.version == 3:
+                self.extras_file = open(path + ".extras", "ab")
+        if reset:
+            self.extras_file.write(reset)
+            self.extras_file.flush()
+        if version is None:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            self.file.flush()
+
+    def log_event(self, event_type: str, details: dict, timestamp=None):
+        self.log_events([(timestamp, event_type, details)])
+
+    def log_events(self, events):
+        """
+        Append a batch of (timestamp, event_type, details) tuples.
+
+        ``timestamp`` may be an ISO string, float seconds, int nanoseconds or None
+        (taken from the details' timestamp field, else now).
+        """
+        with self._lock:
+            count, base = self.count, self.base
+            new_strings = []
+            extras = []
+            records = bytearray()
+            try:
+                for timestamp, event_type, details in events:
+                    records += self._pack(timestamp, event_type, details, new_strings, extras)
+            except BaseException:
+                self.count, self.base = count, base  # nothing of the batch was written
+                raise
+            if new_strings:
+                self.strings_file.write(b"".join(new_strings))
+                self.strings_file.flush()
+            if extras:
+                self.extras_file.write(b"".join(extras))
+                self.extras_file.flush()
+            self.file.write(records)
+            self.file.flush()
+
+    def _pack(self, timestamp, event_type, details, new_strings, extras):
+        details = details or {}
+        if timestamp is None:
+            timestamp = _first(details, TS_KEYS)
+        if timestamp is None:
+            ts_ns = int(datetime.datetime.now().timestamp() * 1_000_000_000)
+        else:
+            ts_ns = to_ns(timestamp)
+        if self.version == 3:
+            return self._pack_v3(ts_ns, event_type, details, new_strings, extras)
+
+        value = _first(details, VALUE_KEYS)
+        fields = (
+            ts_ns,
+            self.strings.intern(event_type, new_strings),
+            self.strings.intern(_first(details, A_KEYS), new_strings),
+            self.strings.intern(_first(details, B_KEYS), new_strings),
+            float(value) if value is not None else 0.0,
+        )
+        if self.record is RECORD_V1:
+            return RECORD_V1.pack(*fields)
+        aux = 0
+        if event_type in INTERVAL_TYPES and details.get("start") is not None:
+            aux = to_ns(details["start"])
+        elif event_type in POINT_TYPES:
+            aux = pack_point(details.get("x"), details.get("y"))
+        return RECORD_V2.pack(*fields, aux)
+
+    def _pack_v3(self, ts_ns, event_type, details, new_strings, extras):
+        ts_us = ts_ns // 1000
+        index = self.count
+        if self.base is None or not 0 <= ts_us - self.base < TICKS:
+            self.base = ts_us - MAX_LATENESS * 1_000_000  # leave room for records written late
+            extras.append(_extra(index, BASE, BASE_US.pack(self.base)))
+
+        def intern(value):
+            return self.strings.intern(value, new_strings)
+
+        try:
+            label, payload = PACKERS[event_type][0](details, ts_us, intern)
+            kind = PACKED
+        except PACK_ERRORS:  # another type, or details that don't fit its mapping: kept whole
+            label, payload = None, json.dumps(details).encode("utf-8") if details else b""
+            kind = RAW
+        if payload:
+            extras.append(_extra(index, kind, payload))
+        symbol = intern(_symbol(event_type, label))
+        if symbol >= WIDE:
+            extras.append(_extra(index, SYMBOL, SYMBOL_ID.pack(symbol)))
+            symbol = WIDE
+        self.count += 1
+        return RECORD.pack(ts_us - self.base, symbol)
+
+    def query(self, start, end, types=None):
+        """Yield {"time", "type", "details"} events in [start, end) by bisecting an mmap of the segment."""
+        return query_segment(self.path, start, end, types, self.cipher)
+
+    def sync(self):
+        """fsync the records, string table and extras written so far."""
+        with self._lock:
+            for f in (self.strings_file, self.extras_file, self.file):
+                if f is not None:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def close(self):
+        self.file.close()
+        self.strings_file.close()
+        if self.extras_file is not None:
+            self.extras_file.close()
+
+
+class BinaryLogReader:
+    """
+    Zero-copy reader: records are unpacked straight from an mmap of the segment
+    (or from its decrypted plaintext, for encrypted segments).
+
+    Raw records are (ts_ns, symbol, index) tuples in version 3 segments and the
+    stored (ts_ns, type_id, a_id, b_id, value[, aux]) fields in older ones;
+    ``to_event`` decodes either.
+
+    Records written after the reader was opened are not visible; reopen to refresh.
+    """
+
+    def __init__(self, path, cipher=None):
+        self.path = path
+        self.strings = StringTable(path + ".strings", cipher)
+        self._file = open(path, "rb")
+        self._mmap = None
+        self.version = VERSION
+        self.record = RECORD
+        self.extras = None
+        self._symbols = {}
+        if is_encrypted(path):
+            if cipher is None:
+                raise ValueError(f"{path} is encrypted; a ChunkCipher is needed to read it")
+            data = read_all(path, cipher)
+        else:
+            size = os.fstat(self._file.fileno()).st_size
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+            data = self._mmap
+        size = len(data) if data is not None else 0
+
+        if data is None or size < HEADER.size:
+            self._records = memoryview(b"")
+        else:
+            magic, self.version, record_size = HEADER.unpack_from(data, 0)
+            self.record = RECORDS.get(self.version)
+            if magic != MAGIC or self.record is None or record_size != self.record.size:
+                raise ValueError(f"{path} is not an Activity Manager segment (version {self.version})")
+            usable = (size - HEADER.size) // record_size * record_size  # ignore a torn tail record
+            self._records = memoryview(data)[HEADER.size:HEADER.size + usable]
+        if self.version == 3:
+            self.extras = ExtrasTable(path + ".extras", cipher, len(self))
+
+    def __len__(self):
+        return len(self._records) // self.record.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        record = self.record.unpack_from(self._records, index * self.record.size)
+        if self.version == 3:
+            tick, symbol = record
+            if symbol == WIDE:
+                symbol = self.extras.symbols[index]
+            return (self.extras.base(index) + tick) * 1000, symbol, index
+        return record
+
+    def __iter__(self):
+        return self.slice()
+
+    def slice(self, start=0, stop=None):
+        """Iterate raw record tuples in [start, stop) without copying the underlying bytes."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if self.version < 3:
+            return self.record.iter_unpack(self._records[start * self.record.size:stop * self.record.size])
+        return self._slice_v3(start, stop)
+
+    def _slice_v3(self, start, stop):
+        base_index, bases, wide = self.extras.base_index, self.extras.bases, self.extras.symbols
+        k = bisect.bisect_right(base_index, start) - 1
+        while start < stop:
+            end = min(base_index[k + 1], stop) if k + 1 < len(base_index) else stop
+            base = bases[k]
+            run = self._records[start * RECORD.size:end * RECORD.size]
+            for index, (tick, symbol) in enumerate(RECORD.iter_unpack(run), start):
+                yield (base + tick) * 1000, wide[index] if symbol == WIDE else symbol, index
+            start = end
+            k += 1
+
+    def bisect(self, ts_ns):
+        """
+        Index of the first record with ts >= ts_ns, if records are in time order. As they
+        are only nearly so, no record before ``bisect(t - MAX_LATENESS)`` has ts >= t.
+        """
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid][0] < ts_ns:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def symbol(self, symbol_id):
+        """(event type, label) a version 3 symbol stands for."""
+        pair = self._symbols.get(symbol_id)
+        if pair is None:
+            kind, sep, label = self.strings.get(symbol_id)[1:].partition("\0")
+            pair = self._symbols[symbol_id] = (kind, label if sep else None)
+        return pair
+
+    def type_ids(self, types):
+        """Values of ``record[1]`` that mark events of the given types."""
+        if self.version < 3:
+            return {self.strings.ids[t] for t in types if t in self.strings.ids}
+        return {i for i, s in enumerate(self.strings.strings)
+                if s and s[0] == "\0" and self.symbol(i)[0] in types}
+
+    def to_dict(self, record):
+        """Decode a raw record tuple into a readable event dict."""
+        if self.version == 3:
+            event = self.to_event(record)
+            details = event["details"]
+            return {"time": event["time"], "type": event["type"], "a": self.symbol(record[1])[1],
+                    "b": details.get("bundle_id"), "value": _first(details, VALUE_KEYS)}
+        ts_ns, type_id, a_id, b_id, value = record[:5]
+        return {
+            "time": ns_to_iso(ts_ns),
+            "type": self.strings.get(type_id),
+            "a": self.strings.get(a_id),
+            "b": self.strings.get(b_id),
+            "value": value,
+        }
+
+    def to_event(self, record):
+        """Decode a raw record tuple into the normalized {"time", "type", "details"} shape."""
+        if self.version == 3:
+            ts_ns, symbol, index = record
+            kind, label = self.symbol(symbol)
+            entry, payload = self.extras.payload(index)
+            if entry == RAW:
+                details = json.loads(payload)
+            elif kind in PACKERS:
+                details = PACKERS[kind][1](label, payload, ts_ns // 1000, self.strings)
+            else:
+                details = {}
+            return {"time": ns_to_iso(ts_ns), "type": kind, "details": details}
+
+        ts_ns, type_id, a_id, b_id, value = record[:5]
+        aux = record[5] if len(record) > 5 else None  # version 1 records have no aux field
+        kind = self.strings.get(type_id)
+        a, b = self.strings.get(a_id), self.strings.get(b_id)
+        if kind == "key":
+            details = {"key": a}
+        elif kind in POINT_TYPES:
+            x, y = unpack_point(aux) if aux is not None else (None, None)
+            details = {"x": x, "y": y}
+        elif kind == "mouse_moves":
+            details = {"count": int(value)}
+        elif kind == "app_switch":
+            details = {"app_name": a, "bundle_id": b}
+        elif kind in INTERVAL_TYPES:
+            # Without a stored start, derive it from the rounded duration
+            start_ns = aux or ts_ns - round(value * 1_000_000_000)
+            details = {"start": ns_to_iso(start_ns), "end": ns_to_iso(ts_ns), "duration": value}
+            if kind == "app_session":
+                details = {"app_name": a, "bundle_id": b, **details}
+        else:
+            details = {"value": value}
+            if a_id:
+                details["name"] = a
+            if b_id:
+                details["bundle_id"] = b
+        if value and (kind == "key" or kind in POINT_TYPES):
+            details["count"] = int(value)  # a coalesced record (absent count is stored as 0)
+        return {"time": ns_to_iso(ts_ns), "type": kind, "details": details}
+
+    def close(self):
+        self._records.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+def query_segment(path, start, end, types=None, cipher=None):
+    """Read-only BinaryStorage.query over a segment path (usable from any process)."""
+    reader = BinaryLogReader(path, cipher)
+    try:
+        start_ns, end_ns = iso_to_ns(start), iso_to_ns(end)
+        lateness = MAX_LATENESS * 1_000_000_000
+        type_ids = None if types is None else reader.type_ids(types)
+        for record in reader.slice(reader.bisect(start_ns - lateness)):
+            ts_ns = record[0]
+            if ts_ns >= end_ns:
+                if ts_ns >= end_ns + lateness:
+                    break  # nothing written later can still be timed before ``end``
+                continue
+            if ts_ns >= start_ns and (type_ids is None or record[1] in type_ids):
+                yield reader.to_event(record)
+    finally:
+        reader.close()
+
+
+# ---- JSONL converter ------------------------------------------------------
+def _first(details, keys):
+    for key in keys:
+        value = details.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def _read_log(path, event_type=None, cipher=None):
+    """Yield (ts_ns, event_type, details) from one JSON-lines tracker log (all its segments)."""
+    for segment in segments_between(path):
+        with open_segment(segment, cipher) as f:
+            yield from _parse_lines(f, event_type)
+
+
+def _parse_lines(f, event_type):
+    for line in f:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(record, dict):
+            continue
+        if "details" in record and "type" in record:  # StorageManager format
+            details = dict(record["details"] or {})
+            kind = record["type"]
+        else:
+            details = record
+            kind = event_type or record.get("event", "unknown")
+        timestamp = _first(record, TS_KEYS) or _first(details, TS_KEYS)
+        if timestamp is None:
+            continue
+        yield iso_to_ns(timestamp), kind, details
+
+
+# log file -> event type for files whose records don't carry one
+LOG_TYPES = {
+    "keyboard.log": "key",
+    "mouse.log": None,      # "event" field: click / scroll / mouse_moves
+    "apps.log": None,       # "event" field: switch
+    "idle.log": "idle",
+    "activity.log": None,   # StorageManager format
+}
+
+
+def convert_logs(log_dir, out_path, cipher=None):
+    """
+    Merge the JSON-lines logs in ``log_dir`` into one time-ordered binary segment.
+
+    :param cipher: optional ChunkCipher used to read encrypted logs and encrypt the segment
+    """
+    streams = [
+        _read_log(os.path.join(log_dir, name), event_type, cipher)
+        for name, event_type in LOG_TYPES.items()
+        if os.path.exists(os.path.join(log_dir, name))
+    ]
+    storage = BinaryStorage(out_path, cipher)
+    count = 0
+    batch = []
+    for ts_ns, kind, details in heapq.merge(*streams, key=lambda e: e[0]):
+        batch.append((ts_ns, kind, details))
+        if len(batch) >= 10000:
+            storage.log_events(batch)
+            count += len(batch)
+            batch = []
+    storage.log_events(batch)
+    count += len(batch)
+    storage.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert JSON-lines logs to a binary segment.")
+    parser.add_argument("log_dir", help="directory holding keyboard.log, mouse.log, ...")
+    parser.add_argument("out_path", help="segment file to create or append to")
+    args = parser.parse_args()
+    count = convert_logs(args.log_dir, args.out_path)
+    print(f"[BinaryStorage] Converted {count} records into {args.out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Encryption at Rest — authenticated, chunked AES-GCM for every storage file.
+
+Writers seal each *batch* (one pipeline commit, one backend batch) as a single
+chunk, so the cipher cost is paid per batch, not per record. An encrypted
+file is:
+
+    header   MAGIC (8) + key id (8)
+    chunk    length (4, of nonce + ciphertext) + nonce (12) + ciphertext+tag
+
+Each chunk's associated data is the header plus the chunk's file offset, so
+chunks can't be reordered, spliced between files or decrypted with the wrong
+key unnoticed. A torn chunk at the tail (crash mid-write) is ignored.
+
+Requires the optional ``cryptography`` package. Decrypt sealed segments in
+parallel with:
+
+    python -m activity_manager.storage.encryption logs/activity.key logs/keyboard.log.2025* --workers 4
+"""
+
+import hashlib
+import os
+import struct
+from itertools import repeat
+
+MAGIC = b"AMENC1\0\0"
+HEADER_SIZE = 16
+FRAME_LEN = struct.Struct("<I")
+OFFSET = struct.Struct("<Q")
+NONCE_SIZE = 12
+KEY_SIZE = 32
+
+
+def load_key(path="logs/activity.key"):
+    """Read the 256-bit key at ``path``, creating it (mode 0600) on first use."""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            key = f.read()
+        if len(key) != KEY_SIZE:
+            raise ValueError(f"{path} does not hold a {KEY_SIZE}-byte key")
+        return key
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    key = os.urandom(KEY_SIZE)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def derive_key(passphrase: str, salt: bytes):
+    """256-bit key from a passphrase (scrypt)."""
+    return hashlib.scrypt(passphrase.encode("utf-8"), salt=salt, n=2 ** 14, r=8, p=1, dklen=KEY_SIZE)
+
+
+class ChunkCipher:
+    def __init__(self, key: bytes):
+        try:
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        except ImportError as e:
+            raise ImportError("Encryption at rest requires the 'cryptography' package") from e
+        if len(key) != KEY_SIZE:
+            raise ValueError(f"Encryption key must be {KEY_SIZE} bytes")
+        self.key = key
+        self.key_id = hashlib.sha256(b"activity-manager" + key).digest()[:8]
+        self.header = MAGIC + self.key_id
+        self._aead = AESGCM(key)
+
+    def seal(self, plaintext: bytes, offset: int) -> bytes:
+        """Encrypt one chunk that will be written at file position ``offset``."""
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = self._aead.encrypt(nonce, plaintext, self.header + OFFSET.pack(offset))
+        return FRAME_LEN.pack(NONCE_SIZE + len(ciphertext)) + nonce + ciphertext
+
+    def open(self, frame: bytes, offset: int) -> bytes:
+        """Decrypt the body (nonce + ciphertext) of the chunk found at ``offset``."""
+        return self._aead.decrypt(frame[:NONCE_SIZE], frame[NONCE_SIZE:], self.header + OFFSET.pack(offset))
+
+    def seal_blob(self, plaintext: bytes, context: bytes) -> bytes:
+        """Encrypt a standalone value (nonce + ciphertext), bound to ``context``."""
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._aead.encrypt(nonce, plaintext, self.header + context)
+
+    def open_blob(self, blob: bytes, context: bytes) -> bytes:
+        return self._aead.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], self.header + context)
+
+    def check_header(self, header: bytes, path=""):
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an encrypted Activity Manager file")
+        if header != self.header:
+            raise ValueError(f"{path} was encrypted with a different key")
+
+
+def is_encrypted(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+class EncryptedFile:
+    """Append-only writer: each ``write()`` becomes one sealed chunk."""
+
+    def __init__(self, path, cipher):
+        self.path = path
+        self.cipher = cipher
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+        if self.size == 0:
+            self.file.write(cipher.header)
+            self.file.flush()
+            self.size = HEADER_SIZE
+        else:
+            with open(path, "rb") as f:
+                cipher.check_header(f.read(HEADER_SIZE), path)
+
+    def write(self, data):
+        """Seal and append ``data`` (str or bytes); returns the chunk's file offset."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        offset = self.size
+        frame = self.cipher.seal(data, offset)
+        self.file.write(frame)
+        self.size += len(frame)
+        return offset
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        self.file.flush()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+class DecryptingReader:
+    """
+    Streaming reader over an encrypted file: decrypts one chunk at a time.
+
+    ``seek()`` takes a chunk offset (as recorded by ``EncryptedFile.write``);
+    iterating yields plaintext lines as bytes, like a binary file (str if ``text``).
+    """
+
+    def __init__(self, path, cipher, fileobj=None, text=False):
+        self.path = path
+        self.cipher = cipher
+        self.text = text
+        self.file = fileobj if fileobj is not None else open(path, "rb")
+        self.file.seek(0)
+        cipher.check_header(self.file.read(HEADER_SIZE), path)
+        self.offset = HEADER_SIZE
+
+    def seek(self, offset):
+        self.offset = max(offset, HEADER_SIZE)
+        self.file.seek(self.offset)
+
+    def chunks(self):
+        """Yield decrypted chunks from the current offset; stops at a torn tail."""
+        while True:
+            head = self.file.read(FRAME_LEN.size)
+            if len(head) < FRAME_LEN.size:
+                return
+            (length,) = FRAME_LEN.unpack(head)
+            frame = self.file.read(length)
+            if len(frame) < length:
+                return
+            plaintext = self.cipher.open(frame, self.offset)
+            self.offset += FRAME_LEN.size + length
+            yield plaintext
+
+    def read(self):
+        return b"".join(self.chunks())
+
+    def __iter__(self):
+        lines = self._lines()
+        if self.text:
+            return (line.decode("utf-8") for line in lines)
+        return lines
+
+    def _lines(self):
+        tail = b""
+        for chunk in self.chunks():
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+        if tail:
+            yield tail
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_all(path, cipher):
+    """Whole plaintext of a file, decrypting it if it is encrypted."""
+    if cipher is not None and is_encrypted(path):
+        with DecryptingReader(path, cipher) as reader:
+            return reader.read()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# ---- Parallel decryption of sealed segments -------------------------------
+def decrypt_file(key, path, out_path=None):
+    """Decrypt ``path`` into ``out_path`` (default: path + ".dec"); returns the output path."""
+    out_path = out_path or path + ".dec"
+    with DecryptingReader(path, ChunkCipher(key)) as reader, open(out_path, "wb") as out:
+        for chunk in reader.chunks():
+            out.write(chunk)
+    return out_path
+
+
+def decrypt_files(key, paths, workers=None):
+    """Decrypt many sealed segments, one worker process per segment at a time."""
+    from concurrent.futures import ProcessPoolExecutor  # only needed here; keeps imports light
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(decrypt_file, repeat(key), paths))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Decrypt sealed log segments in parallel.")
+    parser.add_argument("key_file", help="32-byte key file (e.g. logs/activity.key)")
+    parser.add_argument("paths", nargs="+", help="encrypted segments")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    with open(args.key_file, "rb") as f:
+        key = f.read()
+    for out in decrypt_files(key, args.paths, args.workers):
+        print(f"[Encryption] Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
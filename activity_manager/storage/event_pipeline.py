@@ -0,0 +1,398 @@
+"""
+Event Pipeline — asynchronous write-behind queue shared by all trackers.
+
+Tracker callbacks only enqueue records; a single writer thread drains the
+queue and group-commits them (one write + flush per target per batch), either
+when ``batch_size`` records are pending or when ``flush_interval`` expires.
+
+With a MetricsRegistry, every write is timed (``write.file`` for log files,
+``write.<Backend>`` for storage backends) and ``storage.records_written`` and
+``storage.bytes_written`` (log file payload) are counted.
+
+With a WriteAheadRing (``wal``), the queue is replaced by the memory-mapped
+ring: ``submit`` marshals the record and copies it into the ring, so it
+survives a crash of the process before its commit, and the writer drains the
+ring. Under the "interval" and "batch" fsync policies the ring's tail only
+advances past records once every file and backend they were written to has
+been fsync'ed (``sync()``), so a power loss can't drop records the ring has
+already released. Records left in the ring by a previous run are committed
+first. Storage backends are journaled by name, so they must be
+``register``ed before ``start()``.
+"""
+
+import json
+import marshal
+import queue
+import threading
+import time
+
+from activity_manager.storage.segments import SegmentedLog
+
+_STOP = object()
+_FLUSH = object()  # queue item (_FLUSH, event): commit what's pending, then set the event
+WAL_BATCH_BYTES = 4 * 1024 * 1024  # most ring bytes decoded per committed batch
+# Ring payloads use marshal: ~10x faster than json for the plain dicts and tuples records
+# are made of, and the ring is a short-lived journal rather than an archive
+MARSHAL_VERSION = 4
+
+
+class _UnknownTarget:
+    """Stands in for a journaled backend name nobody registered in this run."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def log_events(self, records):
+        raise LookupError(f"no storage backend registered as {self.name!r}")
+
+
+class EventPipeline:
+    def __init__(self, max_queue=10000, batch_size=256, flush_interval=1.0, rotation=None,
+                 cipher=None, metrics=None, wal=None):
+        """
+        :param max_queue: maximum number of pending records before new ones are dropped
+        :param batch_size: commit as soon as this many records are pending
+        :param flush_interval: commit pending records at least this often (seconds)
+        :param rotation: optional LogRotation applied to every file path written
+        :param cipher: optional ChunkCipher; each batch per file is sealed as one encrypted chunk
+        :param metrics: optional MetricsRegistry receiving write latency, bytes and queue gauges
+        :param wal: optional WriteAheadRing journaling records instead of the in-memory
+                    queue (``max_queue`` then doesn't apply; the ring's capacity does)
+        """
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotation = rotation
+        self.cipher = cipher
+        self.metrics = metrics
+        self.wal = wal
+
+        self.running = False
+        self.thread = None
+        self._files = {}  # path -> SegmentedLog, kept open between batches
+        self._targets = {}  # name -> backend, for records journaled in the ring
+        self._names = {}    # id(backend) -> name
+        self._unknown = {}  # name -> _UnknownTarget, for journaled names nobody registered
+        self._wake = threading.Event()
+        self._pending = 0   # records appended to the ring since the last drain (a hint)
+        self._applied = 0   # records drained from the ring
+        self._unsynced = set()  # targets written since the last ring checkpoint
+        self._drained = threading.Condition()  # notified as _applied advances
+
+        # Counters (written by the writer thread, read by get_stats)
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._rate = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+        if metrics is not None:
+            metrics.gauge("pipeline.queue_depth", self.depth)
+            metrics.gauge("pipeline.dropped", lambda: self.dropped)
+            metrics.gauge("pipeline.batches", lambda: self.batches)
+            if wal is not None:
+                metrics.gauge("pipeline.wal_bytes", wal.pending_bytes)
+                metrics.gauge("pipeline.wal_syncs", lambda: wal.syncs)
+
+    def register(self, target, name=None):
+        """Name a storage backend so records journaled for it can be replayed after a restart."""
+        name = name or type(target).__name__
+        self._targets[name] = target
+        self._names[id(target)] = name
+        return name
+
+    # ---- Producer side ----------------------------------------------------
+    def submit(self, target, record) -> bool:
+        """
+        Enqueue a record without blocking.
+
+        :param target: a file path (str) or a storage backend implementing .log_events
+        :param record: dict (written as a JSON line), str (written as-is),
+                       or a (timestamp, event_type, details) tuple for backends
+        :return: False if the queue was full and the record was dropped
+        """
+        if self.wal is not None:
+            if not self.wal.append(self._journal(target, record)):
+                self.dropped += 1
+                return False
+            self.submitted += 1
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._wake.set()
+            return True
+        try:
+            self.queue.put_nowait((target, record))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    # ---- Lifecycle --------------------------------------------------------
+    def start(self):
+        if not self.running:
+            self.running = True
+            if self.wal is not None and self.wal.recovered:
+                print(f"[EventPipeline] Recovering {self.wal.recovered} records from {self.wal.path}")
+            run = self._run if self.wal is None else self._run_wal
+            self.thread = threading.Thread(target=run, daemon=True)
+            self.thread.start()
+            print("[EventPipeline] Started.")
+
+    def flush(self, timeout=5.0) -> bool:
+        """
+        Commit everything submitted (or recovered) before the call now, instead of at the
+        next batch, and wait for it to be written (or fail).
+
+        :return: False if the pipeline isn't running or ``timeout`` expired first
+        """
+        if not self.running:
+            return False
+        if self.wal is None:
+            done = threading.Event()
+            try:
+                self.queue.put((_FLUSH, done), timeout=timeout)
+            except queue.Full:
+                return False
+            return done.wait(timeout)
+        target = self.wal.recovered + self.wal.appended
+        self._wake.set()
+        with self._drained:
+            return self._drained.wait_for(lambda: self._applied >= target or not self.running, timeout)
+
+    def stop(self):
+        """Drain everything still queued, then close open files."""
+        if self.running:
+            self.running = False
+            if self.wal is None:
+                self.queue.put(_STOP)
+            else:
+                self._wake.set()
+            if self.thread:
+                self.thread.join()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        if self.wal is not None:
+            self.wal.close()
+        print("[EventPipeline] Stopped.")
+
+    # ---- Writer thread ----------------------------------------------------
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                # Pick up anything enqueued after the sentinel was issued
+                flushes = []
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        continue
+                    (flushes if item[0] is _FLUSH else batch).append(item)
+                self._commit(batch)
+                for _, done in flushes:
+                    done.set()
+                return
+
+            if item is not None and item[0] is _FLUSH:
+                self._commit(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                item[1].set()
+            elif item is not None:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._commit(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _run_wal(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._pending = 0
+            running = self.running
+            self._drain()
+            if not running:
+                self._drain(final=True)  # anything appended while stopping
+                with self._drained:
+                    self._drained.notify_all()  # flush() callers stop waiting
+                return
+
+    def _drain(self, final=False):
+        """Commit everything pending in the ring, checkpointing it as its fsync policy says."""
+        wal = self.wal
+        while True:
+            payloads, end = wal.read(max_bytes=WAL_BATCH_BYTES)
+            if payloads:
+                self._commit([self._replay(p) for p in payloads])
+                wal.consume(end)
+                with self._drained:
+                    self._applied += len(payloads)
+                    self._drained.notify_all()
+            if wal.fsync == "never":
+                wal.advance(wal.applied)
+            elif wal.applied > wal.tail and (final or wal.sync_due()
+                                             or wal.pending_bytes() > wal.capacity // 2):
+                self._checkpoint()
+            if not payloads:
+                return
+
+    def _checkpoint(self):
+        """fsync every target written since the last checkpoint, then release their records."""
+        for target in list(self._unsynced):
+            try:
+                if isinstance(target, str):
+                    self._files[target].sync()
+                else:
+                    sync = getattr(target, "sync", None)
+                    if sync:
+                        sync()
+            except Exception as e:
+                # The tail stays put: the records are replayed by the next run
+                print(f"[EventPipeline] ERROR: Failed to sync storage: {e}")
+                return
+            self._unsynced.discard(target)
+        self.wal.advance(self.wal.applied)
+        self.wal.sync()
+
+    def _journal(self, target, record) -> bytes:
+        """Record -> ring payload: marshal of (path, None, record) or (None, backend name, record)."""
+        if isinstance(target, str):
+            return marshal.dumps((target, None, record), MARSHAL_VERSION)
+        name = self._names.get(id(target)) or self.register(target)
+        return marshal.dumps((None, name, record), MARSHAL_VERSION)
+
+    def _replay(self, payload):
+        path, name, record = marshal.loads(payload)
+        if path is not None:
+            return path, record
+        # Unknown backend: _commit reports the write failure and counts the records dropped
+        target = self._targets.get(name) or self._unknown.setdefault(name, _UnknownTarget(name))
+        return target, record
+
+    def _commit(self, batch):
+        """Write one batch: one write and one flush per target (rotating files as needed)."""
+        if not batch:
+            return
+
+        grouped = {}
+        for target, record in batch:
+            grouped.setdefault(target, []).append(record)
+
+        metrics = self.metrics
+        for target, records in grouped.items():
+            t0 = time.perf_counter_ns()
+            try:
+                if isinstance(target, str):
+                    data = "".join(_encode(r) for r in records)
+                    self._open(target).write(data)
+                else:
+                    target.log_events(records)
+            except Exception as e:
+                print(f"[EventPipeline] ERROR: Failed to write {len(records)} records: {e}")
+                self.dropped += len(records)
+                continue
+            self.written += len(records)
+            if self.wal is not None:
+                self._unsynced.add(target)
+            if metrics is not None:
+                if isinstance(target, str):
+                    metrics.observe_ns("write.file", time.perf_counter_ns() - t0)
+                    metrics.count("storage.bytes_written", len(data))
+                else:
+                    metrics.observe_ns(f"write.{type(target).__name__}", time.perf_counter_ns() - t0)
+                metrics.count("storage.records_written", len(records))
+
+        self.batches += 1
+        self._update_rate(len(batch))
+
+    def _open(self, path):
+        log = self._files.get(path)
+        if log is None:
+            log = self._files[path] = SegmentedLog(path, self.rotation, cipher=self.cipher)
+        return log
+
+    def _update_rate(self, count):
+        self._window_count += count
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self._rate = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+
+    # ---- Public API -------------------------------------------------------
+    def depth(self):
+        """Records submitted (or recovered) but not yet committed."""
+        if self.wal is None:
+            return self.queue.qsize()
+        return self.wal.recovered + self.wal.appended - self._applied
+
+    def get_stats(self):
+        return {
+            "events_per_sec": round(self._rate, 1),
+            "queue_depth": self.depth(),
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+
+class PeriodicFlush:
+    """
+    Calls ``flush()`` every ``interval`` seconds on a daemon thread, so what a tracker
+    buffers between events (move counts, typed text) reaches the pipeline, and with a
+    write-ahead ring the disk, within a bounded time even when input stops.
+    """
+
+    def __init__(self, flush, interval):
+        self.flush = flush
+        self.interval = interval
+        self.thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.thread is None:
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[PeriodicFlush] ERROR: {e}")
+
+
+def _encode(record) -> str:
+    if isinstance(record, str):
+        return record
+    return json.dumps(record) + "\n"
+
+
+def append_jsonl(path, record):
+    """Synchronous fallback used by trackers that run without a pipeline."""
+    with open(path, "a") as f:
+        f.write(_encode(record))
@@ -1,18 +1,96 @@
-import os
+import bisect
 import json
 from datetime import datetime
 
+from activity_manager.storage.segments import (
+    MAX_LATENESS,
+    SegmentedLog,
+    open_segment_at,
+    read_index,
+    segments_between,
+)
+
+MINUTE_KEY = 16  # len("YYYY-MM-DDTHH:MM"): ISO prefix used as the sparse index key
+
 
 class FileStorage:
-    def __init__(self, path="logs/activity.log"):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        self.file = open(path, "a", encoding="utf-8")
+    def __init__(self, path="logs/activity.log", rotation=None, cipher=None):
+        """
+        :param rotation: optional LogRotation; the file is sealed and rotated by its policy
+        :param cipher: optional ChunkCipher; every batch is sealed as one encrypted chunk
+        """
+        self.path = path
+        self.cipher = cipher
+        self.log = SegmentedLog(path, rotation, indexed=True, cipher=cipher)
+
+    def log_event(self, event_type: str, details: dict, timestamp=None):
+        self.log_events([(timestamp, event_type, details)])
+
+    def log_events(self, events):
+        """Write a batch of (timestamp, event_type, details) tuples with a single flush."""
+        lines = []
+        marks = []  # (minute, offset in batch) wherever the minute changes
+        offset = 0
+        minute = None
+        first = None
+        for timestamp, event_type, details in events:
+            log_entry = {
+                "time": timestamp or datetime.now().isoformat(),
+                "type": event_type,
+                "details": details,
+            }
+            line = json.dumps(log_entry) + "\n"
+            if first is None:
+                first = log_entry["time"]
+            if log_entry["time"][:MINUTE_KEY] != minute:
+                minute = log_entry["time"][:MINUTE_KEY]
+                marks.append((minute, offset))
+            lines.append(line)
+            offset += len(line)
+        if not lines:
+            return
+        # Records arrive (nearly) in time order: the first and last bound the batch
+        span = sorted((datetime.fromisoformat(first).timestamp(),
+                       datetime.fromisoformat(log_entry["time"]).timestamp()))
+        self.log.write("".join(lines), marks, span)
 
-    def log_event(self, event_type: str, details: dict):
-        timestamp = datetime.now().isoformat()
-        log_entry = {"time": timestamp, "type": event_type, "details": details}
-        self.file.write(json.dumps(log_entry) + "\n")
-        self.file.flush()
+    def query(self, start, end, types=None):
+        """Yield {"time", "type", "details"} events with start <= time < end (ISO strings)."""
+        return query_log(self.path, start, end, types, self.cipher)
+
+    def sync(self):
+        self.log.sync()
 
     def close(self):
-        self.file.close()
+        self.log.close()
+
+
+def query_log(path, start, end, types=None, cipher=None):
+    """
+    Yield {"time", "type", "details"} events with start <= time < end (ISO strings).
+
+    Segments outside the range are skipped via the manifest; inside a segment the
+    per-minute index is bisected and the reader seeks straight to ``start`` (in a
+    compressed segment, to the gzip member holding it; see segments.py), then
+    scans until MAX_LATENESS past ``end`` for events written late.
+    Read-only, so other processes can call it too.
+    """
+    start_ts = datetime.fromisoformat(start).timestamp()
+    end_ts = datetime.fromisoformat(end).timestamp()
+    end_minute = datetime.fromtimestamp(end_ts + MAX_LATENESS).isoformat()[:MINUTE_KEY]
+    # Segment ranges come from batch bounds of nearly-ordered events; widen the skip window
+    for segment in segments_between(path, start_ts - MAX_LATENESS, end_ts + MAX_LATENESS):
+        keys, offsets = read_index(segment)
+        i = bisect.bisect_right(keys, start[:MINUTE_KEY]) - 1
+        offset = offsets[i] if i >= 0 else 0
+        with open_segment_at(segment, offset, cipher) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # partially written tail line
+                t = event["time"]
+                if t[:MINUTE_KEY] > end_minute:
+                    break
+                if start <= t < end and (types is None or event["type"] in types):
+                    yield event
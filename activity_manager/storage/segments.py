@@ -0,0 +1,493 @@
+"""
+Segmented Logs — size/time rotation, background compression and retention.
+
+A log path (e.g. ``logs/keyboard.log``) is always the *active* segment: it is
+appended to uncompressed, so the write path is unchanged. When it grows past
+``max_bytes`` or gets older than ``max_age`` it is sealed — renamed to
+``keyboard.log.<YYYYmmdd-HHMMSS>`` — and a fresh active file is opened.
+Sealed segments are gzipped by a background thread and deleted once they fall
+outside the retention policy.
+
+Every log keeps a small manifest next to it (``keyboard.log.manifest.json``)
+recording each sealed segment's [start, end] time range — the event times the
+writer reported, else write times — so readers can skip whole segments with
+``segments_between()``.
+
+With a ChunkCipher every write() is sealed as one authenticated chunk
+(see encryption.py); encrypted segments are not gzipped, and their index
+offsets point at the chunk holding the record.
+
+Indexed logs also keep a sparse index per segment (``<segment>.idx``, one
+``<key> <byte offset>`` line per new key, e.g. per minute) that moves with the
+segment when it is sealed, so readers can seek instead of scanning.
+
+An indexed segment is compressed as independent gzip members (still one valid
+gzip file), each starting at an index offset at least ``BLOCK_BYTES`` past the
+previous one; ``<segment>.blocks`` maps each member's plaintext offset to its
+offset in the ``.gz``, so ``open_segment_at`` decompresses at most one block
+before the record it seeks to.
+
+Readers may list a segment just before the compressor replaces it with its
+``.gz``; the openers below then fall back to the ``.gz``.
+"""
+
+import bisect
+import datetime
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+from activity_manager.storage.encryption import DecryptingReader, EncryptedFile, is_encrypted
+
+_STOP = object()
+
+# Events reach a log nearly in time order: one may be written up to this many seconds
+# after events timed later than it (see storage_manager.py), so readers look this far
+# past the edges of a time range
+MAX_LATENESS = 60
+BLOCK_BYTES = 64 * 1024  # smallest plaintext block compressed as its own gzip member
+COPY_BYTES = 1024 * 1024
+
+
+class LogRotation:
+    """Rotation/retention policy plus the background compressor shared by every log."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_age=86400, retention_days=None,
+                 retention_bytes=None, compress=True):
+        """
+        :param max_bytes: seal the active segment once it reaches this size
+        :param max_age: seal the active segment once it is this many seconds old
+        :param retention_days: delete sealed segments that ended longer ago than this (None = keep;
+                               deleting history is opt-in)
+        :param retention_bytes: delete the oldest sealed segments beyond this total size (None = no cap)
+        :param compress: gzip sealed segments in the background
+        """
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.retention_days = retention_days
+        self.retention_bytes = retention_bytes
+        self.compress = compress
+
+        self.queue = queue.Queue()
+        self.running = False
+        self.thread = None
+        self.compressed = 0
+
+    def should_rotate(self, size, started, now):
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.max_age) and now - started >= self.max_age
+
+    def submit(self, log, entry):
+        """Queue a sealed segment for compression."""
+        if self.compress:
+            self.queue.put((log, entry))
+
+    # ---- Lifecycle --------------------------------------------------------
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            print("[LogRotation] Started.")
+
+    def stop(self):
+        """Finish compressing everything already sealed, then stop."""
+        if self.running:
+            self.running = False
+            self.queue.put(_STOP)
+            if self.thread:
+                self.thread.join()
+            print("[LogRotation] Stopped.")
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            log, entry = item
+            try:
+                log.compress_segment(entry)
+                self.compressed += 1
+            except Exception as e:
+                print(f"[LogRotation] ERROR: Failed to compress {entry['file']}: {e}")
+
+
+class SegmentedLog:
+    """Append-only text log with an uncompressed active segment and a manifest of sealed ones."""
+
+    def __init__(self, path, rotation=None, indexed=False, cipher=None):
+        """
+        :param path: active segment path
+        :param rotation: LogRotation policy; None never rotates
+        :param indexed: keep a sparse ``.idx`` sidecar, fed by ``write(data, marks)``
+        :param cipher: optional ChunkCipher; each write is sealed as one encrypted chunk
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.rotation = rotation
+        self.manifest_path = path + ".manifest.json"
+        self._lock = threading.Lock()  # guards the manifest (writer vs compressor)
+
+        self.manifest = read_manifest(path)
+        encrypted = is_encrypted(path)
+        if cipher is None and encrypted:
+            raise ValueError(f"{path} is encrypted; a ChunkCipher is needed to append to it")
+        # A plaintext active file from before encryption was enabled is sealed as-is below
+        legacy = cipher is not None and not encrypted and os.path.exists(path) and os.path.getsize(path) > 0
+        self.cipher = None if legacy else cipher
+        self.file = self._open()
+        self.size = self.file.tell()
+        self.indexed = indexed
+        self.index_file = open(path + ".idx", "a", encoding="utf-8") if indexed else None
+        keys, _ = read_index(path) if indexed else ([], [])
+        self.last_key = keys[-1] if keys else ""  # keys must increase within a segment
+        if self.manifest.get("active_start") is None or self.size == 0:
+            self.manifest["active_start"] = time.time()
+        self.active_start = self.manifest["active_start"]
+        self.span = self.manifest.get("active_span")  # [first, last] event time, if reported
+        self._save_manifest()
+
+        # Segments sealed before a crash/shutdown that never got compressed
+        if rotation and cipher is None:
+            for entry in self.manifest["segments"]:
+                if not entry["compressed"]:
+                    rotation.submit(self, entry)
+
+        if legacy:
+            self.cipher = cipher
+            self.seal()
+
+    def _open(self):
+        if self.cipher is not None:
+            return EncryptedFile(self.path, self.cipher)
+        return open(self.path, "a", encoding="utf-8")
+
+    def write(self, data: str, marks=(), span=None):
+        """
+        Append and flush ``data``, then seal the segment if the policy says so.
+
+        :param marks: (key, offset within ``data``) candidates for the sparse index; only
+                      keys beyond the segment's last one are kept. ``data`` must be
+                      ASCII so character and byte offsets agree
+        :param span: (first, last) event timestamps in ``data``, recorded in the manifest
+        """
+        if span is not None:
+            if self.span is None:
+                self.span = [span[0], span[1]]
+            else:
+                self.span = [min(self.span[0], span[0]), max(self.span[1], span[1])]
+        if marks and self.index_file is not None:
+            entries = []
+            for key, offset in marks:
+                if key > self.last_key:
+                    # Encrypted segments can only be entered at a chunk boundary
+                    entries.append(f"{key} {self.size if self.cipher else self.size + offset}\n")
+                    self.last_key = key
+            if entries:
+                self.index_file.write("".join(entries))
+                self.index_file.flush()
+        self.file.write(data)
+        self.file.flush()
+        self.size = self.file.tell() if self.cipher else self.size + len(data)
+        now = time.time()
+        if self.rotation and self.rotation.should_rotate(self.size, self.active_start, now):
+            self.seal(now)
+
+    def seal(self, now=None):
+        """Close the active segment, rename it into the sealed set and open a fresh one."""
+        now = time.time() if now is None else now
+        if self.size == 0:
+            return
+        self.sync()  # a sealed segment is never written again, so make it durable now
+        self.file.close()
+
+        stamp = datetime.datetime.fromtimestamp(self.active_start).strftime("%Y%m%d-%H%M%S")
+        sealed = f"{self.path}.{stamp}"
+        n = 1
+        while os.path.exists(sealed) or os.path.exists(sealed + ".gz"):
+            sealed = f"{self.path}.{stamp}-{n}"
+            n += 1
+        os.replace(self.path, sealed)
+        if self.index_file is not None:
+            self.index_file.close()
+            os.replace(self.path + ".idx", sealed + ".idx")
+
+        entry = {
+            "file": os.path.basename(sealed),
+            "start": self.span[0] if self.span else self.active_start,
+            "end": self.span[1] if self.span else now,
+            "bytes": self.size,
+            "compressed": False,
+        }
+        with self._lock:
+            self.manifest["segments"].append(entry)
+            self.manifest["active_start"] = now
+            self.manifest["active_span"] = None
+            expired = self._expired(now)
+            self._save_manifest()
+
+        self.file = self._open()
+        if self.index_file is not None:
+            self.index_file = open(self.path + ".idx", "a", encoding="utf-8")
+            self.last_key = ""
+        self.size = 0
+        self.active_start = now
+        self.span = None
+
+        for old in expired:
+            segment = os.path.join(os.path.dirname(self.path), old["file"])
+            _remove(segment)
+            _remove(index_path(segment))
+            _remove(blocks_path(segment))
+        if self.rotation and self.cipher is None:
+            self.rotation.submit(self, entry)
+
+    def compress_segment(self, entry):
+        """gzip one sealed segment (runs on the LogRotation thread)."""
+        directory = os.path.dirname(self.path)
+        source = os.path.join(directory, entry["file"])
+        if entry["compressed"] or not os.path.exists(source):
+            return
+        target = source + ".gz"
+        _, offsets = read_index(source)
+        with open(source, "rb") as src, open(target + ".tmp", "wb") as dst:
+            blocks = _compress_blocks(src, dst, offsets)
+        if len(blocks) > 1:
+            # In place before the .gz, so a reader that finds the .gz finds its blocks too
+            _write_lines(blocks_path(source), (f"{start} {member}\n" for start, member in blocks))
+        os.replace(target + ".tmp", target)
+
+        with self._lock:
+            if entry in self.manifest["segments"]:
+                entry["file"] = os.path.basename(target)
+                entry["bytes"] = os.path.getsize(target)
+                entry["compressed"] = True
+                self._save_manifest()
+        _remove(source)
+
+    def _expired(self, now):
+        """Drop segments outside the retention policy from the manifest; return them."""
+        if not self.rotation:
+            return []
+        segments = self.manifest["segments"]
+        expired = []
+        if self.rotation.retention_days is not None:
+            cutoff = now - self.rotation.retention_days * 86400
+            expired = [s for s in segments if s["end"] < cutoff]
+            segments = [s for s in segments if s["end"] >= cutoff]
+        if self.rotation.retention_bytes is not None:
+            total = sum(s["bytes"] for s in segments)
+            while len(segments) > 1 and total > self.rotation.retention_bytes:  # keep the newest
+                total -= segments[0]["bytes"]
+                expired.append(segments.pop(0))
+        self.manifest["segments"] = segments
+        return expired
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def sync(self):
+        """fsync the active segment (everything written so far survives a power loss)."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        with self._lock:
+            self.manifest["active_span"] = self.span
+            self._save_manifest()
+        self.file.close()
+        if self.index_file is not None:
+            self.index_file.close()
+
+
+def _compress_blocks(src, dst, offsets):
+    """
+    gzip ``src`` into ``dst`` as independent members starting at ``offsets`` (at
+    least BLOCK_BYTES apart); returns [(plaintext offset, member offset)].
+    """
+    starts = [0]
+    for offset in offsets:
+        if offset - starts[-1] >= BLOCK_BYTES:
+            starts.append(offset)
+    blocks = []
+    for start, end in zip(starts, starts[1:] + [None]):
+        blocks.append((start, dst.tell()))
+        with gzip.GzipFile(fileobj=dst, mode="wb") as member:
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                data = src.read(COPY_BYTES if remaining is None else min(COPY_BYTES, remaining))
+                if not data:
+                    break
+                member.write(data)
+                if remaining is not None:
+                    remaining -= len(data)
+    return blocks
+
+
+def _write_lines(path, lines):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(tmp, path)
+
+
+# ---- Readers --------------------------------------------------------------
+def read_manifest(path):
+    """Manifest of the log at ``path`` (an empty one if it has never rotated)."""
+    try:
+        with open(path + ".manifest.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"segments": [], "active_start": None}
+
+
+def segments_between(path, start=None, end=None):
+    """
+    Paths of the segments of ``path`` that may hold records written in [start, end],
+    oldest first; the active segment is always last. Segments entirely outside the
+    range are skipped without being opened.
+    """
+    manifest = read_manifest(path)
+    directory = os.path.dirname(path)
+    paths = []
+    for entry in manifest["segments"]:
+        if start is not None and entry["end"] < start:
+            continue
+        if end is not None and entry["start"] > end:
+            continue
+        paths.append(os.path.join(directory, entry["file"]))
+    if os.path.exists(path):
+        paths.append(path)
+    return paths
+
+
+def index_path(segment):
+    """Sparse index sidecar of a segment (shared by its compressed form)."""
+    if segment.endswith(".gz"):
+        segment = segment[:-3]
+    return segment + ".idx"
+
+
+def read_index(segment):
+    """Return (keys, byte offsets) of a segment's sparse index, both in file order."""
+    keys, offsets = [], []
+    try:
+        with open(index_path(segment), encoding="utf-8") as f:
+            for line in f:
+                key, _, offset = line.rstrip("\n").rpartition(" ")
+                if key and offset.isdigit():  # skip a torn tail line
+                    keys.append(key)
+                    offsets.append(int(offset))
+    except FileNotFoundError:
+        pass
+    return keys, offsets
+
+
+def blocks_path(segment):
+    """Member map sidecar of a compressed segment (see ``_compress_blocks``)."""
+    if segment.endswith(".gz"):
+        segment = segment[:-3]
+    return segment + ".blocks"
+
+
+def read_blocks(segment):
+    """Return (plaintext offsets, member offsets) of a compressed segment's gzip members."""
+    starts, members = [], []
+    try:
+        with open(blocks_path(segment), encoding="utf-8") as f:
+            for line in f:
+                start, member = line.split()
+                starts.append(int(start))
+                members.append(int(member))
+    except FileNotFoundError:
+        pass  # a single member, or compressed before members were split
+    return starts, members
+
+
+class _MemberReader(gzip.GzipFile):
+    """Decompresses from wherever ``raw`` is positioned (a member boundary) and closes it."""
+
+    def __init__(self, raw):
+        super().__init__(fileobj=raw, mode="rb")
+        self._raw = raw
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._raw.close()
+
+
+def open_segment(path, cipher=None):
+    """Open a sealed or active segment for text reading, decompressing/decrypting transparently."""
+    if is_encrypted(path):
+        return DecryptingReader(path, _require(cipher, path), text=True)
+    if not path.endswith(".gz"):
+        try:
+            return open(path, encoding="utf-8")
+        except FileNotFoundError:
+            path += ".gz"  # compressed (and removed) since it was listed
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def open_segment_binary(path, cipher=None):
+    """Open a segment for seekable byte reading (offsets are into the uncompressed data)."""
+    if is_encrypted(path):
+        return DecryptingReader(path, _require(cipher, path))
+    if not path.endswith(".gz"):
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            path += ".gz"  # compressed (and removed) since it was listed
+    return gzip.open(path, "rb")
+
+
+def open_segment_at(path, offset, cipher=None):
+    """
+    Open a segment for byte reading positioned at ``offset`` (an index offset).
+    A compressed segment is entered at the gzip member holding ``offset``, so only
+    the part of that member before it is decompressed and skipped.
+    """
+    if is_encrypted(path):
+        f = DecryptingReader(path, _require(cipher, path))
+        f.seek(offset)
+        return f
+    if not path.endswith(".gz"):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            path += ".gz"  # compressed (and removed) since it was listed
+        else:
+            f.seek(offset)
+            return f
+    starts, members = read_blocks(path)
+    i = bisect.bisect_right(starts, offset) - 1
+    raw = open(path, "rb")
+    if i >= 0:
+        raw.seek(members[i])
+        offset -= starts[i]
+    f = _MemberReader(raw)
+    f.seek(offset)
+    return f
+
+
+def _require(cipher, path):
+    if cipher is None:
+        raise ValueError(f"{path} is encrypted; a ChunkCipher is needed to read it")
+    return cipher
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,31 +1,199 @@
+import heapq
+import json
+import os
 import sqlite3
+import threading
 from datetime import datetime
 
 
 class SQLiteStorage:
-    def __init__(self, path):
+    def __init__(self, path="logs/activity.db", batch_size=500, cipher=None):
+        """
+        :param path: database file
+        :param batch_size: buffered events are inserted in one transaction once this many are pending
+        :param cipher: optional ChunkCipher; each batch is sealed as one chunk in
+                       ``activity_chunks``, keyed by the batch's time range (see ``seal_chunk``)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.batch_size = batch_size
+        self.cipher = cipher
+        self._pending = []
+        self._lock = threading.Lock()
+        self._configure()
         self._create_table()
 
+    def _configure(self):
+        # WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+
     def _create_table(self):
         cur = self.conn.cursor()
         cur.execute("""
             CREATE TABLE IF NOT EXISTS activity (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                time TEXT,
-                type TEXT,
+                time TEXT NOT NULL,
+                type TEXT NOT NULL,
                 details TEXT
             )
         """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_activity_type_time ON activity (type, time)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_activity_time ON activity (time)")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS activity_chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                start TEXT NOT NULL,
+                end TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_activity_chunks_end ON activity_chunks (end)")
         self.conn.commit()
 
-    def log_event(self, event_type: str, details: dict):
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO activity (time, type, details) VALUES (?, ?, ?)",
-            (datetime.now().isoformat(), event_type, str(details))
-        )
-        self.conn.commit()
+    def log_event(self, event_type: str, details: dict, timestamp=None):
+        """Buffer a single event; it is written with the next batch."""
+        with self._lock:
+            self._pending.append((timestamp or datetime.now().isoformat(), event_type, details))
+            if len(self._pending) >= self.batch_size:
+                self._write(self._pending)
+                self._pending = []
+
+    def log_events(self, events):
+        """Insert a batch of (timestamp, event_type, details) tuples in one transaction."""
+        with self._lock:
+            if self._pending:
+                self._write(self._pending)
+                self._pending = []
+            self._write(events)
+
+    def _write(self, events):
+        rows = [
+            (timestamp or datetime.now().isoformat(), event_type, json.dumps(details))
+            for timestamp, event_type, details in events
+        ]
+        if not rows:
+            return
+        with self.conn:  # single transaction per batch
+            if self.cipher is not None:
+                self.conn.execute("INSERT INTO activity_chunks (start, end, data) VALUES (?, ?, ?)",
+                                  seal_chunk(self.cipher, rows))
+            else:
+                self.conn.executemany(
+                    "INSERT INTO activity (time, type, details) VALUES (?, ?, ?)", rows
+                )
+
+    def flush(self):
+        with self._lock:
+            self._write(self._pending)
+            self._pending = []
+
+    def sync(self):
+        """Make committed batches durable: under synchronous=NORMAL the WAL is only synced at a checkpoint."""
+        with self._lock:
+            self._write(self._pending)
+            self._pending = []
+            self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def fetch(self, event_type, start, end):
+        """Return (time, details) rows of one type within [start, end), using the (type, time) index."""
+        return [(event["time"], event["details"]) for event in self.query(start, end, (event_type,))]
+
+    def query(self, start, end, types=None):
+        """Yield {"time", "type", "details"} events in [start, end), streamed from the time indexes."""
+        self.flush()
+        return _query(self.conn, start, end, types, self.cipher)
 
     def close(self):
+        self.flush()
         self.conn.close()
+
+
+def query_db(path, start, end, types=None, cipher=None):
+    """Like SQLiteStorage.query, over a read-only connection of its own (usable from any process)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield from _query(conn, start, end, types, cipher)
+    finally:
+        conn.close()
+
+
+def seal_chunk(cipher, rows):
+    """
+    Seal (time, type, details JSON) rows as one chunk: a JSON array of [time, type,
+    details] sorted by time. Returns (start, end, blob) for ``activity_chunks``; the
+    time range is bound to the ciphertext, so a chunk can't be moved to another range.
+    """
+    rows = sorted(rows, key=lambda row: row[0])
+    start, end = rows[0][0], rows[-1][0]
+    dumps = json.dumps
+    data = "[" + ",".join(f"[{dumps(time)},{dumps(kind)},{details}]" for time, kind, details in rows) + "]"
+    return start, end, cipher.seal_blob(data.encode("utf-8"), _chunk_context(start, end))
+
+
+def open_chunk(cipher, start, end, blob):
+    """[time, type, details] rows of a sealed chunk."""
+    if cipher is None:
+        raise ValueError("Encrypted rows need a ChunkCipher to be read")
+    return json.loads(cipher.open_blob(blob, _chunk_context(start, end)))
+
+
+def _chunk_context(start, end):
+    return f"chunk|{start}|{end}".encode("utf-8")
+
+
+def _details(cipher, time, event_type, stored):
+    if isinstance(stored, bytes):  # a row sealed on its own by an earlier version
+        if cipher is None:
+            raise ValueError("Encrypted rows need a ChunkCipher to be read")
+        stored = cipher.open_blob(stored, f"{time}|{event_type}".encode("utf-8"))
+    return json.loads(stored)
+
+
+def _has_chunks(conn):
+    try:
+        return conn.execute("SELECT 1 FROM activity_chunks LIMIT 1").fetchone() is not None
+    except sqlite3.OperationalError:
+        return False  # a database from before sealed chunks, opened read-only
+
+
+def _query(conn, start, end, types, cipher=None):
+    # Separate cursors so writers on the shared connection don't reset them mid-stream
+    rows = _query_rows(conn.cursor(), start, end, types, cipher)
+    if not _has_chunks(conn):
+        return rows
+    chunks = _query_chunks(conn.cursor(), start, end, types, cipher)
+    return heapq.merge(rows, chunks, key=lambda event: event["time"])
+
+
+def _query_chunks(cursor, start, end, types, cipher):
+    """Events in [start, end) from the sealed chunks overlapping it, in time order."""
+    cursor.execute("SELECT start, end, data FROM activity_chunks WHERE end >= ? AND start < ? ORDER BY start",
+                   (start, end))
+    pending = []  # heap of (time, sequence, event) from the chunks opened so far
+    n = 0
+    for chunk_start, chunk_end, data in cursor:
+        while pending and pending[0][0] < chunk_start:
+            yield heapq.heappop(pending)[2]  # no later chunk holds anything earlier
+        for time, event_type, details in open_chunk(cipher, chunk_start, chunk_end, data):
+            if start <= time < end and (types is None or event_type in types):
+                heapq.heappush(pending, (time, n, {"time": time, "type": event_type, "details": details}))
+                n += 1
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+def _query_rows(cursor, start, end, types, cipher=None):
+    if types:
+        placeholders = ", ".join("?" * len(types))
+        sql = (f"SELECT time, type, details FROM activity WHERE type IN ({placeholders}) "
+               "AND time >= ? AND time < ? ORDER BY time")
+        params = (*types, start, end)
+    else:
+        sql = "SELECT time, type, details FROM activity WHERE time >= ? AND time < ? ORDER BY time"
+        params = (start, end)
+    for time, event_type, details in cursor.execute(sql, params):
+        yield {"time": time, "type": event_type, "details": _details(cipher, time, event_type, details)}
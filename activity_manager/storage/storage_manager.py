@@ -1,19 +1,128 @@
 """
-Storage Manager — provides unified logging API.
-Currently only file-based logging is supported.
+Storage Manager — provides unified logging and query APIs.
+Supports JSON-lines files ("file"), SQLite ("sqlite") and compact binary
+segments ("binary").
+
+Every backend stores the same normalized event shape:
+
+    {"time": <local ISO-8601>, "type": <event type>, "details": {...}}
+
+with these event types and details, whichever tracker produced them:
+
+    "key"          {"key"}, or {"key", "count"} for collapsed auto-repeats
+    "click"        {"x", "y"}, plus "count" when coalesced (see trackers/overload.py)
+    "scroll"       {"x", "y"}, plus "count" when coalesced
+    "mouse_moves"  {"count"}
+    "app_switch"   {"app_name", "bundle_id"}
+    "app_session"  {"app_name", "bundle_id", "start", "end", "duration"}
+    "idle"         {"start", "end", "duration"}
+    "typing"       per-minute typing-rhythm record (see TypingMetrics), no key identities;
+                   only in the keyboard tracker's metrics-only mode
+
+Interval events ("app_session", "idle") are timed at their end and coalesced
+counts at their last event, so records reach a backend only nearly in time order:
+an idle interval ends at the last input, up to one idle poll before it is written,
+and a coalesced count can trail later keys by its coalescing interval. Readers
+scan ``segments.MAX_LATENESS`` seconds past a window for such late records. The
+file and binary backends return events in the order they were written.
 """
 
-from activity_manager.storage.file_storage import FileStorage
+import time
+from datetime import datetime
+
+from activity_manager.storage.binary_storage import BinaryStorage, query_segment
+from activity_manager.storage.file_storage import FileStorage, query_log
+from activity_manager.storage.sqlite_storage import SQLiteStorage, query_db
+
+# mode -> read-only query over a storage path, for readers in other processes
+READERS = {"file": query_log, "sqlite": query_db, "binary": query_segment}
+
+
+def to_iso(value) -> str:
+    """datetime, UNIX timestamp or ISO string -> local ISO-8601 string."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).isoformat()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return datetime.fromtimestamp(value).isoformat()
+
+
+def read_events(mode, path, start, end, types=None, key=None):
+    """
+    StorageManager.query without opening the backend for writing (safe in worker processes).
+
+    :param key: encryption key (bytes) if the storage is encrypted
+    """
+    if mode not in READERS:
+        raise ValueError(f"Unsupported storage mode: {mode!r}")
+    cipher = None
+    if key:
+        from activity_manager.storage.encryption import ChunkCipher
+
+        cipher = ChunkCipher(key)
+    return READERS[mode](path, to_iso(start), to_iso(end), tuple(types) if types else None, cipher)
 
 
 class StorageManager:
-    def __init__(self, mode="file", path="logs/activity.log"):
-        if mode != "file":
-            raise ValueError("Only 'file' mode supported right now.")
-        self.backend = FileStorage(path)
+    def __init__(self, mode="file", path="logs/activity.log", pipeline=None, rotation=None,
+                 cipher=None):
+        """
+        :param pipeline: optional EventPipeline; when given, events are written behind
+                         by its writer thread instead of synchronously
+        :param rotation: optional LogRotation for the "file" backend
+        :param cipher: optional ChunkCipher encrypting everything the backend writes
+        """
+        if mode == "file":
+            self.backend = FileStorage(path, rotation=rotation, cipher=cipher)
+        elif mode == "sqlite":
+            self.backend = SQLiteStorage(path, cipher=cipher)
+        elif mode == "binary":
+            self.backend = BinaryStorage(path, cipher=cipher)
+        else:
+            raise ValueError(f"Unsupported storage mode: {mode!r}")
+        self.mode = mode
+        self.path = path
+        self.pipeline = pipeline
+        self.cipher = cipher
+        # Callables receiving every logged event as (event_type, details, ts) on the
+        # caller's thread, e.g. the activity timeline; they must be cheap
+        self.listeners = []
+        if pipeline is not None:
+            # Stable name, so events journaled by a previous run replay into this backend
+            pipeline.register(self.backend, "storage")
+
+    def log_event(self, event_type: str, details: dict, ts=None):
+        """
+        :param ts: when the event happened (UNIX timestamp); defaults to now
+        """
+        # Timestamp at enqueue time so batching doesn't skew event times
+        if ts is None:
+            ts = time.time()
+        timestamp = datetime.fromtimestamp(ts).isoformat()
+        if self.pipeline:
+            self.pipeline.submit(self.backend, (timestamp, event_type, details))
+        else:
+            self.backend.log_event(event_type, details, timestamp)
+        for listener in self.listeners:
+            listener(event_type, details, ts)
+
+    def query(self, start, end, types=None):
+        """
+        Stream stored events with ``start <= time < end`` in time order.
+
+        :param start: datetime, UNIX timestamp or ISO string
+        :param end: datetime, UNIX timestamp or ISO string (exclusive)
+        :param types: optional iterable of event types to keep
+        :return: generator of {"time", "type", "details"} dicts; events still queued
+                 in the pipeline are not visible until its next commit
+        """
+        return self.backend.query(to_iso(start), to_iso(end), tuple(types) if types else None)
 
-    def log_event(self, event_type: str, details: dict):
-        self.backend.log_event(event_type, details)
+    def flush(self):
+        """Make buffered backend writes visible to readers."""
+        flush = getattr(self.backend, "flush", None)
+        if flush:
+            flush()
 
     def close(self):
         self.backend.close()
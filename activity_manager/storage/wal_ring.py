@@ -0,0 +1,210 @@
+"""
+Write-Ahead Ring — fixed-size, memory-mapped journal in front of the storage.
+
+Producers (tracker callbacks) ``append()`` a record with a memory copy into a
+shared mapping of ``path``; once copied it survives a crash of the process,
+since the page cache already holds it. A single consumer (the pipeline
+writer) ``read()``s the pending records, applies them to the main storage and
+``consume()``s them; once that storage is durable it ``advance()``s the tail,
+which frees the space. Reopening the ring recovers every record past the tail.
+
+Layout: a 4096-byte header (magic, capacity, tail) followed by ``capacity``
+data bytes used circularly. Each record is
+
+    length (4) + crc32 (4) + lsn (8) + payload
+
+where ``lsn`` is the record's logical position (ever increasing, wrapping
+modulo ``capacity`` in the file) and the crc covers the payload. Recovery
+walks forward from the tail while the lsn and crc match, so stale records from
+earlier laps are never replayed.
+
+Durability against power loss is chosen with ``fsync`` (``sync_due``):
+
+    "never"     nothing is synced and the tail advances as soon as a batch is
+                applied; survives process crashes only
+    "interval"  at most every ``fsync_interval`` seconds the storage written
+                since the last checkpoint is fsync'ed, then the tail advances
+                and the ring is msync'ed
+    "batch"     the same after every applied batch
+
+The tail never passes a record before the storage holding it is durable, so
+a power loss loses at most the records appended since the last msync.
+Delivery is at-least-once: records applied after the last checkpoint are
+replayed on recovery.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+MAGIC = b"AMWAL1\0\0"
+HEADER = struct.Struct("<8sQQ")  # magic, capacity, tail
+HEADER_SIZE = 4096
+RECORD = struct.Struct("<IIQ")  # length, crc32, lsn
+LSN = struct.Struct("<Q")
+
+FSYNC_POLICIES = ("never", "interval", "batch")
+
+
+class WriteAheadRing:
+    def __init__(self, path="logs/pipeline.wal", capacity=16 * 1024 * 1024, fsync="interval",
+                 fsync_interval=1.0, cipher=None):
+        """
+        :param path: ring file (created on first use; an existing ring keeps its capacity)
+        :param capacity: data bytes in the ring; appends that don't fit are refused
+        :param fsync: "never", "interval" or "batch" (see module docstring)
+        :param fsync_interval: seconds between msyncs under the "interval" policy
+        :param cipher: optional ChunkCipher; payloads are sealed, bound to their lsn
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, not {fsync!r}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.cipher = cipher
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            size = os.fstat(fd).st_size
+            if size >= HEADER_SIZE:
+                magic, stored_capacity, _ = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+                if magic != MAGIC:
+                    raise ValueError(f"{path} is not a write-ahead ring")
+                capacity = stored_capacity
+            if size != HEADER_SIZE + capacity:
+                os.ftruncate(fd, HEADER_SIZE + capacity)
+            self.mm = mmap.mmap(fd, HEADER_SIZE + capacity)
+        finally:
+            os.close(fd)
+        self.capacity = capacity
+
+        if size < HEADER_SIZE:
+            self.tail = 0
+            self._write_header()
+        else:
+            self.tail = HEADER.unpack_from(self.mm, 0)[2]
+        self.head = self._recover()
+        self.recovered = self.records_between(self.tail, self.head)
+        self.applied = self.tail  # consumer position: records before it are applied, maybe not durable
+
+        # Counters
+        self.appended = 0
+        self.refused = 0
+        self.syncs = 0
+
+    # ---- Raw access (positions are logical lsns) ---------------------------
+    def _put(self, lsn, data):
+        pos = HEADER_SIZE + lsn % self.capacity
+        first = min(len(data), HEADER_SIZE + self.capacity - pos)
+        self.mm[pos:pos + first] = data[:first]
+        if first < len(data):
+            self.mm[HEADER_SIZE:HEADER_SIZE + len(data) - first] = data[first:]
+
+    def _get(self, lsn, size):
+        pos = HEADER_SIZE + lsn % self.capacity
+        first = min(size, HEADER_SIZE + self.capacity - pos)
+        data = self.mm[pos:pos + first]
+        if first < size:
+            data += self.mm[HEADER_SIZE:HEADER_SIZE + size - first]
+        return data
+
+    def _write_header(self):
+        HEADER.pack_into(self.mm, 0, MAGIC, self.capacity, self.tail)
+
+    def _recover(self):
+        """Walk valid records from the tail; returns the lsn just past the last one."""
+        lsn = self.tail
+        while lsn - self.tail + RECORD.size <= self.capacity:
+            length, crc, stored = RECORD.unpack(self._get(lsn, RECORD.size))
+            end = lsn + RECORD.size + length
+            if stored != lsn or not length or end - self.tail > self.capacity:
+                break
+            if zlib.crc32(self._get(lsn + RECORD.size, length)) != crc:
+                break
+            lsn = end
+        return lsn
+
+    def records_between(self, start, end):
+        """Number of records in [start, end)."""
+        count = 0
+        while start < end:
+            start += RECORD.size + RECORD.unpack(self._get(start, RECORD.size))[0]
+            count += 1
+        return count
+
+    # ---- Producer side ------------------------------------------------------
+    def append(self, payload: bytes) -> bool:
+        """Copy one record into the ring; False (record refused) if the ring is full."""
+        with self._lock:
+            lsn = self.head
+            if self.cipher is not None:
+                payload = self.cipher.seal_blob(payload, LSN.pack(lsn))
+            size = RECORD.size + len(payload)
+            if lsn + size - self.tail > self.capacity:
+                self.refused += 1
+                return False
+            pos = HEADER_SIZE + lsn % self.capacity
+            if pos + size <= HEADER_SIZE + self.capacity:
+                RECORD.pack_into(self.mm, pos, len(payload), zlib.crc32(payload), lsn)
+                self.mm[pos + RECORD.size:pos + size] = payload
+            else:
+                self._put(lsn, RECORD.pack(len(payload), zlib.crc32(payload), lsn) + payload)
+            self.head = lsn + size
+            self.appended += 1
+            return True
+
+    # ---- Consumer side ------------------------------------------------------
+    def read(self, max_bytes=None):
+        """
+        Payloads not applied yet (at least one record if any is pending).
+
+        :return: (payloads, end lsn to pass to ``consume`` once they are applied)
+        """
+        start = lsn = self.applied
+        head = self.head
+        payloads = []
+        while lsn < head and (max_bytes is None or not payloads or lsn - start < max_bytes):
+            length = RECORD.unpack(self._get(lsn, RECORD.size))[0]
+            payload = self._get(lsn + RECORD.size, length)
+            if self.cipher is not None:
+                payload = self.cipher.open_blob(payload, LSN.pack(lsn))
+            payloads.append(payload)
+            lsn += RECORD.size + length
+        return payloads, lsn
+
+    def consume(self, lsn):
+        """Mark everything before ``lsn`` as applied; the space stays taken until ``advance``."""
+        self.applied = lsn
+
+    def advance(self, lsn):
+        """Mark everything before ``lsn`` as durably applied (frees the space for producers)."""
+        self.tail = lsn
+        self.applied = max(self.applied, lsn)
+        self._write_header()
+
+    def pending_bytes(self):
+        return self.head - self.tail
+
+    def sync_due(self):
+        """Whether the consumer should checkpoint now, per the fsync policy."""
+        if self.fsync == "batch":
+            return True
+        return self.fsync == "interval" and time.monotonic() - self._last_sync >= self.fsync_interval
+
+    def sync(self):
+        self.mm.flush()
+        self._last_sync = time.monotonic()
+        self.syncs += 1
+
+    def close(self):
+        if self.fsync != "never":
+            self.sync()
+        self.mm.close()
@@ -0,0 +1,309 @@
+"""
+Delta Sync — ship new rollup buckets and sessions to a collector.
+
+Every rollup row carries a change sequence number (see rollups.py), so a sync
+reads only the rows with ``seq`` above the device's checkpoint, through an
+index; app sessions and idle periods are read from storage from the time the
+previous sync stopped at. Work and bandwidth per sync grow with what changed,
+not with the history.
+
+Changes go out in batches of at most ``max_rows`` rows each way, as
+zlib-compressed JSON posted to the collector (see collector.py):
+
+    {"device", "batch", "rollups": [[resolution, bucket, metric, value], ...],
+     "sessions": [[start, end, app_name, bundle_id], ...], "idle": [[start, end], ...]}
+
+Rollup values are absolute and sessions are keyed by their start, so a batch
+the collector applies twice (e.g. when its reply was lost) changes nothing.
+The checkpoint (logs/sync.json, with the device id) is saved after every
+acknowledged batch; failed posts are retried with exponential backoff.
+
+    python -m activity_manager.sync http://127.0.0.1:8765/sync --once
+"""
+
+import datetime
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zlib
+
+from activity_manager.rollups import RollupEngine
+from activity_manager.storage.storage_manager import read_events
+
+SYNCED_TYPES = ("app_session", "idle")
+
+
+def _unix(value) -> float:
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class SyncError(Exception):
+    """A batch the collector did not acknowledge, after every retry."""
+
+
+class SyncClient:
+    def __init__(self, url, rollups_path="logs/rollups.db", storage_mode="file",
+                 storage_path="logs/activity.log", key=None, state_path="logs/sync.json",
+                 token=None, interval=300.0, max_rows=5000, lag=60.0, retries=5, backoff=1.0,
+                 max_backoff=60.0, timeout=10.0):
+        """
+        :param url: collector endpoint, e.g. http://127.0.0.1:8765/sync
+        :param rollups_path: RollupEngine database the buckets are read from
+        :param storage_mode: storage backend sessions are read from ("file", "sqlite", "binary")
+        :param storage_path: log file or database path of that backend
+        :param key: encryption key (bytes) if the storage is encrypted
+        :param state_path: JSON file holding the device id and the checkpoint
+        :param token: bearer token the collector expects, if any
+        :param interval: how often (in seconds) ``start()`` syncs
+        :param max_rows: most rollup rows (and most sessions) per batch
+        :param lag: sessions closing in the last ``lag`` seconds wait for the next sync,
+                    so storage's write-behind has written them
+        :param retries: attempts per batch before the sync gives up until the next one
+        :param backoff: delay (in seconds) before the first retry, doubled per attempt
+        :param max_backoff: cap on the retry delay
+        :param timeout: seconds to wait for the collector's reply
+        """
+        self.url = url
+        self.storage_mode = storage_mode
+        self.storage_path = storage_path
+        self.key = key
+        self.state_path = state_path
+        self.token = token
+        self.interval = interval
+        self.max_rows = max_rows
+        self.lag = lag
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        RollupEngine(rollups_path).close()  # create (or migrate) its schema
+        self.conn = sqlite3.connect(rollups_path, check_same_thread=False)
+        self.state = self._load_state()
+
+        self.stats = {"syncs": 0, "batches": 0, "rows": 0, "bytes_sent": 0, "bytes_raw": 0,
+                      "retries": 0, "failures": 0, "last_sync": None, "last_error": None}
+        self._lock = threading.Lock()  # one sync at a time
+        self.running = False
+        self.thread = None
+        self._stop = threading.Event()
+
+    # ---- Checkpoint -------------------------------------------------------
+    def _load_state(self):
+        # Rows written before change tracking have seq 0, so a fresh checkpoint starts below it
+        state = {"device": None, "seq": -1, "session_from": 0.0, "batch": 0}
+        try:
+            with open(self.state_path) as f:
+                state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        if not state["device"]:
+            state["device"] = uuid.uuid4().hex
+            self._save_state(state)
+        return state
+
+    def _save_state(self, state):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    @property
+    def device(self):
+        return self.state["device"]
+
+    # ---- Reading deltas ---------------------------------------------------
+    def _rollup_rows(self, after):
+        """(rows, last seq) for at most max_rows rollup rows changed after ``after``."""
+        cur = self.conn.execute(
+            "SELECT resolution, bucket, metric, value, seq FROM rollups WHERE seq > ? ORDER BY seq LIMIT ?",
+            (after, self.max_rows),
+        )
+        rows = cur.fetchall()
+        return [row[:4] for row in rows], rows[-1][4] if rows else after
+
+    def _intervals(self, start, end):
+        """(sessions, idle, resume time) for at most ~max_rows intervals stored in [start, end)."""
+        sessions, idle = [], []
+        events = read_events(self.storage_mode, self.storage_path, start, end, SYNCED_TYPES, self.key)
+        last = None
+        try:
+            for event in events:
+                t = event["time"]
+                # Stop at a time boundary, so the next batch resumes exactly at ``t``
+                if len(sessions) + len(idle) >= self.max_rows and t != last:
+                    return sessions, idle, _unix(t)
+                last = t
+                details = event["details"] or {}
+                if event["type"] == "app_session":
+                    sessions.append([_unix(details["start"]), _unix(details["end"]),
+                                     details.get("app_name"), details.get("bundle_id")])
+                else:
+                    idle.append([_unix(details["start"]), _unix(details["end"])])
+        finally:
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()
+        return sessions, idle, end
+
+    # ---- Sending ----------------------------------------------------------
+    def _post(self, body):
+        """POST one compressed batch, retrying with exponential backoff; returns the reply."""
+        headers = {"Content-Type": "application/json", "Content-Encoding": "deflate"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for attempt in range(self.retries):
+            request = urllib.request.Request(self.url, data=body, headers=headers, method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                # Client errors (bad token, rejected payload) won't improve with a retry
+                if 400 <= e.code < 500 and e.code not in (408, 429):
+                    raise SyncError(f"Collector rejected batch: HTTP {e.code}") from e
+                error = e
+            except (OSError, ValueError) as e:  # refused, reset, timed out, garbled reply
+                error = e
+            self.stats["retries"] += 1
+            self.stats["last_error"] = str(error)
+            if attempt + 1 < self.retries:
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                if self._stop.wait(delay * random.uniform(0.5, 1.0)):  # jitter; stop() interrupts
+                    break
+        raise SyncError(f"Collector unreachable: {self.stats['last_error']}")
+
+    def sync_once(self, now=None):
+        """
+        Send everything changed since the checkpoint, one batch at a time.
+
+        :return: number of batches sent
+        :raises SyncError: when a batch could not be delivered (the checkpoint stays
+                           at the last acknowledged batch)
+        """
+        until = (time.time() if now is None else now) - self.lag
+        sent = 0
+        with self._lock:
+            try:
+                while True:
+                    state = self.state
+                    rollups, seq = self._rollup_rows(state["seq"])
+                    sessions, idle, session_to = self._intervals(state["session_from"], until)
+                    if not rollups and not sessions and not idle:
+                        break
+                    batch = state["batch"] + 1
+                    raw = json.dumps({"device": state["device"], "batch": batch, "rollups": rollups,
+                                      "sessions": sessions, "idle": idle},
+                                     separators=(",", ":")).encode()
+                    body = zlib.compress(raw, 6)
+                    self._post(body)
+
+                    self.state = dict(state, seq=seq, session_from=session_to, batch=batch)
+                    self._save_state(self.state)
+                    sent += 1
+                    self.stats["batches"] += 1
+                    self.stats["rows"] += len(rollups) + len(sessions) + len(idle)
+                    self.stats["bytes_sent"] += len(body)
+                    self.stats["bytes_raw"] += len(raw)
+                    if len(rollups) < self.max_rows and session_to >= until:
+                        break
+                if self.state["session_from"] < until:
+                    self.state = dict(self.state, session_from=until)
+                    self._save_state(self.state)
+            except SyncError:
+                self.stats["failures"] += 1
+                raise
+            self.stats["syncs"] += 1
+            self.stats["last_sync"] = time.time()
+            self.stats["last_error"] = None
+        return sent
+
+    def get_stats(self):
+        return dict(self.stats, device=self.device, checkpoint=self.state["seq"])
+
+    # ---- Lifecycle --------------------------------------------------------
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            print(f"[SyncClient] Syncing to {self.url} every {self.interval:g}s.")
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync_once()
+            except SyncError as e:
+                print(f"[SyncClient] ERROR: {e}")
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"[SyncClient] ERROR: Sync failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def close(self):
+        self.stop()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sync rollups and sessions to a collector.")
+    parser.add_argument("url", help="collector endpoint, e.g. http://127.0.0.1:8765/sync")
+    parser.add_argument("--rollups", default="logs/rollups.db", help="rollups database")
+    parser.add_argument("--storage-mode", default="file", choices=("file", "sqlite", "binary"))
+    parser.add_argument("--storage-path", default="logs/activity.log")
+    parser.add_argument("--state", default="logs/sync.json", help="device id and checkpoint file")
+    parser.add_argument("--token", help="bearer token the collector expects")
+    parser.add_argument("--key-file", help="encryption key for encrypted storage")
+    parser.add_argument("--interval", type=float, default=300, help="seconds between syncs")
+    parser.add_argument("--once", action="store_true", help="sync once and exit")
+    args = parser.parse_args()
+
+    key = None
+    if args.key_file:
+        with open(args.key_file, "rb") as f:
+            key = f.read()
+
+    client = SyncClient(args.url, rollups_path=args.rollups, storage_mode=args.storage_mode,
+                        storage_path=args.storage_path, key=key, state_path=args.state,
+                        token=args.token, interval=args.interval)
+    if args.once:
+        try:
+            batches = client.sync_once()
+        finally:
+            client.close()
+        stats = client.get_stats()
+        print(f"[SyncClient] Sent {batches} batches, {stats['rows']:,} rows, "
+              f"{stats['bytes_sent']:,} bytes ({stats['bytes_raw']:,} uncompressed)")
+        return
+    client.start()
+    try:
+        while client.thread.is_alive():
+            client.thread.join(1.0)
+    except KeyboardInterrupt:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Activity Timeline — app-focus sessions joined with idle intervals and input.
+
+App sessions and idle periods are kept as disjoint intervals sorted by start
+(``IntervalIndex``), input events as per-second counts (``CountIndex``), each
+with prefix sums. For a window [lo, hi) the sessions overlapping it are found
+by bisection, then walked once alongside the overlapping idle intervals, so a
+query costs O(log n + k + j) for k sessions and j idle intervals in the window,
+plus O(log m) per session for its input count.
+
+The timeline is fed the normalized storage events (see storage_manager.py):
+``app_session`` and ``idle`` intervals, and ``key`` / ``click`` / ``scroll``
+events (with their ``count`` when coalesced) as input. Key auto-repeats count
+as input like in the rollups (collapsed ones through their ``count``); moves
+don't.
+
+Input arrives slightly out of order (a coalesced click or scroll is stamped at
+its last event, after later keys were added), so counts for seconds before
+the newest one go to a small side index rather than rebuilding the main one;
+a query folds them in once there are ``LATE_FOLD`` of them.
+"""
+
+import bisect
+import datetime
+import heapq
+import threading
+from array import array
+
+INPUT_TYPES = ("key", "click", "scroll")
+LATE_FOLD = 4096  # out-of-order seconds buffered before a query folds them into the main index
+TIMELINE_TYPES = ("app_session", "idle") + INPUT_TYPES
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class IntervalIndex:
+    """
+    Disjoint [start, end) intervals with a value each, sorted by start, plus
+    prefix sums of their lengths. An interval overlapping the one before it is
+    trimmed to start where that one ends.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.values = []
+        self._cum = [0.0]  # _cum[i] = total length of the first i intervals
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end, value=None):
+        if self.starts and start < self.starts[-1]:
+            self.merge([(start, end, value)])  # out of order: rebuild
+            return
+        if self.ends and start < self.ends[-1]:
+            start = self.ends[-1]
+        if end <= start:
+            return
+        self.starts.append(start)
+        self.ends.append(end)
+        self.values.append(value)
+        self._cum.append(self._cum[-1] + end - start)
+
+    def merge(self, intervals):
+        """Add many (start, end, value) intervals in one O(n + m) pass."""
+        existing = zip(self.starts, self.ends, self.values)
+        merged = heapq.merge(existing, sorted(intervals, key=lambda i: i[0]), key=lambda i: i[0])
+        self.starts, self.ends, self.values, self._cum = [], [], [], [0.0]
+        for start, end, value in merged:
+            self.add(start, end, value)
+
+    def span(self, lo, hi):
+        """(first, last + 1) indices of the intervals overlapping [lo, hi)."""
+        return bisect.bisect_right(self.ends, lo), bisect.bisect_left(self.starts, hi)
+
+    def covered(self, lo, hi) -> float:
+        """Seconds of [lo, hi) covered by intervals, in O(log n)."""
+        first, last = self.span(lo, hi)
+        if first >= last:
+            return 0.0
+        total = self._cum[last] - self._cum[first]
+        total -= max(0.0, lo - self.starts[first])
+        total -= max(0.0, self.ends[last - 1] - hi)
+        return total
+
+
+class CountIndex:
+    """
+    Event counts per whole second, sorted, with prefix sums: counts over a window in
+    O(log n). Counts for seconds before the newest one are buffered in a side index
+    (see the module docstring), so ``add`` is O(1) amortized whatever the order.
+    """
+
+    def __init__(self):
+        self.seconds = array("q")
+        self._cum = array("q", [0])  # _cum[i] = events in the first i seconds
+        self._late = {}  # second -> count, for seconds that arrived out of order
+        self._late_index = None  # (seconds, prefix sums) of _late, rebuilt by the next query
+
+    def add(self, ts, count=1):
+        second = int(ts)
+        seconds = self.seconds
+        if seconds and second == seconds[-1]:
+            self._cum[-1] += count
+        elif not seconds or second > seconds[-1]:
+            seconds.append(second)
+            self._cum.append(self._cum[-1] + count)
+        else:
+            self._late[second] = self._late.get(second, 0) + count
+            self._late_index = None
+
+    def merge(self, counts):
+        """Add a {second: count} mapping (and the buffered late counts) in one O(n + m) pass."""
+        cum = self._cum
+        merged = {s: cum[i + 1] - cum[i] for i, s in enumerate(self.seconds)}
+        for source in (self._late, counts):
+            for second, count in source.items():
+                merged[second] = merged.get(second, 0) + count
+        self.seconds, self._cum = _prefix_sums(merged)
+        self._late, self._late_index = {}, None
+
+    def count(self, lo, hi) -> int:
+        """Events in the seconds from int(lo) up to, not including, int(hi)."""
+        if len(self._late) >= LATE_FOLD:
+            self.merge({})
+        total = _count(self.seconds, self._cum, lo, hi)
+        if self._late:
+            if self._late_index is None:
+                self._late_index = _prefix_sums(self._late)
+            total += _count(*self._late_index, lo, hi)
+        return total
+
+
+def _prefix_sums(counts):
+    """{second: count} -> (sorted seconds, prefix sums) arrays."""
+    seconds = array("q", sorted(counts))
+    cum = array("q", [0])
+    total = 0
+    for second in seconds:
+        total += counts[second]
+        cum.append(total)
+    return seconds, cum
+
+
+def _count(seconds, cum, lo, hi):
+    return cum[bisect.bisect_left(seconds, int(hi))] - cum[bisect.bisect_left(seconds, int(lo))]
+
+
+class Timeline:
+    def __init__(self):
+        self.sessions = IntervalIndex()  # value = app name
+        self.idle = IntervalIndex()
+        self.inputs = CountIndex()
+        self._lock = threading.Lock()
+
+    # ---- Feeding ----------------------------------------------------------
+    def add_event(self, event_type, details, ts):
+        """Fold in one normalized event (a StorageManager listener; ``ts`` is a UNIX time)."""
+        if event_type in INPUT_TYPES:
+            with self._lock:
+                self.inputs.add(ts, details.get("count", 1))
+        elif event_type == "app_session":
+            start, end = _timestamp(details["start"]), _timestamp(details["end"])
+            with self._lock:
+                self.sessions.add(start, end, details.get("app_name"))
+        elif event_type == "idle":
+            start, end = _timestamp(details["start"]), _timestamp(details["end"])
+            with self._lock:
+                self.idle.add(start, end)
+
+    def load(self, events):
+        """Merge stored {"time", "type", "details"} events (e.g. a history window) in bulk."""
+        sessions, idle, inputs = [], [], {}
+        for event in events:
+            event_type, details = event["type"], event["details"] or {}
+            if event_type in INPUT_TYPES:
+                second = int(_timestamp(event["time"]))
+                inputs[second] = inputs.get(second, 0) + details.get("count", 1)
+            elif event_type == "app_session":
+                sessions.append((_timestamp(details["start"]), _timestamp(details["end"]),
+                                 details.get("app_name")))
+            elif event_type == "idle":
+                idle.append((_timestamp(details["start"]), _timestamp(details["end"]), None))
+        with self._lock:
+            if sessions:
+                self.sessions.merge(sessions)
+            if idle:
+                self.idle.merge(idle)
+            if inputs:
+                self.inputs.merge(inputs)
+
+    # ---- Queries ----------------------------------------------------------
+    def get_sessions(self, lo, hi, open_session=None, open_idle=None):
+        """
+        App-focus sessions overlapping [lo, hi), clipped to it, in time order.
+
+        :param open_session: (app_name, start, end) of the session still in progress
+        :param open_idle: (start, end) of the idle period still in progress
+        :return: [{"app", "start", "end", "active", "idle", "inputs"}] with seconds of
+                 active (non-idle) and idle time and the input events in each session
+        """
+        with self._lock:
+            index = self.sessions
+            first, last = index.span(lo, hi)
+            sessions = [(index.starts[i], index.ends[i], index.values[i]) for i in range(first, last)]
+            if open_session is not None and open_session[2] > lo and open_session[1] < hi:
+                sessions.append((open_session[1], open_session[2], open_session[0]))
+
+            index = self.idle
+            first, last = index.span(lo, hi)
+            idle = [(index.starts[i], index.ends[i]) for i in range(first, last)]
+            if open_idle is not None and open_idle[1] > lo and open_idle[0] < hi:
+                idle.append(open_idle)
+
+            result = []
+            j = 0
+            for start, end, app in sessions:
+                a, b = max(start, lo), min(end, hi)
+                while j < len(idle) and idle[j][1] <= a:
+                    j += 1
+                idle_seconds = 0.0
+                k = j
+                while k < len(idle) and idle[k][0] < b:
+                    idle_seconds += max(0.0, min(b, idle[k][1]) - max(a, idle[k][0]))
+                    k += 1
+                result.append({"app": app, "start": a, "end": b, "active": b - a - idle_seconds,
+                               "idle": idle_seconds, "inputs": self.inputs.count(a, b)})
+        return result
+
+    def get_app_activity(self, lo, hi, open_session=None, open_idle=None):
+        """
+        Per app over [lo, hi): active and idle seconds, sessions and input density,
+        most active first (see ``get_sessions`` for the arguments).
+
+        :return: {app: {"active", "idle", "sessions", "inputs", "inputs_per_min"}}
+        """
+        apps = {}
+        for session in self.get_sessions(lo, hi, open_session, open_idle):
+            totals = apps.get(session["app"])
+            if totals is None:
+                totals = apps[session["app"]] = {"active": 0.0, "idle": 0.0, "sessions": 0, "inputs": 0}
+            totals["active"] += session["active"]
+            totals["idle"] += session["idle"]
+            totals["sessions"] += 1
+            totals["inputs"] += session["inputs"]
+        for totals in apps.values():
+            active_minutes = totals["active"] / 60
+            totals["inputs_per_min"] = round(totals["inputs"] / active_minutes, 1) if active_minutes else 0.0
+            totals["active"] = round(totals["active"], 1)
+            totals["idle"] = round(totals["idle"], 1)
+        return dict(sorted(apps.items(), key=lambda item: item[1]["active"], reverse=True))
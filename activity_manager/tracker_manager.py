@@ -1,56 +1,373 @@
 """
-Tracker Manager — orchestrates all trackers (keyboard, mouse, apps, idle).
+Tracker Manager — orchestrates the enabled trackers (keyboard, mouse, apps, idle).
 Provides unified APIs for the GUI and storage.
+
+Trackers come from the registry (trackers/registry.py): a tracker's module is
+imported, and the shared event source created, only once a tracker that needs
+it is enabled, and trackers can be started and stopped at runtime. Optional
+features (encryption, the write-ahead ring, sync, charts) likewise import
+their modules only when configured or first queried.
 """
 
-from activity_manager.trackers.keyboard_tracker import KeyboardTracker
-from activity_manager.trackers.mouse_tracker import MouseTracker
-from activity_manager.trackers.app_tracker import AppTracker
-from activity_manager.trackers.idle_tracker import IdleTracker
+import datetime
+import threading
+import time
+
+from activity_manager.metrics import MetricsRegistry
+from activity_manager.rollups import RollupEngine
+from activity_manager.snapshot import DashboardSnapshot, SnapshotBuffer
+from activity_manager.trackers.event_source import default_source
+from activity_manager.trackers.registry import DEFAULT_TRACKERS, load_tracker
+from activity_manager.storage.event_pipeline import EventPipeline
+from activity_manager.storage.segments import LogRotation
 from activity_manager.storage.storage_manager import StorageManager
 
 
 class TrackerManager:
-    def __init__(self):
-        # Storage (logs everything to file by default)
-        self.storage = StorageManager(mode="file", path="logs/activity.log")
-
-        # Initialize trackers
-        self.keyboard = KeyboardTracker()
-        self.mouse = MouseTracker()
-        self.app = AppTracker()
-        self.idle = IdleTracker()
-
-        # Start background trackers
-        self.keyboard.start()
-        self.mouse.start()
-        self.app.start()
-        self.idle.start()
+    def __init__(self, storage_mode="file", storage_path="logs/activity.log", source=None,
+                 refresh_interval=1.0, rotation=None, typing_metrics_only=False,
+                 encryption_key=None, metrics_interval=10.0, trackers=DEFAULT_TRACKERS,
+                 wal_path="logs/pipeline.wal", wal_fsync="interval", overload_policies=None,
+                 sync_url=None, sync_token=None):
+        """
+        :param storage_mode: "file" (JSON lines) or "sqlite"
+        :param storage_path: log file or database path for the storage backend
+        :param source: EventSource feeding all trackers (defaults to the macOS taps)
+        :param refresh_interval: how often (in seconds) the dashboard snapshot is republished
+        :param rotation: LogRotation policy for every log file (defaults to daily/64 MB
+                         segments, gzipped and kept; pass retention_days to expire them)
+        :param typing_metrics_only: record typing rhythm only, never key identities or text
+        :param encryption_key: optional 32-byte key (see encryption.load_key); when given,
+                               storage and every log file are encrypted at rest
+        :param metrics_interval: how often (in seconds) a metrics snapshot is written to
+                                 logs/metrics.json
+        :param trackers: names of the trackers to start (see registry.TRACKERS); the
+                         others are neither imported nor started until start_tracker()
+        :param wal_path: memory-mapped write-ahead ring journaling every record until it
+                         is durably written (None keeps records in an in-memory queue only)
+        :param wal_fsync: when storage is fsync'ed and the ring checkpointed: "never",
+                          "interval" (at most every second) or "batch" (after every
+                          committed batch); see storage/wal_ring.py
+        :param overload_policies: {kind: OverloadPolicy} for clicks, scrolls and key
+                                  auto-repeat (see trackers/overload.py DEFAULT_POLICIES)
+        :param sync_url: collector endpoint new rollups and sessions are synced to in the
+                         background (see sync.py); None disables syncing
+        :param sync_token: bearer token the collector expects
+        """
+        # Performance instrumentation, exported periodically and shown in Diagnostics
+        self.metrics = MetricsRegistry(path="logs/metrics.json", interval=metrics_interval)
+        self.metrics.start()
+
+        self.cipher = None
+        if encryption_key:
+            from activity_manager.storage.encryption import ChunkCipher
+
+            self.cipher = ChunkCipher(encryption_key)
+
+        # Log files are sealed into compressed segments in the background
+        self.rotation = rotation if rotation is not None else LogRotation()
+        self.rotation.start()
+
+        # Shared write-behind pipeline: tracker callbacks only enqueue, into a crash-safe
+        # ring when wal_path is set
+        wal = None
+        if wal_path:
+            from activity_manager.storage.wal_ring import WriteAheadRing
+
+            wal = WriteAheadRing(wal_path, fsync=wal_fsync, cipher=self.cipher)
+        self.pipeline = EventPipeline(rotation=self.rotation, cipher=self.cipher, metrics=self.metrics,
+                                      wal=wal)
+
+        # Storage (logs everything to file by default); registered with the pipeline
+        # before it starts, so records recovered from the ring can be replayed into it
+        self.storage = StorageManager(mode=storage_mode, path=storage_path, pipeline=self.pipeline,
+                                      rotation=self.rotation, cipher=self.cipher)
+        self.pipeline.start()
+
+        # App sessions joined with idle periods and input, built on first query (see _get_timeline)
+        self.timeline = None
+        self._timeline_lock = threading.Lock()
+
+        # Time-bucketed counters; all stats and reporting read from here
+        self.rollups = RollupEngine(path="logs/rollups.db")
+        self.rollups.start()
+
+        # Chart series at several resolutions, built from the rollups on first use
+        self.charts = None
+
+        # Deltas since the last sync are shipped to a collector, if one is configured
+        self.sync = None
+        if sync_url:
+            from activity_manager.sync import SyncClient
+
+            self.sync = SyncClient(sync_url, rollups_path="logs/rollups.db", storage_mode=storage_mode,
+                                   storage_path=storage_path, key=encryption_key, token=sync_token)
+            for stat in ("batches", "rows", "bytes_sent", "retries", "failures"):
+                self.metrics.gauge(f"sync.{stat}", lambda stat=stat: self.sync.stats[stat])
+            self.sync.start()
+
+        # One event source shared by every tracker, created with the first one
+        self.source = source
+        self._source_started = False
+        self.metrics.gauge("source.tap_reenables", lambda: getattr(self.source, "reenables", 0))
+
+        # Enabled trackers, by registry name
+        self.typing_metrics_only = typing_metrics_only
+        self.overload_policies = overload_policies
+        self.trackers = {}
+        self.enabled = set()
+        for name in trackers:
+            self.start_tracker(name)
+
+        # Dashboard state is published off the GUI thread and double-buffered
+        self.snapshots = SnapshotBuffer(self.metrics.timed("snapshot.build", self._build_snapshot),
+                                        interval=refresh_interval)
+        self.snapshots.start()
+
+    # ---- Tracker lifecycle ------------------------------------------------
+    def start_tracker(self, name):
+        """Import (on first use), build and start the tracker registered as ``name``."""
+        if name in self.enabled:
+            return self.trackers[name]
+        tracker = self.trackers.get(name)
+        if tracker is None:
+            if self.source is None:
+                self.source = default_source()
+            self.source.metrics = self.metrics
+            tracker = self.trackers[name] = load_tracker(name)(
+                pipeline=self.pipeline, source=self.source, rollups=self.rollups,
+                storage=self.storage, **self._tracker_options(name))
+            self._register_overload_gauges(tracker)
+        tracker.start()
+        self.enabled.add(name)
+        if not self._source_started:
+            self.source.start()
+            self._source_started = True
+        return tracker
+
+    def stop_tracker(self, name):
+        """Stop a running tracker; it keeps its state and can be started again."""
+        if name in self.enabled:
+            self.enabled.discard(name)
+            self.trackers[name].stop()
+
+    def get_enabled_trackers(self):
+        return sorted(self.enabled)
+
+    def _tracker_options(self, name):
+        """Constructor arguments specific to one built-in tracker."""
+        if name == "keyboard":
+            return {"metrics_only": self.typing_metrics_only,
+                    "active_app": lambda: self.app.get_active_app() if self.app else None,
+                    "policies": self.overload_policies}
+        if name == "mouse":
+            return {"metrics": self.metrics, "policies": self.overload_policies}
+        if name in ("app", "idle"):
+            return {"metrics": self.metrics}
+        return {}
+
+    def _register_overload_gauges(self, tracker):
+        """Gauges ``overload.<kind>.<stat>`` for trackers reporting get_overload_stats()."""
+        get_stats = getattr(tracker, "get_overload_stats", None)
+        if get_stats is None:
+            return
+        for kind, stats in get_stats().items():
+            for stat in stats:
+                self.metrics.gauge(f"overload.{kind}.{stat}",
+                                   lambda kind=kind, stat=stat: get_stats()[kind][stat])
+
+    @property
+    def keyboard(self):
+        return self.trackers.get("keyboard")
+
+    @property
+    def mouse(self):
+        return self.trackers.get("mouse")
+
+    @property
+    def app(self):
+        return self.trackers.get("app")
+
+    @property
+    def idle(self):
+        return self.trackers.get("idle")
+
+    def _build_snapshot(self):
+        """Runs on the snapshot thread: gather immutable copies of tracker state."""
+        app = self.app
+        return DashboardSnapshot(
+            version=0,
+            active_app=self.get_active_app(),
+            recent_apps=app.recent_apps if app else (),
+            last_keys=tuple(self.get_last_keys()),
+            mouse_stats=tuple(self.get_mouse_stats().items()),
+            idle_time=self.get_idle_time(),
+        )
+
+    def get_snapshot(self) -> DashboardSnapshot:
+        """Latest published dashboard snapshot; compare .version to detect changes."""
+        return self.snapshots.get()
 
     def get_dashboard_data(self):
+        snapshot = self.get_snapshot()
         return {
-            "last_keys": self.keyboard.get_last_keys(),
-            "mouse_stats": self.mouse.get_stats(),
-            "active_app": self.app.get_active_app(),
-            "recent_apps": self.app.get_recent_apps(),
-            "idle_time": self.idle.get_idle_time(),
+            "last_keys": list(snapshot.last_keys),
+            "mouse_stats": dict(snapshot.mouse_stats),
+            "active_app": snapshot.active_app,
+            "recent_apps": list(snapshot.recent_apps),
+            "idle_time": snapshot.idle_time,
         }
 
     def get_last_keys(self):
-        return self.keyboard.get_last_keys()
+        return self.keyboard.get_last_keys() if self.keyboard else []
 
     def get_active_app(self):
-        return self.app.get_active_app()
+        return self.app.get_active_app() if self.app else "Unknown"
+
+    def get_idle_time(self):
+        return self.idle.get_idle_time() if self.idle else 0
+
+    def get_mouse_stats(self):
+        """Today's mouse counters, from the rollups."""
+        today = self.rollups.totals(days=1)
+        return {
+            "Clicks": today["clicks"],
+            "Moves": today["moves"],
+            "Scrolls": today["scrolls"],
+        }
 
-    def get_stats(self):
-        """Return a dictionary of tracked stats."""
+    def get_stats(self, hours=None, days=1):
+        """Return a dictionary of tracked stats over the last N hours or days (default: today)."""
+        totals = self.get_rollups(hours=hours, days=days)
         return {
-            "keys": self.keyboard.count,
-            "mouse_moves": self.mouse.moves,
-            "idle_time": self.idle.get_idle_time(),
-            "active_app": self.app.get_active_app()
+            "keys": totals["keys"],
+            "clicks": totals["clicks"],
+            "scrolls": totals["scrolls"],
+            "mouse_moves": totals["moves"],
+            "mouse_distance": round(totals["distance"], 1),
+            "mouse_kinematics": self.mouse.get_kinematics() if self.mouse else {},
+            "typing": self.keyboard.get_typing_stats() if self.keyboard else {},
+            "idle_seconds": totals["idle_seconds"],
+            "apps": totals["apps"],
+            "idle_time": self.get_idle_time(),
+            "active_app": self.get_active_app()
         }
 
+    def get_rollups(self, hours=None, days=None):
+        """Aggregated counters for the last N hours or days, in O(buckets)."""
+        return self.rollups.totals(hours=hours, days=days)
+
+    def get_app_activity(self, hours=None, days=1, start=None, end=None):
+        """
+        Active (non-idle) and idle seconds, sessions and input density per app over
+        the last N hours or days (default: today), or over [start, end) in UNIX time.
+        """
+        timeline, lo, hi = self._timeline_window(hours, days, start, end)
+        return timeline.get_app_activity(lo, hi, *self._open_intervals())
+
+    def get_timeline(self, hours=None, days=1, start=None, end=None):
+        """App-focus sessions with their active/idle seconds and input counts (see get_app_activity)."""
+        timeline, lo, hi = self._timeline_window(hours, days, start, end)
+        return timeline.get_sessions(lo, hi, *self._open_intervals())
+
+    def get_chart(self, start, end, width=800):
+        """keys/min, clicks/min and idle share over [start, end) at ``width`` points, plus top apps."""
+        if self.charts is None:
+            from activity_manager.charts import TieredSeries
+
+            self.charts = TieredSeries(self.rollups)
+        return self.charts.chart(start, end, width)
+
+    def _feed_timeline(self, event_type, details, ts):
+        # Events timed before this run (e.g. replayed ones) are in storage, loaded with history
+        if ts >= self._timeline_start:
+            self.timeline.add_event(event_type, details, ts)
+
+    def _get_timeline(self):
+        """
+        The Timeline, created on first use: fed live from storage from then on, with
+        everything earlier loaded from storage once the pipeline has written it.
+        """
+        with self._timeline_lock:
+            if self.timeline is None:
+                from activity_manager.timeline import Timeline
+
+                self.timeline = Timeline()
+                # Listening before the start is set: an event the listener skips is
+                # timed before the start, so it's in storage after the flush below
+                self._timeline_start = float("inf")
+                self.storage.listeners.append(self._feed_timeline)
+                self._timeline_start = self._timeline_from = time.time()
+                self.pipeline.flush()
+            return self.timeline
+
+    def _timeline_window(self, hours, days, start, end):
+        timeline = self._get_timeline()
+        hi = time.time() if end is None else end
+        if start is not None:
+            lo = start
+        elif hours is not None:
+            lo = hi - hours * 3600
+        else:
+            today = datetime.datetime.fromtimestamp(hi).date() - datetime.timedelta(days=(days or 1) - 1)
+            lo = datetime.datetime(today.year, today.month, today.day).timestamp()
+        if lo < self._timeline_from:
+            from activity_manager.timeline import TIMELINE_TYPES
+
+            # Intervals are stored when they close, so [lo, loaded) holds every one ending there
+            self.storage.flush()
+            timeline.load(self.storage.query(lo, self._timeline_from, types=TIMELINE_TYPES))
+            self._timeline_from = lo
+        return timeline, lo, hi
+
+    def _open_intervals(self):
+        """(open_session, open_idle) in progress, as Timeline queries take them."""
+        now = time.time()
+        session = self.app.get_current_session() if self.app else None
+        idle = self.idle.get_current_idle() if self.idle else None
+        return ((session[0], session[2], now) if session else None,
+                (idle[0], now) if idle else None)
+
+    def query(self, start, end, types=None):
+        """Stream stored events in [start, end); see StorageManager.query."""
+        return self.storage.query(start, end, types=types)
+
+    def export_report(self, csv_path, start, end, pdf_path=None, workers=None):
+        """
+        Export per-day stats for [start, end) to CSV (and optionally a PDF summary),
+        aggregating days in parallel worker processes. Returns the number of days.
+        """
+        from activity_manager.export import export_report
+
+        self.storage.flush()
+        return export_report(self.storage.mode, self.storage.path, start, end, csv_path,
+                             pdf_path=pdf_path, workers=workers,
+                             key=self.cipher.key if self.cipher else None)
+
+    def get_pipeline_stats(self):
+        """Return write pipeline throughput (events/sec) and queue depth."""
+        return self.pipeline.get_stats()
+
+    def get_metrics(self):
+        """
+        Snapshot of the performance metrics: counters and their per-second rates
+        (events by type, bytes written), gauges (queue depth, dropped events,
+        tap re-enables) and latency summaries (callbacks, writes) in microseconds.
+        """
+        return self.metrics.snapshot()
+
     def close(self):
-        """Gracefully close storage backend"""
+        """Stop capture, drain the write pipeline, then gracefully close storage backend"""
+        self.snapshots.stop()
+        for name in list(self.enabled):
+            self.stop_tracker(name)
+        if self._source_started:
+            self.source.stop()
+        if self.sync:
+            self.sync.close()
+        self.rollups.stop()
+        self.rollups.close()
+        self.pipeline.stop()
         self.storage.close()
+        self.rotation.stop()
+        self.metrics.stop()
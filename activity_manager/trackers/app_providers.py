@@ -0,0 +1,136 @@
+"""
+App Activation Providers — tell AppTracker when the frontmost app changes.
+
+A provider calls ``callback(app_name, bundle_id, ts)`` on every activation:
+
+- WorkspaceNotificationProvider: event-driven, via NSWorkspace activation
+  notifications (no wakeups while nothing changes, no missed short switches)
+- PollingAppProvider: samples a ``frontmost()`` query on a fixed interval
+- FakeAppProvider: switches are driven by calling ``activate()`` (tests, Linux)
+"""
+
+import threading
+import time
+
+
+class AppProvider:
+    def start(self, callback):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def frontmost(self):
+        """Return (app_name, bundle_id) of the current frontmost app."""
+        raise NotImplementedError
+
+
+class WorkspaceNotificationProvider(AppProvider):
+    def __init__(self):
+        self._observer = None
+        self._center = None
+
+    def start(self, callback):
+        from AppKit import (
+            NSWorkspace,
+            NSWorkspaceApplicationKey,
+            NSWorkspaceDidActivateApplicationNotification,
+        )
+        from Foundation import NSOperationQueue
+
+        def on_activate(notification):
+            app = notification.userInfo()[NSWorkspaceApplicationKey]
+            callback(app.localizedName(), app.bundleIdentifier(), time.time())
+
+        self._center = NSWorkspace.sharedWorkspace().notificationCenter()
+        # Deliver on a background queue so callbacks never run on the GUI thread
+        self._observer = self._center.addObserverForName_object_queue_usingBlock_(
+            NSWorkspaceDidActivateApplicationNotification,
+            None,
+            NSOperationQueue.alloc().init(),
+            on_activate,
+        )
+
+        # Open the first session with whatever is frontmost right now
+        app_name, bundle_id = self.frontmost()
+        callback(app_name, bundle_id, time.time())
+
+    def stop(self):
+        if self._observer is not None:
+            self._center.removeObserver_(self._observer)
+            self._observer = None
+
+    def frontmost(self):
+        from AppKit import NSWorkspace
+
+        active_app = NSWorkspace.sharedWorkspace().frontmostApplication()
+        return active_app.localizedName(), active_app.bundleIdentifier()
+
+
+class PollingAppProvider(AppProvider):
+    def __init__(self, query, interval=1.0):
+        """
+        :param query: callable returning (app_name, bundle_id)
+        :param interval: how often (in seconds) to poll
+        """
+        self.query = query
+        self.interval = interval
+        self.running = False
+        self.thread = None
+        self._stop = threading.Event()
+
+    def start(self, callback):
+        if not self.running:
+            self.running = True
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self, callback):
+        while True:
+            app_name, bundle_id = self.query()
+            callback(app_name, bundle_id, time.time())
+            if self._stop.wait(self.interval):
+                return
+
+    def frontmost(self):
+        return self.query()
+
+
+class FakeAppProvider(AppProvider):
+    def __init__(self):
+        self._callback = None
+        self._current = ("Unknown", None)
+
+    def start(self, callback):
+        self._callback = callback
+
+    def stop(self):
+        self._callback = None
+
+    def activate(self, app_name, bundle_id=None, ts=None):
+        """Simulate ``app_name`` becoming frontmost at ``ts`` (defaults to now)."""
+        self._current = (app_name, bundle_id)
+        if self._callback:
+            self._callback(app_name, bundle_id, time.time() if ts is None else ts)
+
+    def frontmost(self):
+        return self._current
+
+
+def default_app_provider(source, event_driven=True):
+    """Notification provider on macOS; otherwise poll the event source once a second."""
+    if event_driven:
+        try:
+            import AppKit  # noqa: F401
+        except ImportError:
+            pass
+        else:
+            return WorkspaceNotificationProvider()
+    return PollingAppProvider(source.frontmost_app)
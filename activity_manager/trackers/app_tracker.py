@@ -1,59 +1,147 @@
 # activity_manager/trackers/application_tracker.py
-import json
+import os
 import threading
 import time
 import datetime
-from AppKit import NSWorkspace
+from collections import deque
+
+from activity_manager.storage.event_pipeline import append_jsonl
+from activity_manager.trackers.app_providers import default_app_provider
+from activity_manager.trackers.event_source import APP, default_source
 
 
 class AppTracker:
-    def __init__(self, storage=None):
+    def __init__(self, storage=None, log_file="logs/apps.log", pipeline=None, source=None,
+                 rollups=None, provider=None, event_driven=True,
+                 session_file="logs/app_sessions.log", recent_size=5, metrics=None):
         """
-        :param storage: optional storage backend (must implement .log_event)
+        :param storage: optional StorageManager receiving normalized events
+        :param log_file: JSON-lines file app switches are appended to
+        :param pipeline: optional EventPipeline; log writes are enqueued instead of done inline
+        :param source: EventSource to read the frontmost app from (defaults to NSWorkspace)
+        :param rollups: optional RollupEngine credited with foreground seconds per app
+        :param provider: AppProvider reporting activations; when omitted, sources that push
+                         "app" events are subscribed to, otherwise a default provider is used
+        :param event_driven: default provider listens for activation notifications (True)
+                             or polls once a second (False)
+        :param session_file: JSON-lines file closed app sessions are appended to
+        :param recent_size: how many recent apps to keep
+        :param metrics: optional MetricsRegistry timing provider callbacks
+                        (source events are timed by the source itself)
         """
         self.running = False
-        self.thread = None
         self.last_app = None
-        self.recent_apps = []  # keep a small history
+        self._recent = deque(maxlen=recent_size)
+        self.recent_apps = ()  # immutable copy of _recent for other threads
         self.storage = storage
+        self.pipeline = pipeline
+        self.rollups = rollups
+        self.log_file = log_file
+        self.session_file = session_file
+        self._owns_source = source is None and provider is None
+        self.source = source if source is not None or provider is not None else default_source()
+        self.provider = provider
+        self.event_driven = event_driven
+        self.metrics = metrics
+
+        # Current (open) session
+        self._bundle_id = None
+        self._since = None  # when last_app became frontmost
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
 
     def start(self):
         if not self.running:
             self.running = True
-            self.thread = threading.Thread(target=self._run, daemon=True)
-            self.thread.start()
+            if self.provider is None and self.source.pushes_app_events:
+                self.source.subscribe((APP,), self._on_event)
+                if self._owns_source:
+                    self.source.start()
+            else:
+                if self.provider is None:
+                    self.provider = default_app_provider(self.source, self.event_driven)
+                callback = self._on_activation
+                if self.metrics:
+                    callback = self.metrics.timed("callback.AppTracker._on_activation", callback)
+                self.provider.start(callback)
             print("[ApplicationTracker] Started.")
 
     def stop(self):
         self.running = False
-        if self.thread:
-            self.thread.join()
+        if self.source is not None:
+            self.source.unsubscribe(self._on_event)
+        if self.provider is not None:
+            self.provider.stop()
+        if self._owns_source:
+            self.source.stop()
+        with self._lock:
+            self._close_session(time.time())
         print("[ApplicationTracker] Stopped.")
 
-    def _run(self):
-        while self.running:
-            active_app = NSWorkspace.sharedWorkspace().frontmostApplication()
-            app_name = active_app.localizedName()
-            bundle_id = active_app.bundleIdentifier()
+    def _on_event(self, kind, app, ts):
+        """Event source callback for "app" events."""
+        self._on_activation(app[0], app[1], ts)
 
-            if app_name != self.last_app:
-                self.last_app = app_name
-                self.recent_apps.insert(0, f"{app_name} ({bundle_id})")
-                self.recent_apps = self.recent_apps[:5]
+    def _on_activation(self, app_name, bundle_id, ts):
+        """Record a switch if the frontmost app changed: close the old session, open a new one."""
+        with self._lock:
+            if app_name == self.last_app and self._since is not None:
+                return
+            self._close_session(ts)
+            self.last_app = app_name
+            self._bundle_id = bundle_id
+            self._since = ts
+            self._recent.appendleft(f"{app_name} ({bundle_id})")
+            self.recent_apps = tuple(self._recent)
 
-                log_entry = {
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "event": "switch",
-                    "app_name": app_name,
-                    "bundle_id": bundle_id,
-                }
-                with open("logs/apps.log", "a") as f:
-                    f.write(json.dumps(log_entry) + "\n")
+        log_entry = {
+            "timestamp": datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S"),
+            "event": "switch",
+            "app_name": app_name,
+            "bundle_id": bundle_id,
+        }
+        self._write(self.log_file, log_entry)
+        if self.storage:
+            self.storage.log_event("app_switch", {"app_name": app_name, "bundle_id": bundle_id}, ts)
 
-            time.sleep(1)  # check every second
+    def _close_session(self, end):
+        """Emit the dwell-time record for the app that was frontmost until ``end``."""
+        if self.last_app is None or self._since is None:
+            return
+        start = self._since
+        self._since = None
+        if self.rollups:
+            self.rollups.add_app_time(self.last_app, start, end)
+
+        session = {
+            "event": "session",
+            "app_name": self.last_app,
+            "bundle_id": self._bundle_id,
+            "start": datetime.datetime.fromtimestamp(start).isoformat(),
+            "end": datetime.datetime.fromtimestamp(end).isoformat(),
+            "duration": round(end - start, 3),
+        }
+        self._write(self.session_file, session)
+        if self.storage:
+            details = {k: v for k, v in session.items() if k != "event"}
+            self.storage.log_event("app_session", details, end)  # logged when it closes
+
+    def _write(self, path, record):
+        if self.pipeline:
+            self.pipeline.submit(path, record)
+        else:
+            append_jsonl(path, record)
 
     def get_active_app(self):
         return self.last_app if self.last_app else "Unknown"
 
     def get_recent_apps(self):
-        return self.recent_apps
+        return list(self.recent_apps)
+
+    def get_current_session(self):
+        """Return (app_name, bundle_id, start, seconds so far) for the open session, or None."""
+        since = self._since
+        if self.last_app is None or since is None:
+            return None
+        return self.last_app, self._bundle_id, since, time.time() - since
@@ -0,0 +1,319 @@
+"""
+Event Sources — platform-neutral input feeding the trackers.
+
+A source pushes normalized events to subscribed handlers as
+``handler(kind, value, ts)`` where ``ts`` is a UNIX timestamp (float seconds):
+
+    "key"                       value = macOS virtual key code (int)
+    "key_repeat"                value = key code of a held key (auto-repeat)
+    "click" / "move" / "scroll" value = (x, y) cursor position, or None
+    "app"                       value = (app_name, bundle_id)
+
+and answers the polled queries ``idle_seconds()`` and ``frontmost_app()``.
+
+``QuartzEventSource`` (see quartz_source.py) captures the real macOS taps;
+``ReplayEventSource`` replays the JSON-lines logs and ``SyntheticEventSource``
+generates events, so the tracker hot paths run anywhere.
+"""
+
+import datetime
+import heapq
+import json
+import os
+import re
+import threading
+import time
+
+from activity_manager.storage.segments import open_segment, segments_between
+
+KEY = "key"
+KEY_REPEAT = "key_repeat"
+CLICK = "click"
+MOVE = "move"
+SCROLL = "scroll"
+APP = "app"
+
+MOUSE_KINDS = (CLICK, MOVE, SCROLL)
+
+# event kind -> events/sec counter name
+EVENT_COUNTERS = {kind: f"events.{kind}" for kind in (KEY, KEY_REPEAT, CLICK, MOVE, SCROLL, APP)}
+
+
+class EventSource:
+    """
+    Base class: subscription bookkeeping and dispatch.
+
+    Set ``metrics`` to a MetricsRegistry to count events by kind
+    (``events.<kind>``) and time every handler call (``callback.<handler>``).
+    """
+
+    # True if the source pushes "app" events itself, so AppTracker need not poll
+    pushes_app_events = False
+
+    def __init__(self):
+        self._handlers = {}  # kind -> tuple of handlers (replaced, never mutated)
+        self._lock = threading.Lock()
+        self.metrics = None
+        self._callback_names = {}  # handler -> latency metric name
+        self._timers = {}  # handler -> LatencyHistogram, for the current metrics
+        self._timers_for = None
+
+    def subscribe(self, kinds, handler):
+        with self._lock:
+            for kind in kinds:
+                self._handlers[kind] = self._handlers.get(kind, ()) + (handler,)
+            name = getattr(handler, "__qualname__", type(handler).__name__)
+            self._callback_names[handler] = f"callback.{name}"
+
+    def unsubscribe(self, handler):
+        with self._lock:
+            for kind, handlers in list(self._handlers.items()):
+                remaining = tuple(h for h in handlers if h != handler)
+                if remaining:
+                    self._handlers[kind] = remaining
+                else:
+                    del self._handlers[kind]
+
+    def subscribed_kinds(self):
+        return set(self._handlers)
+
+    def emit(self, kind, value=None, ts=None):
+        """Dispatch one event to every handler subscribed to ``kind``."""
+        if ts is None:
+            ts = time.time()
+        metrics = self.metrics
+        if metrics is None:
+            for handler in self._handlers.get(kind, ()):
+                handler(kind, value, ts)
+            return
+
+        metrics.count(EVENT_COUNTERS.get(kind, kind))
+        if self._timers_for is not metrics:
+            self._timers = {}
+            self._timers_for = metrics
+        timers = self._timers
+        perf_counter_ns = time.perf_counter_ns
+        for handler in self._handlers.get(kind, ()):
+            timer = timers.get(handler)
+            if timer is None:
+                timer = timers[handler] = metrics.histogram(self._callback_names.get(handler, "callback"))
+            t0 = perf_counter_ns()
+            handler(kind, value, ts)
+            timer.add(perf_counter_ns() - t0)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def idle_seconds(self) -> float:
+        raise NotImplementedError
+
+    def frontmost_app(self):
+        raise NotImplementedError
+
+
+class _ClockedSource(EventSource):
+    """Source whose idle/frontmost state follows the events it has emitted."""
+
+    pushes_app_events = True
+
+    def __init__(self):
+        super().__init__()
+        self.now = None  # timestamp of the most recently emitted event
+        self._last_input = None
+        self._app = ("Unknown", None)
+        self.running = False
+        self.thread = None
+
+    def emit(self, kind, value=None, ts=None):
+        if ts is None:
+            ts = time.time()
+        self.now = ts
+        if kind == APP:
+            self._app = value
+        else:
+            self._last_input = ts
+        super().emit(kind, value, ts)
+
+    def idle_seconds(self) -> float:
+        if self._last_input is None:
+            return 0.0
+        return max(0.0, self.now - self._last_input)
+
+    def frontmost_app(self):
+        return self._app
+
+    def events(self):
+        """Yield (kind, value, ts) tuples; implemented by subclasses."""
+        raise NotImplementedError
+
+    def run(self) -> int:
+        """Emit every event synchronously; returns the number emitted."""
+        count = 0
+        for kind, value, ts in self.events():
+            if not self.running and self.thread is not None:
+                break
+            self.emit(kind, value, ts)
+            count += 1
+        return count
+
+    def start(self):
+        """Emit events from a background thread."""
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+class SyntheticEventSource(_ClockedSource):
+    """Deterministic generated input: a typing/mouse mix with periodic app switches."""
+
+    def __init__(self, count=100000, rate=None, start_ts=None, app_switch_every=5000):
+        """
+        :param count: number of events to generate
+        :param rate: simulated events per second (spacing of timestamps); None = 1000/s
+        :param start_ts: timestamp of the first event (defaults to now)
+        :param app_switch_every: emit an "app" switch every N events
+        """
+        super().__init__()
+        self.count = count
+        self.step = 1.0 / (rate or 1000)
+        self.start_ts = start_ts if start_ts is not None else time.time()
+        self.app_switch_every = app_switch_every
+
+    def events(self):
+        apps = [("Terminal", "com.apple.Terminal"), ("Safari", "com.apple.Safari"),
+                ("Xcode", "com.apple.dt.Xcode")]
+        keycodes = [0, 1, 2, 3, 49, 14, 15, 17, 31, 35, 51, 36]
+        ts = self.start_ts
+        x, y = 500.0, 400.0
+        for i in range(self.count):
+            ts += self.step
+            if i % self.app_switch_every == 0:
+                yield APP, apps[(i // self.app_switch_every) % len(apps)], ts
+                continue
+            slot = i % 10
+            if slot < 4:
+                yield KEY, keycodes[i % len(keycodes)], ts
+            elif slot < 8:
+                x = (x + 3) % 1920
+                y = (y + 2) % 1080
+                yield MOVE, (x, y), ts
+            elif slot == 8:
+                yield CLICK, (x, y), ts
+            else:
+                yield SCROLL, (x, y), ts
+
+
+class ReplayEventSource(_ClockedSource):
+    """Replays the trackers' JSON-lines logs (keyboard/mouse/apps) in timestamp order."""
+
+    def __init__(self, log_dir="logs", speed=None, cipher=None):
+        """
+        :param log_dir: directory holding keyboard.log, mouse.log and apps.log
+        :param speed: None replays as fast as possible; 1.0 = real time, 10.0 = 10x
+        :param cipher: ChunkCipher for encrypted logs
+        """
+        super().__init__()
+        self.log_dir = log_dir
+        self.speed = speed
+        self.cipher = cipher
+
+    def events(self):
+        streams = [
+            _read_keyboard_log(os.path.join(self.log_dir, "keyboard.log"), self.cipher),
+            _read_mouse_log(os.path.join(self.log_dir, "mouse.log"), self.cipher),
+            _read_apps_log(os.path.join(self.log_dir, "apps.log"), self.cipher),
+        ]
+        merged = heapq.merge(*streams, key=lambda e: e[2])
+        if not self.speed:
+            yield from merged
+            return
+
+        wall_start = time.monotonic()
+        first_ts = None
+        for event in merged:
+            if first_ts is None:
+                first_ts = event[2]
+            delay = (event[2] - first_ts) / self.speed - (time.monotonic() - wall_start)
+            if delay > 0:
+                time.sleep(delay)
+            yield event
+
+
+# ---- Log readers ----------------------------------------------------------
+_KEYCODE_RE = re.compile(r"^\[(\d+)\]$")
+
+
+def _parse_ts(value) -> float:
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _read_jsonl(path, cipher=None):
+    """Records of every segment of ``path`` (sealed ones first, then the active file)."""
+    for segment in segments_between(path):
+        with open_segment(segment, cipher) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partially written tail line
+
+
+def _read_keyboard_log(path, cipher=None):
+    from activity_manager.trackers.keyboard_tracker import KEY_MAP
+
+    codes = {label: code for code, label in KEY_MAP.items()}
+    for record in _read_jsonl(path, cipher):
+        label = record.get("key", "")
+        code = codes.get(label)
+        if code is None:
+            match = _KEYCODE_RE.match(label)
+            if not match:
+                continue
+            code = int(match.group(1))
+        ts = _parse_ts(record["timestamp"])
+        if "count" in record:  # auto-repeats collapsed into one record
+            for _ in range(record["count"]):
+                yield KEY_REPEAT, code, ts
+        else:
+            yield KEY, code, ts
+
+
+def _read_mouse_log(path, cipher=None):
+    last_ts = None
+    for record in _read_jsonl(path, cipher):
+        ts = _parse_ts(record["ts"])
+        event = record.get("event")
+        if event in (CLICK, SCROLL):
+            for _ in range(record.get("count", 1)):  # coalesced records stand for several
+                yield event, None, ts
+        elif event == "mouse_moves":
+            # Aggregated moves: spread them evenly since the previous record
+            count = record.get("count", 0)
+            span = (ts - last_ts) if last_ts is not None and ts > last_ts else 0.0
+            for i in range(count):
+                yield MOVE, None, ts - span + span * (i + 1) / count
+        last_ts = ts
+
+
+def _read_apps_log(path, cipher=None):
+    for record in _read_jsonl(path, cipher):
+        yield APP, (record.get("app_name"), record.get("bundle_id")), _parse_ts(record["timestamp"])
+
+
+def default_source():
+    """The real macOS capture source (imported lazily so other platforms don't need Quartz)."""
+    from activity_manager.trackers.quartz_source import QuartzEventSource
+
+    return QuartzEventSource()
@@ -1,75 +1,140 @@
 # activity_manager/trackers/idle_tracker.py
 
 import os
-import json
-import Quartz
 import threading
 import time
 import datetime
 
+from activity_manager.storage.event_pipeline import append_jsonl
+from activity_manager.trackers.event_source import default_source
+
 
 class IdleTracker:
-    def __init__(self, storage=None, interval=10, idle_threshold=60):
+    def __init__(self, storage=None, interval=10, idle_threshold=60,
+                 log_file="logs/idle.log", pipeline=None, source=None,
+                 rollups=None, min_interval=0.5, metrics=None):
         """
-        :param storage: optional storage backend (must implement .log_event)
-        :param interval: how often (in seconds) to check idle time
+        :param storage: optional StorageManager receiving normalized events
+        :param interval: longest time (in seconds) between idle samples
         :param idle_threshold: how many seconds counts as "idle"
+        :param log_file: JSON-lines file idle intervals are appended to
+        :param pipeline: optional EventPipeline; log writes are enqueued instead of done inline
+        :param source: EventSource answering idle_seconds() (defaults to Quartz)
+        :param rollups: optional RollupEngine credited with idle seconds
+        :param min_interval: shortest time (in seconds) between samples near the threshold
+        :param metrics: optional MetricsRegistry timing each sample (``callback.IdleTracker.poll``)
         """
         self.running = False
         self.thread = None
+        self._stop = threading.Event()
         self.storage = storage
+        self.pipeline = pipeline
+        self.rollups = rollups
+        self._idle_start = None  # when the current idle period began (None = active)
+        self._owns_source = source is None
+        self.source = source if source is not None else default_source()
         self.interval = interval
+        self.min_interval = min_interval
         self.idle_threshold = idle_threshold
-        self._was_idle = False  # track state to avoid spamming
+        self.samples = 0  # number of idle queries taken, to confirm the wakeup savings
+        self.metrics = metrics
 
-        os.makedirs("logs", exist_ok=True)
-        self.log_file = "logs/idle.log"
+        self.log_file = log_file
+        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
 
     def start(self):
         """Start the idle tracker thread."""
         if not self.running:
             self.running = True
+            self._stop.clear()
             self.thread = threading.Thread(target=self._run, daemon=True)
             self.thread.start()
             print("[IdleTracker] Started.")
 
     def stop(self):
-        """Stop the idle tracker."""
+        """Stop the idle tracker, closing an idle period still in progress."""
         self.running = False
+        self._stop.set()
         if self.thread:
             self.thread.join()
+        if self._idle_start is not None:
+            self._close_idle(time.time())
         print("[IdleTracker] Stopped.")
 
     def get_idle_time(self) -> int:
         """Return system idle time in seconds."""
-        idle = Quartz.CGEventSourceSecondsSinceLastEventType(
-            Quartz.kCGEventSourceStateCombinedSessionState,
-            Quartz.kCGAnyInputEventType
-        )
-        return int(idle)
+        return int(self.source.idle_seconds())
 
     def _run(self):
-        """Background loop that periodically logs idle state."""
+        """Background loop: sleep until the next possible idle transition, then sample."""
+        poll = self.metrics.timed("callback.IdleTracker.poll", self.poll) if self.metrics else self.poll
         while self.running:
-            idle_seconds = self.get_idle_time()
-            ts = datetime.datetime.now().isoformat()
+            delay = poll()
+            if self._stop.wait(delay):
+                return
+
+    def next_delay(self, idle_seconds) -> float:
+        """
+        Seconds until the next sample is worth taking.
+
+        While active, idle time can't reach the threshold sooner than
+        ``idle_threshold - idle_seconds`` from now, so sleep exactly that long
+        (never less than ``min_interval``). While idle, the period's start and end
+        are both derived from the idle counter, so resume only needs detecting
+        within ``interval``.
+        """
+        if self._idle_start is not None:
+            return self.interval
+        remaining = self.idle_threshold - idle_seconds
+        return max(self.min_interval, min(self.interval, remaining))
+
+    def poll(self, ts=None) -> float:
+        """Take one idle sample, open/close the idle interval on a transition, return the next delay."""
+        idle_seconds = self.source.idle_seconds()
+        now = ts or time.time()
+        self.samples += 1
+
+        # Crossed the threshold: idle started at the last input, idle_seconds ago
+        if idle_seconds > self.idle_threshold and self._idle_start is None:
+            self._idle_start = now - idle_seconds
+
+        # User became active again: the idle period ended at the last input
+        elif idle_seconds <= self.idle_threshold and self._idle_start is not None:
+            self._close_idle(now - idle_seconds)
 
-            # If idle crosses threshold and wasn't already idle → log once
-            if idle_seconds > self.idle_threshold and not self._was_idle:
-                event = {"timestamp": ts, "idle_seconds": idle_seconds}
+        return self.next_delay(idle_seconds)
 
-                # write to file
-                with open(self.log_file, "a") as f:
-                    f.write(json.dumps(event) + "\n")
+    def _close_idle(self, end):
+        """Record the open idle period as one [start, end) interval."""
+        start = self._idle_start
+        self._idle_start = None
+        if end <= start:
+            return
+        event = {
+            "timestamp": datetime.datetime.fromtimestamp(start).isoformat(),
+            "event": "idle",
+            "start": datetime.datetime.fromtimestamp(start).isoformat(),
+            "end": datetime.datetime.fromtimestamp(end).isoformat(),
+            "duration": round(end - start, 3),
+        }
 
-                # optional storage
-                if self.storage:
-                    self.storage.log_event("idle", event)
+        # write to file
+        if self.pipeline:
+            self.pipeline.submit(self.log_file, event)
+        else:
+            append_jsonl(self.log_file, event)
 
-                self._was_idle = True
+        # optional storage
+        if self.storage:
+            details = {k: event[k] for k in ("start", "end", "duration")}
+            self.storage.log_event("idle", details, end)  # logged when it closes
 
-            # If user became active again
-            if idle_seconds <= self.idle_threshold and self._was_idle:
-                self._was_idle = False
+        if self.rollups:
+            self.rollups.add_interval("idle_seconds", start, end)
 
-            time.sleep(self.interval)
+    def get_current_idle(self):
+        """Return (start, seconds so far) for an idle period in progress, or None."""
+        start = self._idle_start
+        if start is None:
+            return None
+        return start, time.time() - start
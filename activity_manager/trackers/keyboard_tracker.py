@@ -1,23 +1,15 @@
 # activity_manager/trackers/keyboard_tracker.py
 
 import os
-import threading
 import datetime
+import threading
 import time
 from collections import deque
-from Quartz.CoreGraphics import (
-    CGEventTapCreate,
-    CGEventTapEnable,
-    CGEventGetIntegerValueField,
-    kCGEventKeyDown,
-    kCGEventKeyUp,
-    kCGEventTapOptionDefault,
-    kCGHeadInsertEventTap,
-    kCGSessionEventTap,
-    kCGKeyboardEventKeycode,
-)
-import CoreFoundation as CF
-import json
+
+from activity_manager.storage.event_pipeline import PeriodicFlush, append_jsonl
+from activity_manager.trackers.event_source import KEY, KEY_REPEAT, default_source
+from activity_manager.trackers.overload import DEFAULT_POLICIES, Coalescer
+from activity_manager.trackers.typing_metrics import TypingMetrics
 
 KEY_MAP = {
     0: "a", 1: "s", 2: "d", 3: "f", 4: "h", 5: "g", 6: "z", 7: "x", 8: "c", 9: "v",
@@ -32,27 +24,65 @@ KEY_MAP = {
 
 
 class KeyboardTracker:
-    def __init__(self, storage=None, buffer_size=10, flush_interval=5):
+    def __init__(self, storage=None, buffer_size=10, flush_interval=5,
+                 log_file="logs/keyboard.log", summary_file="logs/summary.log", pipeline=None,
+                 source=None, rollups=None, metrics_only=False, metrics_file="logs/typing.log",
+                 active_app=None, policies=None, max_text=4096):
+        """
+        :param storage: optional StorageManager receiving normalized events
+        :param pipeline: optional EventPipeline; log writes are enqueued instead of done inline
+        :param source: EventSource delivering "key" events (defaults to the macOS event tap)
+        :param rollups: optional RollupEngine updated with key counts
+        :param metrics_only: record typing-rhythm metrics only; no key identities, raw key
+                             log or reconstructed text are kept or written
+        :param metrics_file: JSON-lines file the per-minute typing records are appended to
+                             (and stored as "typing" events) in metrics-only mode
+        :param active_app: optional callable returning the foreground app name, for
+                           per-app typing rates
+        :param policies: {"key_repeat": OverloadPolicy} collapsing auto-repeat of a held
+                         key, overriding DEFAULT_POLICIES
+        :param max_text: most characters of reconstructed text kept between flushes; the
+                         rest are dropped and counted in ``dropped_text``
+        """
         self.storage = storage
+        self.pipeline = pipeline
+        self.rollups = rollups
+        self._owns_source = source is None
+        self.source = source if source is not None else default_source()
         self.running = False
-        self.thread = None
         self.last_keys = deque(maxlen=buffer_size)
-        self.text_buffer = ""  # human-readable typed text
+        self._published_keys = ()  # immutable copy of last_keys for other threads
+        self.text_buffer = []  # human-readable typed text, one entry per character
         self.flush_interval = flush_interval
         self.last_flush = time.time()
 
-        os.makedirs("logs", exist_ok=True)
-        self.log_file = "logs/keyboard.log"
-        self.summary_file = "logs/summary.log"
+        self.log_file = log_file
+        self.summary_file = summary_file
+        self.metrics_file = metrics_file
+        self.metrics_only = metrics_only
+        self.active_app = active_app
+        self.metrics = TypingMetrics(self._write_metrics)
+        self._repeats = Coalescer({**DEFAULT_POLICIES, **(policies or {})}[KEY_REPEAT])
+        self._repeat_key = None  # key whose auto-repeats are being counted
+        self.max_text = max_text
+        self.dropped_text = 0
+        self._lock = threading.Lock()  # event callbacks vs the periodic flush
+        # Typed text and collapsed repeats are written within two flush intervals, even when typing stops
+        self._flusher = PeriodicFlush(self._flush_stale, flush_interval)
+        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
 
     def _append_to_summary(self, key_str):
         """Builds natural text and flushes periodically."""
         if key_str == "\n":  # Enter key
             self._flush(force=True)
         elif key_str == "[DEL]":
-            self.text_buffer = self.text_buffer[:-1]
+            if self.text_buffer:
+                self.text_buffer.pop()
         elif len(key_str) == 1 or key_str == " ":
-            self.text_buffer += key_str
+            if len(self.text_buffer) < self.max_text:
+                self.text_buffer.append(key_str)
+            else:
+                self.dropped_text += 1
         # Ignore arrows, escape, etc.
 
         # Periodic flush
@@ -62,67 +92,131 @@ class KeyboardTracker:
 
     def _flush(self, force=False):
         """Write buffer to file if non-empty."""
-        if self.text_buffer.strip():
-            with open(self.summary_file, "a") as f:
-                f.write(self.text_buffer + ("\n" if force else " "))
-            self.text_buffer = ""
+        text = "".join(self.text_buffer)
+        if text.strip():
+            self._write(self.summary_file, text + ("\n" if force else " "))
+        self.text_buffer.clear()
         self.last_flush = time.time()
 
-    def _log_event(self, key_str, ts):
-        event = {"timestamp": ts, "key": key_str}
+    def _flush_stale(self):
+        """PeriodicFlush callback: write buffered text and repeats once a flush interval has passed."""
+        with self._lock:
+            if time.time() - self.last_flush >= self.flush_interval:
+                self._flush_repeats()
+                self._flush()
+
+    def _log_event(self, key_str, ts, count=None) -> bool:
+        """
+        ``count`` marks a record standing for that many auto-repeats of ``key_str``.
+        Returns False if the write pipeline dropped the record.
+        """
+        event = {"timestamp": datetime.datetime.fromtimestamp(ts).isoformat(), "key": key_str}
+        if count is not None:
+            event["count"] = count
 
         # Raw JSON log
-        with open(self.log_file, "a") as f:
-            f.write(json.dumps(event) + "\n")
-
-        # Update summary
-        self._append_to_summary(key_str)
+        written = self._write(self.log_file, event)
 
         # Optional storage
         if self.storage:
-            self.storage.log_event("keyboard", event)
+            details = {"key": key_str}
+            if count is not None:
+                details["count"] = count
+            self.storage.log_event("key", details, ts)
+        return written
+
+    def _flush_repeats(self):
+        count = self._repeats.take()
+        if count and not self._log_event(self._repeat_key, self._repeats.last_ts, count):
+            self._repeats.drop(count)
+
+    def _write_metrics(self, record):
+        """One small record per minute of typing (TypingMetrics callback), if opted in."""
+        if not self.metrics_only:
+            return  # the full key log is kept instead; rhythm stays in get_typing_stats()
+        self._write(self.metrics_file, record)
+        if self.storage:
+            self.storage.log_event("typing", record)
+
+    def _write(self, path, record) -> bool:
+        """Append a record (via the pipeline when available); False if the pipeline dropped it."""
+        if self.pipeline:
+            return self.pipeline.submit(path, record)
+        append_jsonl(path, record)
+        return True
 
     def start(self):
         if not self.running:
             self.running = True
-            self.thread = threading.Thread(target=self._run, daemon=True)
-            self.thread.start()
+            self.source.subscribe((KEY, KEY_REPEAT), self._on_event)
+            if self._owns_source:
+                self.source.start()
+            self._flusher.start()
             print("[KeyboardTracker] Started.")
 
     def stop(self):
         self.running = False
-        CF.CFRunLoopStop(CF.CFRunLoopGetCurrent())  # stop loop
+        self.source.unsubscribe(self._on_event)
+        if self._owns_source:
+            self.source.stop()
+        self._flusher.stop()
+        with self._lock:
+            self._flush_repeats()
+            self._flush()
+            self.metrics.flush()
         print("[KeyboardTracker] Stopped.")
 
     def get_last_keys(self):
-        return list(self.last_keys)
-
-    def _run(self):
-        def callback(proxy, type_, event, refcon):
-            if type_ == kCGEventKeyDown:
-                key_code = CGEventGetIntegerValueField(event, kCGKeyboardEventKeycode)
-                ts = datetime.datetime.now().isoformat()
-                key_str = KEY_MAP.get(key_code, f"[{key_code}]")
-                self.last_keys.append(key_str)
-                self._log_event(key_str, ts)
-            return event
-
-        event_mask = (1 << kCGEventKeyDown) | (1 << kCGEventKeyUp)
-        tap = CGEventTapCreate(
-            kCGSessionEventTap,
-            kCGHeadInsertEventTap,
-            kCGEventTapOptionDefault,
-            event_mask,
-            callback,
-            None,
-        )
-
-        if not tap:
-            print("[KeyboardTracker] ERROR: Could not create event tap. "
-                  "Do you have accessibility permissions?")
+        return list(self._published_keys)
+
+    def get_overload_stats(self):
+        """Auto-repeats recorded and collapsed into counts, and text characters dropped."""
+        return {KEY_REPEAT: self._repeats.get_stats(), "text": {"dropped": self.dropped_text}}
+
+    def get_typing_stats(self):
+        """Typing-rhythm totals: keys, bursts and inter-key interval percentiles."""
+        return self.metrics.get_stats()
+
+    def _on_event(self, kind, key_code, ts):
+        """Event source callback for key-down events."""
+        with self._lock:
+            self._handle(kind, key_code, ts)
+
+    def _handle(self, kind, key_code, ts):
+        if kind == KEY_REPEAT:
+            self._on_repeat(key_code, ts)
             return
+        self._flush_repeats()
+        self.metrics.on_key(ts, self.active_app() if self.active_app else None)
+        if self.metrics_only:
+            if self.rollups:
+                self.rollups.add("keys", ts)
+            return
+        key_str = KEY_MAP.get(key_code, f"[{key_code}]")
+        self.last_keys.append(key_str)
+        self._published_keys = tuple(self.last_keys)
+        if self.rollups:
+            self.rollups.add("keys", ts)
+        self._log_event(key_str, ts)
+        self._append_to_summary(key_str)
 
-        run_loop_source = CF.CFMachPortCreateRunLoopSource(None, tap, 0)
-        CF.CFRunLoopAddSource(CF.CFRunLoopGetCurrent(), run_loop_source, CF.kCFRunLoopDefaultMode)
-        CGEventTapEnable(tap, True)
-        CF.CFRunLoopRun()
+    def _on_repeat(self, key_code, ts):
+        """
+        Auto-repeat of a held key: counted as a key, applied to the text, recorded as
+        the KEY_REPEAT policy allows, and left out of the typing rhythm.
+        """
+        if self.rollups:
+            self.rollups.add("keys", ts)
+        if self.metrics_only:
+            return
+        key_str = KEY_MAP.get(key_code, f"[{key_code}]")
+        if key_str != self._repeat_key:
+            self._flush_repeats()
+            self._repeat_key = key_str
+        repeats = self._repeats
+        count = repeats.roll(ts)
+        if count and not self._log_event(key_str, repeats.last_ts, count):
+            repeats.drop(count)
+        if repeats.admit(ts) and not self._log_event(key_str, ts):
+            repeats.drop()
+        self._append_to_summary(key_str)
@@ -0,0 +1,149 @@
+"""
+Mouse Kinematics — cursor path length, speed distribution and position heatmap.
+
+The event callback only stores (x, y, t_ns) into preallocated ``array``
+buffers; every ``capacity`` samples (or on flush) the batch is processed in
+one go — vectorized with NumPy when it is installed — into:
+
+- total path length (pixels)
+- a speed histogram with log-spaced buckets (fixed size, HDR-style), from
+  which percentiles are read
+- a fixed-grid screen heatmap of cursor samples
+
+Memory is bounded by ``capacity`` and the grid size, however long it runs.
+"""
+
+import math
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python batch processing
+    np = None
+
+SPEED_BUCKETS = 128
+BUCKETS_PER_OCTAVE = 4  # speed bucket b covers [2**(b/4), 2**((b+1)/4)) px/s
+
+
+class MouseKinematics:
+    def __init__(self, capacity=4096, grid=(32, 18), screen=(1920, 1080)):
+        """
+        :param capacity: samples buffered before a batch is processed
+        :param grid: heatmap (columns, rows)
+        :param screen: screen (width, height) in points covered by the heatmap;
+                       positions outside it are clamped to the edge cells
+        """
+        self.capacity = capacity
+        self.xs = array("d", bytes(8 * capacity))
+        self.ys = array("d", bytes(8 * capacity))
+        self.ts = array("q", bytes(8 * capacity))
+        self.n = 0
+
+        self.grid = grid
+        self.screen = screen
+        self.heatmap = array("q", bytes(8 * grid[0] * grid[1]))  # row-major counts
+        self.speeds = array("q", bytes(8 * SPEED_BUCKETS))
+        self.distance = 0.0
+        self.samples = 0
+        self._last = None  # (x, y, t_ns) carried over from the previous batch
+
+    def add(self, x, y, t_ns):
+        """Record one cursor sample; returns True once the buffer is full and needs ``process()``."""
+        n = self.n
+        self.xs[n] = x
+        self.ys[n] = y
+        self.ts[n] = t_ns
+        self.n = n + 1
+        return self.n == self.capacity
+
+    def process(self):
+        """Fold the buffered samples into distance, speed histogram and heatmap; returns the batch distance."""
+        n = self.n
+        if n == 0:
+            return 0.0
+        batch = self._process_numpy(n) if np is not None else self._process_python(n)
+        self._last = (self.xs[n - 1], self.ys[n - 1], self.ts[n - 1])
+        self.distance += batch
+        self.samples += n
+        self.n = 0
+        return batch
+
+    def _process_numpy(self, n):
+        xs = np.frombuffer(self.xs, dtype=np.float64, count=n)
+        ys = np.frombuffer(self.ys, dtype=np.float64, count=n)
+        ts = np.frombuffer(self.ts, dtype=np.int64, count=n)
+        if self._last is not None:
+            lx, ly, lt = self._last
+            xs0, ys0, ts0 = np.append(lx, xs), np.append(ly, ys), np.append(lt, ts)
+        else:
+            xs0, ys0, ts0 = xs, ys, ts
+
+        steps = np.hypot(np.diff(xs0), np.diff(ys0))
+        dt = np.diff(ts0) / 1e9
+        moving = (dt > 0) & (steps > 0)
+        if moving.any():
+            speed = steps[moving] / dt[moving]
+            buckets = np.clip((np.log2(np.maximum(speed, 1.0)) * BUCKETS_PER_OCTAVE).astype(np.int64),
+                              0, SPEED_BUCKETS - 1)
+            counts = np.frombuffer(self.speeds, dtype=np.int64)
+            counts += np.bincount(buckets, minlength=SPEED_BUCKETS)
+
+        cols, rows = self.grid
+        cx = np.clip((xs * cols / self.screen[0]).astype(np.int64), 0, cols - 1)
+        cy = np.clip((ys * rows / self.screen[1]).astype(np.int64), 0, rows - 1)
+        heat = np.frombuffer(self.heatmap, dtype=np.int64)
+        heat += np.bincount(cy * cols + cx, minlength=cols * rows)
+        return float(steps.sum())
+
+    def _process_python(self, n):
+        xs, ys, ts = self.xs, self.ys, self.ts
+        cols, rows = self.grid
+        sx, sy = cols / self.screen[0], rows / self.screen[1]
+        heat, speeds = self.heatmap, self.speeds
+        hypot, log2 = math.hypot, math.log2
+
+        total = 0.0
+        px, py, pt = self._last if self._last is not None else (xs[0], ys[0], ts[0])
+        for i in range(n):
+            x, y, t = xs[i], ys[i], ts[i]
+            step = hypot(x - px, y - py)
+            if step:
+                total += step
+                dt = t - pt
+                if dt > 0:
+                    speed = step * 1e9 / dt
+                    b = int(log2(speed) * BUCKETS_PER_OCTAVE) if speed > 1.0 else 0
+                    speeds[b if b < SPEED_BUCKETS else SPEED_BUCKETS - 1] += 1
+            cx = min(max(int(x * sx), 0), cols - 1)
+            cy = min(max(int(y * sy), 0), rows - 1)
+            heat[cy * cols + cx] += 1
+            px, py, pt = x, y, t
+        return total
+
+    # ---- Results ----------------------------------------------------------
+    def speed_percentile(self, pct):
+        """Approximate speed (px/s, bucket midpoint) below which ``pct``% of movements fall."""
+        total = sum(self.speeds)
+        if not total:
+            return 0.0
+        rank = total * pct / 100
+        seen = 0
+        for b, count in enumerate(self.speeds):
+            seen += count
+            if seen >= rank:
+                return 2 ** ((b + 0.5) / BUCKETS_PER_OCTAVE)
+        return 2 ** (SPEED_BUCKETS / BUCKETS_PER_OCTAVE)
+
+    def get_heatmap(self):
+        """Heatmap as a tuple of rows (top to bottom) of sample counts."""
+        cols, rows = self.grid
+        return tuple(tuple(self.heatmap[r * cols:(r + 1) * cols]) for r in range(rows))
+
+    def get_stats(self):
+        return {
+            "distance_px": round(self.distance, 1),
+            "samples": self.samples,
+            "speed_p50": round(self.speed_percentile(50), 1),
+            "speed_p90": round(self.speed_percentile(90), 1),
+            "speed_p99": round(self.speed_percentile(99), 1),
+        }
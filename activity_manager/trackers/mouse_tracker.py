@@ -1,137 +1,187 @@
 # activity_manager/trackers/mouse_tracker.py
 
 """
-Mouse Tracker — captures clicks, movement, and scrolls on macOS using Quartz.
-Logs are aggregated for mouse moves (to avoid spam), but clicks/scrolls are logged immediately.
+Mouse Tracker — captures clicks, movement, and scrolls from an event source
+(the macOS CGEvent tap by default).
+Logs are aggregated for mouse moves (to avoid spam); clicks and scrolls follow their
+overload policies (see overload.py): by default clicks are logged immediately and
+scrolls are coalesced into one count per second. Aggregates still buffered when the
+mouse goes still are written by a PeriodicFlush after at most two flush intervals.
+Cursor positions feed MouseKinematics (path length, speed percentiles, heatmap).
 
 Requires:
 - System Settings → Privacy & Security → Accessibility → allow your terminal/IDE
 """
 
-import threading
-import Quartz
 import datetime
-import json
 import os
+import threading
+import time
 
-# ✅ Explicitly import CF run-loop symbols
-from CoreFoundation import (
-    CFMachPortCreateRunLoopSource,
-    CFRunLoopGetCurrent,
-    CFRunLoopAddSource,
-    CFRunLoopRun,
-    kCFRunLoopCommonModes,
-)
+from activity_manager.storage.event_pipeline import PeriodicFlush, append_jsonl
+from activity_manager.trackers.event_source import CLICK, MOUSE_KINDS, MOVE, SCROLL, default_source
+from activity_manager.trackers.mouse_kinematics import MouseKinematics
+from activity_manager.trackers.overload import DEFAULT_POLICIES, Coalescer
 
+# event kind -> rollup metric
+ROLLUP_METRICS = {CLICK: "clicks", MOVE: "moves", SCROLL: "scrolls"}
 
-class MouseTracker:
-    """Background mouse listener using a CGEvent tap + CFRunLoop."""
 
-    def __init__(self, log_file="logs/mouse.log", flush_interval=5):
+class MouseTracker:
+    """Mouse listener fed by an EventSource (CGEvent tap + CFRunLoop on macOS)."""
+
+    def __init__(self, log_file="logs/mouse.log", flush_interval=5, pipeline=None, source=None,
+                 rollups=None, storage=None, kinematics=None, metrics=None, policies=None):
+        """
+        :param pipeline: optional EventPipeline; log writes are enqueued instead of done inline
+        :param source: EventSource delivering mouse events (defaults to the macOS event tap)
+        :param rollups: optional RollupEngine updated with click/move/scroll counts
+        :param storage: optional StorageManager receiving normalized events
+        :param kinematics: MouseKinematics fed with move positions (a default one if omitted)
+        :param metrics: optional MetricsRegistry timing kinematics batches (``mouse.kinematics_batch``)
+        :param policies: {kind: OverloadPolicy} for clicks and scrolls, overriding DEFAULT_POLICIES
+        """
         self.clicks = 0
         self.moves = 0
         self.scrolls = 0
 
         self._running = False
-        self._thread = None
+        self._owns_source = source is None
+        self.source = source if source is not None else default_source()
 
         # Logging
         self.log_file = log_file
         self.flush_interval = flush_interval
-        self._last_flush = datetime.datetime.now()
+        self.pipeline = pipeline
+        self.rollups = rollups
+        self.storage = storage
+        self.kinematics = kinematics if kinematics is not None else MouseKinematics()
+        self.metrics = metrics
+        self._last_flush = None  # event time of the last move flush
+        self._last_ts = None     # event time of the last event
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()  # event callbacks vs the periodic flush
+        self._flusher = PeriodicFlush(self._flush_stale, flush_interval)
+        policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self._coalescers = {kind: Coalescer(policies[kind]) for kind in (CLICK, SCROLL)}
+        self._last_pos = {}  # kind -> position of the last event counted
 
         os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
 
     # ---- Logging ----------------------------------------------------------
-    def _log(self, data: dict):
-        """Append a JSON record to the log file."""
-        with open(self.log_file, "a") as f:
-            f.write(json.dumps(data) + "\n")
-
-    def _flush_moves(self):
-        """Write aggregated move stats and reset counter."""
+    def _log(self, data: dict) -> bool:
+        """Append a JSON record to the log file (via the pipeline when available); False if dropped."""
+        if self.pipeline:
+            return self.pipeline.submit(self.log_file, data)
+        append_jsonl(self.log_file, data)
+        return True
+
+    def _process_kinematics(self, ts):
+        """Fold buffered positions into the kinematics and credit the path length to the rollups."""
+        if self.metrics:
+            t0 = time.perf_counter_ns()
+            distance = self.kinematics.process()
+            self.metrics.observe_ns("mouse.kinematics_batch", time.perf_counter_ns() - t0)
+        else:
+            distance = self.kinematics.process()
+        if self.rollups and distance:
+            self.rollups.add("distance", ts, distance)
+
+    def _flush_moves(self, ts=None):
+        """Write aggregated move stats and reset counter (and any coalesced clicks/scrolls)."""
+        self._flushed_at = time.monotonic()
+        self._process_kinematics(ts or time.time())
+        for kind, coalescer in self._coalescers.items():
+            count = coalescer.take()
+            if count:
+                self._record(kind, self._last_pos.get(kind), coalescer.last_ts, count)
         if self.moves > 0:
+            ts = ts or time.time()
             record = {
-                "ts": datetime.datetime.now().isoformat(),
+                "ts": datetime.datetime.fromtimestamp(ts).isoformat(),
                 "event": "mouse_moves",
                 "count": self.moves,
             }
             self._log(record)
+            if self.storage:
+                self.storage.log_event("mouse_moves", {"count": self.moves}, ts)
             self.moves = 0
 
-    # ---- CGEvent callback -------------------------------------------------
-    def _callback(self, proxy, event_type, event, refcon):
-        ts = datetime.datetime.now().isoformat()
-
-        if event_type in (Quartz.kCGEventLeftMouseDown,
-                          Quartz.kCGEventRightMouseDown,
-                          Quartz.kCGEventOtherMouseDown):
-            self.clicks += 1
-            self._log({"ts": ts, "event": "click"})
-        elif event_type in (Quartz.kCGEventMouseMoved,
-                            Quartz.kCGEventLeftMouseDragged,
-                            Quartz.kCGEventRightMouseDragged,
-                            Quartz.kCGEventOtherMouseDragged):
+    def _record(self, kind, pos, ts, count=None):
+        """Log and store a click/scroll; ``count`` marks a record standing for that many events."""
+        record = {"ts": datetime.datetime.fromtimestamp(ts).isoformat(), "event": kind}
+        if count is not None:
+            record["count"] = count
+        if not self._log(record):
+            self._coalescers[kind].drop(count or 1)
+        if self.storage:
+            x, y = pos if pos else (None, None)
+            details = {"x": x, "y": y}
+            if count is not None:
+                details["count"] = count
+            self.storage.log_event(kind, details, ts)
+
+    def _flush_stale(self):
+        """PeriodicFlush callback: flush aggregates nothing has flushed for a whole interval."""
+        with self._lock:
+            if self._last_ts is not None and time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush_moves(self._last_ts)  # stamped like an event-time flush would be
+                self._last_flush = self._last_ts
+
+    # ---- Event source callback -------------------------------------------
+    def _on_event(self, kind, pos, ts):
+        with self._lock:
+            self._handle(kind, pos, ts)
+
+    def _handle(self, kind, pos, ts):
+        self._last_ts = ts
+        if kind == MOVE:
             self.moves += 1
-        elif event_type == Quartz.kCGEventScrollWheel:
-            self.scrolls += 1
-            self._log({"ts": ts, "event": "scroll"})
-
-        # Periodically flush moves
-        now = datetime.datetime.now()
-        if (now - self._last_flush).total_seconds() >= self.flush_interval:
-            self._flush_moves()
-            self._last_flush = now
-
-        return event
-
-    # ---- Thread target: create tap and run loop ---------------------------
-    def _run(self):
-        event_mask = (
-            (1 << Quartz.kCGEventLeftMouseDown)
-            | (1 << Quartz.kCGEventRightMouseDown)
-            | (1 << Quartz.kCGEventOtherMouseDown)
-            | (1 << Quartz.kCGEventMouseMoved)
-            | (1 << Quartz.kCGEventLeftMouseDragged)
-            | (1 << Quartz.kCGEventRightMouseDragged)
-            | (1 << Quartz.kCGEventOtherMouseDragged)
-            | (1 << Quartz.kCGEventScrollWheel)
-        )
-
-        tap = Quartz.CGEventTapCreate(
-            Quartz.kCGSessionEventTap,
-            Quartz.kCGHeadInsertEventTap,
-            Quartz.kCGEventTapOptionDefault,
-            event_mask,
-            self._callback,
-            None,
-        )
-
-        if not tap:
-            print("[MouseTracker] ERROR: Failed to create event tap. "
-                  "Check Accessibility permissions.")
-            return
-
-        run_loop_source = CFMachPortCreateRunLoopSource(None, tap, 0)
-        loop = CFRunLoopGetCurrent()
-        CFRunLoopAddSource(loop, run_loop_source, kCFRunLoopCommonModes)
-
-        # Enable and run
-        Quartz.CGEventTapEnable(tap, True)
-        CFRunLoopRun()
+            if pos is not None and self.kinematics.add(pos[0], pos[1], int(ts * 1e9)):
+                self._process_kinematics(ts)
+        else:
+            if kind == CLICK:
+                self.clicks += 1
+            else:
+                self.scrolls += 1
+            coalescer = self._coalescers[kind]
+            count = coalescer.roll(ts)
+            if count:
+                self._record(kind, self._last_pos.get(kind), coalescer.last_ts, count)
+            if coalescer.admit(ts):
+                self._record(kind, pos, ts)
+            else:
+                self._last_pos[kind] = pos
+
+        if self.rollups:
+            self.rollups.add(ROLLUP_METRICS[kind], ts)
+
+        # Periodically flush moves (on event time, so replays aggregate like live capture)
+        if self._last_flush is None:
+            self._last_flush = ts
+        elif ts - self._last_flush >= self.flush_interval:
+            self._flush_moves(ts)
+            self._last_flush = ts
 
     # ---- Public API -------------------------------------------------------
     def start(self):
         if self._running:
             return
         self._running = True
-        self._thread = threading.Thread(target=self._run, daemon=True)
-        self._thread.start()
+        self.source.subscribe(MOUSE_KINDS, self._on_event)
+        if self._owns_source:
+            self.source.start()
+        self._flusher.start()
         print("[MouseTracker] Started.")
 
     def stop(self):
         self._running = False
-        self._flush_moves()  # flush any remaining moves
+        self.source.unsubscribe(self._on_event)
+        if self._owns_source:
+            self.source.stop()
+        self._flusher.stop()
+        with self._lock:
+            self._flush_moves()  # flush any remaining moves
         print("[MouseTracker] Stopped.")
 
     def get_stats(self):
@@ -140,3 +190,14 @@ class MouseTracker:
             "Moves": self.moves,
             "Scrolls": self.scrolls,
         }
+
+    def get_overload_stats(self):
+        """Clicks/scrolls recorded individually and coalesced into counts, by kind."""
+        return {kind: coalescer.get_stats() for kind, coalescer in self._coalescers.items()}
+
+    def get_kinematics(self):
+        """Path length and speed percentiles (as of the last processed batch)."""
+        return self.kinematics.get_stats()
+
+    def get_heatmap(self):
+        return self.kinematics.get_heatmap()
@@ -0,0 +1,104 @@
+"""
+Overload Policies — bounded callback cost when input arrives in storms.
+
+Fast mouse movement, drags, trackpad scrolling and key auto-repeat can deliver
+thousands of events per second to the tap callbacks, and every recorded event
+costs a timestamp, a log record and a storage event. Each event kind gets an
+``OverloadPolicy``:
+
+    "record"    every event is recorded individually
+    "coalesce"  events are counted and recorded as one record per ``interval``
+    "adaptive"  the first ``burst`` events of each ``interval`` are recorded
+                individually; the rest are counted into one record
+
+Counts kept in memory and in the rollups stay exact under every policy; only
+what is written is reduced. A coalesced record carries ``"count"``, the number
+of events it stands for. Events whose record the write pipeline refused (its
+bounded queue was full) are counted as ``dropped``. Mouse moves are always
+coalesced (see MouseTracker's ``flush_interval``).
+"""
+
+from activity_manager.trackers.event_source import CLICK, KEY_REPEAT, SCROLL
+
+RECORD = "record"
+COALESCE = "coalesce"
+ADAPTIVE = "adaptive"
+
+MODES = (RECORD, COALESCE, ADAPTIVE)
+
+
+class OverloadPolicy:
+    def __init__(self, mode=ADAPTIVE, interval=1.0, burst=20):
+        """
+        :param mode: "record", "coalesce" or "adaptive"
+        :param interval: length (in seconds of event time) of a coalescing window
+        :param burst: events per window recorded individually in "adaptive" mode
+        """
+        if mode not in MODES:
+            raise ValueError(f"Overload mode must be one of {MODES}, not {mode!r}")
+        self.mode = mode
+        self.interval = interval
+        self.burst = burst
+
+
+# Clicks are recorded unless they arrive faster than anyone clicks; a scroll gesture
+# or a held key yields tens of events per second, recorded as one count per second.
+DEFAULT_POLICIES = {
+    CLICK: OverloadPolicy(ADAPTIVE, interval=1.0, burst=20),
+    SCROLL: OverloadPolicy(COALESCE, interval=1.0),
+    KEY_REPEAT: OverloadPolicy(COALESCE, interval=1.0),
+}
+
+
+class Coalescer:
+    """
+    Applies one OverloadPolicy to the events of one kind (not thread-safe: one
+    per tracker callback, which the event source calls from a single thread).
+
+    Per event, call ``roll(ts)`` first and record a coalesced record for the
+    count it returns (if any, timed at ``last_ts``, the last event counted),
+    then ``admit(ts)`` to decide whether the event itself is recorded or counted.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self._window = None  # event time the current window started
+        self._admitted = 0   # events recorded individually in the current window
+        self.pending = 0     # events counted, not yet recorded
+        self.last_ts = None  # event time of the last event counted
+        self.recorded = 0    # totals, for stats
+        self.coalesced = 0
+        self.dropped = 0     # events whose record couldn't be written
+
+    def roll(self, ts) -> int:
+        """Start a new window if the current one has elapsed; returns the count to record (or 0)."""
+        if self._window is not None and ts - self._window < self.policy.interval:
+            return 0
+        self._window = ts
+        self._admitted = 0
+        return self.take()
+
+    def admit(self, ts) -> bool:
+        """True if this event should be recorded individually; otherwise it has been counted."""
+        policy = self.policy
+        if policy.mode == RECORD or (policy.mode == ADAPTIVE and self._admitted < policy.burst):
+            self._admitted += 1
+            self.recorded += 1
+            return True
+        self.pending += 1
+        self.coalesced += 1
+        self.last_ts = ts
+        return False
+
+    def take(self) -> int:
+        """Counted events not yet recorded (and forget them), e.g. when stopping."""
+        pending = self.pending
+        self.pending = 0
+        return pending
+
+    def drop(self, count=1):
+        """Count ``count`` events whose record was refused (e.g. the write pipeline was full)."""
+        self.dropped += count
+
+    def get_stats(self):
+        return {"recorded": self.recorded, "coalesced": self.coalesced, "dropped": self.dropped}
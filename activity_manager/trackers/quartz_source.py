@@ -0,0 +1,164 @@
+"""
+Quartz Event Source — real macOS capture via CGEvent taps and NSWorkspace.
+
+Requires:
+- System Settings → Privacy & Security → Accessibility → allow your terminal/IDE
+"""
+
+import threading
+import time
+
+import Quartz
+from AppKit import NSWorkspace
+from CoreFoundation import (
+    CFMachPortCreateRunLoopSource,
+    CFRunLoopAddSource,
+    CFRunLoopGetCurrent,
+    CFRunLoopRun,
+    CFRunLoopStop,
+    kCFRunLoopCommonModes,
+)
+
+from activity_manager.trackers.event_source import CLICK, KEY, KEY_REPEAT, MOVE, SCROLL, EventSource
+
+# CGEvent type -> normalized event kind
+EVENT_KINDS = {
+    Quartz.kCGEventKeyDown: KEY,
+    Quartz.kCGEventLeftMouseDown: CLICK,
+    Quartz.kCGEventRightMouseDown: CLICK,
+    Quartz.kCGEventOtherMouseDown: CLICK,
+    Quartz.kCGEventMouseMoved: MOVE,
+    Quartz.kCGEventLeftMouseDragged: MOVE,
+    Quartz.kCGEventRightMouseDragged: MOVE,
+    Quartz.kCGEventOtherMouseDragged: MOVE,
+    Quartz.kCGEventScrollWheel: SCROLL,
+}
+
+# Tap lifecycle notifications delivered through the callback instead of input events
+TAP_DISABLED = (Quartz.kCGEventTapDisabledByTimeout, Quartz.kCGEventTapDisabledByUserInput)
+
+
+class QuartzEventSource(EventSource):
+    """
+    One listen-only CGEvent tap with the combined mask of every subscribed kind,
+    on a single run-loop thread, dispatching to the trackers' handlers.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.running = False
+        self.thread = None
+        self.reenables = 0  # times the tap was switched back on after macOS disabled it
+        self._tap = None
+        self._loop = None
+        self._mask = 0
+        self._ready = threading.Event()
+
+    # ---- Lifecycle --------------------------------------------------------
+    def subscribe(self, kinds, handler):
+        super().subscribe(kinds, handler)
+        # A new kind widens the mask; the tap has to be recreated to see it
+        if self.running and self._event_mask() != self._mask:
+            self._stop_tap()
+            self._start_tap()
+
+    def unsubscribe(self, handler):
+        super().unsubscribe(handler)
+        # Narrow the mask so kinds nobody listens to anymore cost nothing
+        if self.running and self._event_mask() != self._mask:
+            self._stop_tap()
+            self._start_tap()
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._start_tap()
+
+    def stop(self):
+        self.running = False
+        self._stop_tap()
+
+    def _event_mask(self):
+        subscribed = self.subscribed_kinds()
+        mask = 0
+        if KEY_REPEAT in subscribed:
+            subscribed.add(KEY)  # repeats are key-down events with the autorepeat flag
+        for event_type, kind in EVENT_KINDS.items():
+            if kind in subscribed:
+                mask |= 1 << event_type
+        return mask
+
+    def _start_tap(self):
+        self._mask = self._event_mask()
+        if not self._mask:
+            return
+        self._ready.clear()
+        self.thread = threading.Thread(target=self._run_tap, args=(self._mask,), daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def _stop_tap(self):
+        if self._loop is not None:
+            CFRunLoopStop(self._loop)
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        self._loop = None
+        self._tap = None
+
+    # ---- Tap thread -------------------------------------------------------
+    def _callback(self, proxy, event_type, event, refcon):
+        kind = EVENT_KINDS.get(event_type)
+        if kind == KEY:
+            value = Quartz.CGEventGetIntegerValueField(event, Quartz.kCGKeyboardEventKeycode)
+            if Quartz.CGEventGetIntegerValueField(event, Quartz.kCGKeyboardEventAutorepeat):
+                self.emit(KEY_REPEAT, value, time.time())
+            else:
+                self.emit(KEY, value, time.time())
+        elif kind is not None:
+            location = Quartz.CGEventGetLocation(event)
+            self.emit(kind, (location.x, location.y), time.time())
+        elif event_type in TAP_DISABLED and self._tap is not None:
+            # macOS switches off taps whose callbacks run too long; turn it straight back on
+            Quartz.CGEventTapEnable(self._tap, True)
+            self.reenables += 1
+            print("[QuartzEventSource] Event tap was disabled; re-enabled.")
+        return event
+
+    def _run_tap(self, event_mask):
+        try:
+            tap = Quartz.CGEventTapCreate(
+                Quartz.kCGSessionEventTap,
+                Quartz.kCGTailAppendEventTap,
+                Quartz.kCGEventTapOptionListenOnly,
+                event_mask,
+                self._callback,
+                None,
+            )
+
+            if not tap:
+                print("[QuartzEventSource] ERROR: Could not create event tap. "
+                      "Do you have accessibility permissions?")
+                return
+
+            run_loop_source = CFMachPortCreateRunLoopSource(None, tap, 0)
+            loop = CFRunLoopGetCurrent()
+            CFRunLoopAddSource(loop, run_loop_source, kCFRunLoopCommonModes)
+            self._tap = tap
+            self._loop = loop
+        finally:
+            self._ready.set()
+
+        Quartz.CGEventTapEnable(tap, True)
+        CFRunLoopRun()
+
+    # ---- Polled queries ---------------------------------------------------
+    def idle_seconds(self) -> float:
+        return Quartz.CGEventSourceSecondsSinceLastEventType(
+            Quartz.kCGEventSourceStateCombinedSessionState,
+            Quartz.kCGAnyInputEventType
+        )
+
+    def frontmost_app(self):
+        active_app = NSWorkspace.sharedWorkspace().frontmostApplication()
+        return active_app.localizedName(), active_app.bundleIdentifier()
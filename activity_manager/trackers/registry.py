@@ -0,0 +1,39 @@
+"""
+Tracker Registry — trackers by name, imported only when first enabled.
+
+Each entry maps a tracker name to the module and class implementing it, so
+``TrackerManager`` can build just the trackers enabled in its config and a
+disabled tracker never has its module imported. Plugins add themselves with
+``register_tracker``; the class is constructed with the manager's shared
+``pipeline``, ``source``, ``rollups`` and ``storage`` keyword arguments and
+must provide ``start()`` and ``stop()``.
+"""
+
+import importlib
+
+TRACKERS = {
+    "keyboard": ("activity_manager.trackers.keyboard_tracker", "KeyboardTracker"),
+    "mouse": ("activity_manager.trackers.mouse_tracker", "MouseTracker"),
+    "app": ("activity_manager.trackers.app_tracker", "AppTracker"),
+    "idle": ("activity_manager.trackers.idle_tracker", "IdleTracker"),
+}
+
+DEFAULT_TRACKERS = ("keyboard", "mouse", "app", "idle")
+
+
+def register_tracker(name, module, class_name):
+    """Make ``module.class_name`` available as tracker ``name`` (imported on first use)."""
+    TRACKERS[name] = (module, class_name)
+
+
+def load_tracker(name):
+    """Import and return the tracker class registered as ``name``."""
+    try:
+        module, class_name = TRACKERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown tracker: {name!r} (available: {', '.join(TRACKERS)})") from None
+    return getattr(importlib.import_module(module), class_name)
+
+
+def available_trackers():
+    return tuple(TRACKERS)
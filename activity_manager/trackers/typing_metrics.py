@@ -0,0 +1,142 @@
+"""
+Typing Metrics — rhythm statistics that never store which keys were pressed.
+
+Per minute (of event time) it keeps, in fixed-size arrays:
+
+- key count (keys per minute)
+- inter-key interval histogram with log-spaced buckets (HDR-style)
+- bursts (runs of at least ``burst_min_keys`` keys with no gap over
+  ``pause_threshold``) and pauses (gaps over ``pause_threshold``)
+- keys per foreground app
+
+and emits one small record per minute, e.g.::
+
+    {"minute": "2025-01-01T10:04", "keys": 212, "bursts": 3, "burst_keys": 180,
+     "burst_seconds": 41.2, "pauses": 4, "pause_seconds": 17.9,
+     "intervals": [[20, 31], [21, 64], ...], "apps": {"Xcode": 212}}
+
+where ``intervals`` lists non-empty [bucket, count] pairs; bucket b covers
+inter-key gaps of [2**(b/4), 2**((b+1)/4)) milliseconds.
+"""
+
+import datetime
+import math
+from array import array
+
+INTERVAL_BUCKETS = 64  # up to 2**16 ms (~65 s); longer gaps land in the last bucket
+BUCKETS_PER_OCTAVE = 4
+
+
+def interval_bucket(ms):
+    if ms <= 1.0:
+        return 0
+    b = int(math.log2(ms) * BUCKETS_PER_OCTAVE)
+    return b if b < INTERVAL_BUCKETS else INTERVAL_BUCKETS - 1
+
+
+class TypingMetrics:
+    def __init__(self, emit, pause_threshold=2.0, burst_min_keys=5):
+        """
+        :param emit: callable receiving each finished per-minute record (dict)
+        :param pause_threshold: a gap longer than this (seconds) ends a burst and counts as a pause
+        :param burst_min_keys: keys a run needs to count as a burst
+        """
+        self.emit = emit
+        self.pause_threshold = pause_threshold
+        self.burst_min_keys = burst_min_keys
+
+        self.minute_hist = array("q", bytes(8 * INTERVAL_BUCKETS))  # reset every minute
+        self.total_hist = array("q", bytes(8 * INTERVAL_BUCKETS))   # since start
+        self.total_keys = 0
+        self.total_bursts = 0
+
+        self._minute = None  # current minute start (int seconds)
+        self._last_ts = None
+        self._run_start = None  # first key of the current run
+        self._run_keys = 0
+        self._reset_minute()
+
+    def _reset_minute(self):
+        for i in range(INTERVAL_BUCKETS):
+            self.minute_hist[i] = 0
+        self.keys = 0
+        self.bursts = 0
+        self.burst_keys = 0
+        self.burst_seconds = 0.0
+        self.pauses = 0
+        self.pause_seconds = 0.0
+        self.apps = {}
+
+    def on_key(self, ts, app=None):
+        """Account one key press at ``ts``; ``app`` is the foreground app name."""
+        minute = int(ts) - int(ts) % 60
+        if minute != self._minute:
+            self.flush()
+            self._minute = minute
+
+        last = self._last_ts
+        if last is not None:
+            gap = ts - last
+            b = interval_bucket(gap * 1000)
+            self.minute_hist[b] += 1
+            self.total_hist[b] += 1
+            if gap > self.pause_threshold:
+                self.pauses += 1
+                self.pause_seconds += gap
+                self._end_run()
+        if self._run_keys == 0:
+            self._run_start = ts
+        self._run_keys += 1
+        self._last_ts = ts
+
+        self.keys += 1
+        self.total_keys += 1
+        if app is not None:
+            self.apps[app] = self.apps.get(app, 0) + 1
+
+    def _end_run(self):
+        if self._run_keys >= self.burst_min_keys:
+            self.bursts += 1
+            self.total_bursts += 1
+            self.burst_keys += self._run_keys
+            self.burst_seconds += self._last_ts - self._run_start
+        self._run_keys = 0
+
+    def flush(self):
+        """Emit the current minute's record (if it saw any keys) and start a new one."""
+        if self._minute is None or not self.keys:
+            return
+        record = {
+            "minute": datetime.datetime.fromtimestamp(self._minute).isoformat(timespec="minutes"),
+            "keys": self.keys,
+            "bursts": self.bursts,
+            "burst_keys": self.burst_keys,
+            "burst_seconds": round(self.burst_seconds, 2),
+            "pauses": self.pauses,
+            "pause_seconds": round(self.pause_seconds, 2),
+            "intervals": [[b, c] for b, c in enumerate(self.minute_hist) if c],
+            "apps": self.apps,
+        }
+        self._reset_minute()
+        self.emit(record)
+
+    def interval_percentile(self, pct):
+        """Approximate inter-key interval (ms, bucket midpoint) at percentile ``pct`` since start."""
+        total = sum(self.total_hist)
+        if not total:
+            return 0.0
+        rank = total * pct / 100
+        seen = 0
+        for b, count in enumerate(self.total_hist):
+            seen += count
+            if seen >= rank:
+                return 2 ** ((b + 0.5) / BUCKETS_PER_OCTAVE)
+        return 2 ** (INTERVAL_BUCKETS / BUCKETS_PER_OCTAVE)
+
+    def get_stats(self):
+        return {
+            "keys": self.total_keys,
+            "bursts": self.total_bursts,
+            "interval_p50_ms": round(self.interval_percentile(50), 1),
+            "interval_p90_ms": round(self.interval_percentile(90), 1),
+        }
@@ -0,0 +1,74 @@
+"""
+Benchmark — JSON-lines logs vs binary segments: disk size and full-history scan time.
+
+Usage: python -m benchmarks.bench_binary [--events N]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from activity_manager.storage.binary_storage import BinaryLogReader, convert_logs
+from activity_manager.trackers.event_source import SyntheticEventSource
+from benchmarks.bench_trackers import run
+
+
+def dir_size(path, names):
+    return sum(os.path.getsize(os.path.join(path, n)) for n in names if os.path.exists(os.path.join(path, n)))
+
+
+def scan_jsonl(log_dir):
+    count = 0
+    for name in ("keyboard.log", "mouse.log", "apps.log", "idle.log"):
+        path = os.path.join(log_dir, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                json.loads(line)
+                count += 1
+    return count
+
+
+def scan_binary(path):
+    reader = BinaryLogReader(path)
+    count = sum(1 for _ in reader)
+    reader.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(SyntheticEventSource(count=args.events), tmp)
+        segment = os.path.join(tmp, "history.bin")
+
+        start = time.perf_counter()
+        converted = convert_logs(tmp, segment)
+        convert_time = time.perf_counter() - start
+
+        jsonl_size = dir_size(tmp, ("keyboard.log", "mouse.log", "apps.log", "idle.log"))
+        binary_size = dir_size(tmp, ("history.bin", "history.bin.strings", "history.bin.extras"))
+
+        start = time.perf_counter()
+        jsonl_count = scan_jsonl(tmp)
+        jsonl_scan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        binary_count = scan_binary(segment)
+        binary_scan = time.perf_counter() - start
+
+    print(f"records:       {converted:,} (converted in {convert_time:.2f}s)")
+    print(f"disk:          JSONL {jsonl_size:,} B  vs  binary {binary_size:,} B "
+          f"({jsonl_size / binary_size:.1f}x smaller)")
+    print(f"full scan:     JSONL {jsonl_count / jsonl_scan:,.0f} rec/s  vs  binary "
+          f"{binary_count / binary_scan:,.0f} rec/s ({jsonl_scan / binary_scan:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
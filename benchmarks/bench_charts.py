@@ -0,0 +1,91 @@
+"""
+Benchmark — chart requests against a frame budget.
+
+Fills a RollupEngine with N days of per-minute activity (keys, clicks, idle
+seconds, foreground time across 30 apps), builds the chart tiers, then times
+chart + layout for fixed windows from an hour to the whole history and for a
+random zoom/pan session over it. Every request should fit in one 60 Hz frame
+(16.7 ms), whatever the window.
+
+Usage: python -m benchmarks.bench_charts [--days 90] [--width 800]
+"""
+
+import argparse
+import random
+import time
+
+from activity_manager.charts import TieredSeries, layout
+from activity_manager.rollups import RollupEngine
+from benchmarks.bench_trackers import percentile
+
+FRAME_MS = 1000 / 60
+
+
+def fill(rollups, days, now, rng):
+    """One minute in two active, over ``days`` days before ``now``."""
+    t = int(now - days * 86400)
+    while t < now:
+        if rng.random() < 0.5:
+            rollups.add("keys", t, rng.randint(1, 200))
+            rollups.add("clicks", t, rng.randint(0, 20))
+            rollups.add_interval("idle_seconds", t, t + rng.random() * 40)
+            rollups.add_app_time(f"App{rng.randint(0, 29)}", t, t + 60)
+        t += 60
+    rollups.flush()  # prunes minute buckets past their retention, as the engine does
+
+
+def timed(series, lo, hi, width, now):
+    t0 = time.perf_counter_ns()
+    chart = series.chart(lo, hi, width, now=now)
+    layout(chart, width + 80, 560)
+    return chart, time.perf_counter_ns() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--width", type=int, default=800, help="chart width in pixels")
+    parser.add_argument("--steps", type=int, default=500, help="zoom/pan steps in the session")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    now = time.time()
+    rollups = RollupEngine(path=None)
+    fill(rollups, args.days, now, rng)
+    series = TieredSeries(rollups)
+    t0 = time.perf_counter()
+    series.refresh()
+    print(f"{args.days} days of rollups -> tiers in {(time.perf_counter() - t0) * 1000:.0f} ms: "
+          + ", ".join(f"{name} {len(tier.times):,}" for name, tier in series.tiers.items()))
+
+    print(f"{'window':<10}{'tier':>8}{'points':>8}{'ms':>8}")
+    for label, seconds in (("1 hour", 3600), ("1 day", 86400), ("2 days", 2 * 86400 - 600),
+                           ("1 week", 7 * 86400), ("30 days", 30 * 86400), ("90 days", args.days * 86400)):
+        chart, ns = min((timed(series, now - seconds, now, args.width, now) for _ in range(5)),
+                        key=lambda result: result[1])
+        print(f"{label:<10}{chart['tier']:>8}{len(chart['series']['keys_per_min'][0]):>8}{ns / 1e6:>8.2f}")
+
+    # A session: wheel zooms (x0.8 / x1.25 around a random pointer) and drags
+    span, end = 2 * 86400, now
+    latencies = []
+    for _ in range(args.steps):
+        if rng.random() < 0.5:
+            factor = rng.choice((0.8, 1.25))
+            fraction = rng.random()
+            pivot = end - span * (1 - fraction)
+            span = min(args.days * 86400, max(600, span * factor))
+            end = pivot + (1 - fraction) * span
+        else:
+            end += rng.uniform(-0.2, 0.2) * span
+        end = min(now, max(now - args.days * 86400 + span, end))
+        _, ns = timed(series, end - span, end, args.width, now)
+        latencies.append(ns)
+    latencies.sort()
+    over = sum(1 for ns in latencies if ns > FRAME_MS * 1e6)
+    print(f"zoom/pan session, {args.steps} steps: p50 {percentile(latencies, 50) / 1e6:.2f} ms, "
+          f"p99 {percentile(latencies, 99) / 1e6:.2f} ms, max {latencies[-1] / 1e6:.2f} ms, "
+          f"{over} over the {FRAME_MS:.1f} ms frame budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark — write and read throughput with encryption at rest on and off.
+
+Writes N events per backend in batches (as the write-behind pipeline does),
+once in plaintext and once encrypted, then reads them back with a range query.
+Chunked encryption seals one chunk per batch, so the overhead should stay in
+the low percent range for the file and binary backends.
+
+Usage: python -m benchmarks.bench_encryption [--events N] [--batch N]
+"""
+
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from activity_manager.storage.encryption import ChunkCipher
+from activity_manager.storage.storage_manager import StorageManager, read_events
+
+MODES = (("file", "activity.log"), ("sqlite", "activity.db"), ("binary", "activity.bin"))
+
+
+def run(mode, path, events, batch_size, key):
+    storage = StorageManager(mode=mode, path=path, cipher=ChunkCipher(key) if key else None)
+    start = time.time() - events
+    batch = []
+    t0 = time.perf_counter()
+    for i in range(events):
+        ts = datetime.datetime.fromtimestamp(start + i).isoformat()
+        batch.append((ts, "key", {"key": "a"}))
+        if len(batch) >= batch_size:
+            storage.backend.log_events(batch)
+            batch = []
+    storage.backend.log_events(batch)
+    storage.close()
+    write = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    count = sum(1 for _ in read_events(mode, path, start, start + events, key=key))
+    read = time.perf_counter() - t0
+    assert count == events, (mode, count)
+    return events / write, events / read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=256)
+    args = parser.parse_args()
+
+    key = os.urandom(32)
+    print(f"{'backend':>8}{'plain w/s':>13}{'enc w/s':>13}{'overhead':>10}{'plain r/s':>13}{'enc r/s':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, name in MODES:
+            plain_w, plain_r = run(mode, os.path.join(tmp, "plain-" + name), args.events, args.batch, None)
+            enc_w, enc_r = run(mode, os.path.join(tmp, "enc-" + name), args.events, args.batch, key)
+            overhead = (plain_w / enc_w - 1) * 100
+            print(f"{mode:>8}{plain_w:>13,.0f}{enc_w:>13,.0f}{overhead:>9.1f}%{plain_r:>13,.0f}{enc_r:>13,.0f}")
+
+
+if __name__ == "__main__":
+    main()
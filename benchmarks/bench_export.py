@@ -0,0 +1,73 @@
+"""
+Benchmark — streaming report export: peak memory vs history length, time vs workers.
+
+Writes N days of synthetic events through the file backend, then exports them
+with 1..cores worker processes. Peak RSS of the parent and of the workers
+should stay flat as --days grows; wall time should drop as workers are added.
+
+Usage: python -m benchmarks.bench_export [--days N] [--events-per-day N]
+"""
+
+import argparse
+import datetime
+import os
+import resource
+import tempfile
+import time
+
+from activity_manager.export import export_report
+from activity_manager.storage.storage_manager import StorageManager
+
+
+def write_history(path, days, per_day):
+    storage = StorageManager(mode="file", path=path)
+    start = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=days),
+                                      datetime.time())
+    step = 86400 / per_day
+    kinds = ("key", "key", "key", "key", "click", "scroll")
+    batch = []
+    for day in range(days):
+        base = start.timestamp() + day * 86400
+        for i in range(per_day):
+            ts = base + i * step
+            kind = kinds[i % len(kinds)]
+            details = {"key": "a"} if kind == "key" else {"x": 10, "y": 20}
+            batch.append((datetime.datetime.fromtimestamp(ts).isoformat(), kind, details))
+            if len(batch) >= 10000:
+                storage.backend.log_events(batch)
+                batch = []
+    storage.backend.log_events(batch)
+    storage.close()
+    return start.date(), start.date() + datetime.timedelta(days=days)
+
+
+def max_rss_mb(who):
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if os.uname().sysname == "Darwin" else rss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--events-per-day", type=int, default=50000)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity.log")
+        start, end = write_history(path, args.days, args.events_per_day)
+        size = os.path.getsize(path) / (1024 * 1024)
+        print(f"history:  {args.days} days, {args.days * args.events_per_day:,} events, {size:.1f} MB")
+        print(f"{'workers':>8}{'seconds':>10}{'days/s':>10}{'parent MB':>12}{'worker MB':>12}")
+        for workers in worker_counts:
+            t0 = time.perf_counter()
+            export_report("file", path, start, end, os.path.join(tmp, "report.csv"),
+                          pdf_path=os.path.join(tmp, "report.pdf"), workers=workers)
+            elapsed = time.perf_counter() - t0
+            print(f"{workers:>8}{elapsed:>10.2f}{args.days / elapsed:>10.1f}"
+                  f"{max_rss_mb(resource.RUSAGE_SELF):>12.1f}{max_rss_mb(resource.RUSAGE_CHILDREN):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
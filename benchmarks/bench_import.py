@@ -0,0 +1,61 @@
+"""
+Benchmark — bulk history import throughput vs worker processes.
+
+Writes N synthetic keyboard.log / mouse.log records (in the trackers' own
+formats), then imports them into a fresh SQLite database and rollups with
+1..cores parser processes. Rows/s should grow with the worker count until
+the single SQLite writer becomes the bottleneck.
+
+Usage: python -m benchmarks.bench_import [--records N]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+
+from activity_manager.importer import import_history
+
+
+def write_logs(log_dir, records):
+    start = time.time() - records * 0.05
+    keys = "asdfghjkl"
+    with open(os.path.join(log_dir, "keyboard.log"), "w") as kb, \
+            open(os.path.join(log_dir, "mouse.log"), "w") as mouse:
+        for i in range(records):
+            ts = datetime.datetime.fromtimestamp(start + i * 0.05).isoformat()
+            if i % 3:
+                kb.write(json.dumps({"timestamp": ts, "key": keys[i % len(keys)]}) + "\n")
+            elif i % 2:
+                mouse.write(json.dumps({"ts": ts, "event": "click"}) + "\n")
+            else:
+                mouse.write(json.dumps({"ts": ts, "event": "mouse_moves", "count": 40}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = os.path.join(tmp, "logs")
+        os.makedirs(log_dir)
+        write_logs(log_dir, args.records)
+        size = sum(os.path.getsize(os.path.join(log_dir, f)) for f in os.listdir(log_dir)) / (1024 * 1024)
+        print(f"history:  {args.records:,} records, {size:.1f} MB")
+        print(f"{'workers':>8}{'seconds':>10}{'rows/s':>12}{'MB/s':>8}")
+        for workers in worker_counts:
+            out = os.path.join(tmp, f"run{workers}")
+            t0 = time.perf_counter()
+            rows, _ = import_history(log_dir, os.path.join(out, "activity.db"), os.path.join(out, "rollups.db"),
+                                     workers=workers)
+            elapsed = time.perf_counter() - t0
+            print(f"{workers:>8}{elapsed:>10.2f}{rows / elapsed:>12,.0f}{size / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
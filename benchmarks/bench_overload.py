@@ -0,0 +1,106 @@
+"""
+Load test — callback latency and write volume under input storms.
+
+Emits a stream of keys, key auto-repeats, moves, clicks and scrolls at
+``--scale`` times normal rates (normal: 8 keys/s, 30 repeats/s of a held key,
+120 moves/s, 2 clicks/s, 60 scroll events/s) through KeyboardTracker and
+MouseTracker with their pipeline, storage and rollups, once with every event
+recorded and once with the default overload policies. Reports p50/p99/max
+callback latency per kind, records submitted per second of input, and the
+overload and pipeline drop counters.
+
+Usage: python -m benchmarks.bench_overload [--seconds 60] [--scale 10]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from activity_manager.rollups import RollupEngine
+from activity_manager.storage.event_pipeline import EventPipeline
+from activity_manager.storage.storage_manager import StorageManager
+from activity_manager.trackers.event_source import (
+    CLICK, KEY, KEY_REPEAT, MOVE, SCROLL, SyntheticEventSource,
+)
+from activity_manager.trackers.keyboard_tracker import KeyboardTracker
+from activity_manager.trackers.mouse_tracker import MouseTracker
+from activity_manager.trackers.overload import RECORD, OverloadPolicy
+from benchmarks.bench_trackers import percentile
+
+# events per second at normal load
+RATES = {KEY: 8, KEY_REPEAT: 30, MOVE: 120, CLICK: 2, SCROLL: 60}
+
+RECORD_ALL = {kind: OverloadPolicy(RECORD) for kind in (CLICK, SCROLL, KEY_REPEAT)}
+
+
+def storm(seconds, scale, start_ts):
+    """(kind, value, ts) tuples in time order, every kind at ``scale`` x its normal rate."""
+    events = []
+    for kind, rate in RATES.items():
+        step = 1.0 / (rate * scale)
+        value = 51 if kind == KEY_REPEAT else 0 if kind == KEY else None  # held key: [DEL]
+        for i in range(int(seconds * rate * scale)):
+            ts = start_ts + i * step
+            events.append((kind, value if value is not None else (i % 1920, i % 1080), ts))
+    events.sort(key=lambda e: e[2])
+    return events
+
+
+def run(tmp, events, policies):
+    path = lambda name: os.path.join(tmp, name)  # noqa: E731
+    pipeline = EventPipeline(max_queue=100_000)
+    storage = StorageManager(path=path("activity.log"), pipeline=pipeline)
+    rollups = RollupEngine(path=None)
+    pipeline.start()
+    source = SyntheticEventSource(count=0)
+    trackers = [
+        KeyboardTracker(storage=storage, log_file=path("keyboard.log"), summary_file=path("summary.log"),
+                        metrics_file=path("typing.log"), pipeline=pipeline, source=source,
+                        rollups=rollups, policies=policies),
+        MouseTracker(log_file=path("mouse.log"), pipeline=pipeline, source=source, rollups=rollups,
+                     storage=storage, policies=policies),
+    ]
+    for tracker in trackers:
+        tracker.start()
+
+    latencies = {}
+    perf = time.perf_counter_ns
+    for kind, value, ts in events:
+        t0 = perf()
+        source.emit(kind, value, ts)
+        latencies.setdefault(kind, []).append(perf() - t0)
+    for tracker in trackers:
+        tracker.stop()
+    pipeline.stop()
+    storage.close()
+
+    overload = {}
+    for tracker in trackers:
+        overload.update(tracker.get_overload_stats())
+    return latencies, pipeline.get_stats(), overload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60, help="seconds of input to simulate")
+    parser.add_argument("--scale", type=float, default=10, help="multiple of normal event rates")
+    args = parser.parse_args()
+
+    events = storm(args.seconds, args.scale, time.time() - args.seconds)
+    print(f"{len(events):,} events = {args.seconds:g} s of input at {args.scale:g}x normal rates")
+    for label, policies in (("record every event", RECORD_ALL), ("default policies", None)):
+        with tempfile.TemporaryDirectory() as tmp:
+            latencies, stats, overload = run(tmp, events, policies)
+        print(f"\n{label}: {stats['submitted'] / args.seconds:,.0f} records/s submitted, "
+              f"{stats['dropped']} dropped by the pipeline")
+        print(f"  {'kind':<12}{'count':>10}{'p50 (us)':>12}{'p99 (us)':>12}{'max (us)':>12}")
+        for kind, values in sorted(latencies.items()):
+            values.sort()
+            print(f"  {kind:<12}{len(values):>10,}{percentile(values, 50) / 1000:>12.2f}"
+                  f"{percentile(values, 99) / 1000:>12.2f}{values[-1] / 1000:>12.2f}")
+        print("  overload: " + ", ".join(f"{kind} {stats}" for kind, stats in overload.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark — sustained SQLite insert rate: legacy per-row commit vs batched WAL backend.
+
+Usage: python -m benchmarks.bench_sqlite [--events N]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from activity_manager.storage.sqlite_storage import SQLiteStorage
+
+
+def _events(n):
+    now = datetime.now().isoformat()
+    for i in range(n):
+        yield now, "keyboard", {"timestamp": now, "key": "abcdefgh"[i % 8]}
+
+
+def bench_per_row(path, n):
+    """The original path: one INSERT and one commit() per event, details stored as str(dict)."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE activity (id INTEGER PRIMARY KEY AUTOINCREMENT, time TEXT, type TEXT, details TEXT)")
+    conn.commit()
+    start = time.perf_counter()
+    for ts, event_type, details in _events(n):
+        conn.execute("INSERT INTO activity (time, type, details) VALUES (?, ?, ?)", (ts, event_type, str(details)))
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def bench_batched(path, n, batch_size):
+    storage = SQLiteStorage(path, batch_size=batch_size)
+    start = time.perf_counter()
+    batch = []
+    for event in _events(n):
+        batch.append(event)
+        if len(batch) >= batch_size:
+            storage.log_events(batch)
+            batch = []
+    storage.log_events(batch)
+    elapsed = time.perf_counter() - start
+    storage.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = bench_per_row(os.path.join(tmp, "legacy.db"), args.events)
+        batched = bench_batched(os.path.join(tmp, "batched.db"), args.events, args.batch_size)
+
+    print(f"events:           {args.events}")
+    print(f"per-row commit:   {args.events / legacy:>12,.0f} events/s")
+    print(f"batched (WAL):    {args.events / batched:>12,.0f} events/s")
+    print(f"speedup:          {legacy / batched:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark — import time and cold start to the first dashboard snapshot.
+
+Each measurement runs in a fresh interpreter (so nothing is already imported):
+
+- import:   ``import activity_manager.tracker_manager`` alone
+- startup:  import + TrackerManager(trackers=...) + the first published
+            snapshot (what the GUI paints first), for all trackers, one
+            tracker and none
+
+and lists which tracker modules ended up imported, to confirm disabled
+trackers are never loaded. A synthetic event source stands in for the macOS
+taps so it runs anywhere.
+
+Usage: python -m benchmarks.bench_startup [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+IMPORT_ONLY = """
+import sys, time
+t0 = time.perf_counter()
+import activity_manager.tracker_manager
+elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "modules": sorted(m for m in sys.modules if ".trackers." in m)}))
+"""
+
+STARTUP = """
+import sys, time
+t0 = time.perf_counter()
+from activity_manager.tracker_manager import TrackerManager
+from activity_manager.trackers.event_source import SyntheticEventSource
+manager = TrackerManager(source=SyntheticEventSource(count=0), trackers=TRACKERS, metrics_interval=3600)
+manager.snapshots.publish()
+elapsed = time.perf_counter() - t0
+modules = sorted(m for m in sys.modules if ".trackers." in m)
+manager.close()
+print(json.dumps({"seconds": elapsed, "modules": modules}))
+"""
+
+CASES = [
+    ("import", IMPORT_ONLY, None),
+    ("all trackers", STARTUP, ["keyboard", "mouse", "app", "idle"]),
+    ("keyboard only", STARTUP, ["keyboard"]),
+    ("no trackers", STARTUP, []),
+]
+
+
+def measure(code, trackers, cwd):
+    script = "import json\nTRACKERS = %r\n%s" % (trackers, code)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd()] + sys.path))
+    out = subprocess.run([sys.executable, "-c", script], cwd=cwd, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<16}{'median ms':>11}{'min ms':>9}  tracker modules imported")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, code, trackers in CASES:
+            results = [measure(code, trackers, tmp) for _ in range(args.runs)]
+            times = [r["seconds"] * 1000 for r in results]
+            modules = ", ".join(m.rsplit(".", 1)[-1] for m in results[-1]["modules"]) or "-"
+            print(f"{label:<16}{statistics.median(times):>11.1f}{min(times):>9.1f}  {modules}")
+
+
+if __name__ == "__main__":
+    main()
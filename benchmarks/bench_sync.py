@@ -0,0 +1,117 @@
+"""
+Benchmark — delta sync cost against history size.
+
+Builds N days of rollups (several metrics per minute of activity) and app
+sessions with idle periods in a temporary directory, starts a collector on
+localhost, then times the first, full sync, a sync after one more hour of
+activity, and a sync with nothing new. Bytes and time of the later syncs
+should track the new data, not the N days before it. Finally the collector is
+taken down for a few retries and brought back to check nothing is lost.
+
+Usage: python -m benchmarks.bench_sync [--days 30]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from activity_manager.collector import Collector, serve
+from activity_manager.rollups import RollupEngine
+from activity_manager.storage.storage_manager import StorageManager
+from activity_manager.sync import SyncClient, SyncError
+
+APPS = ("Xcode", "Safari", "Terminal", "Mail", "Slack", "Music")
+
+
+def add_activity(tmp, start, end, rng):
+    """Rollups and stored sessions for activity in [start, end)."""
+    rollups = RollupEngine(os.path.join(tmp, "rollups.db"))
+    storage = StorageManager(path=os.path.join(tmp, "activity.log"))
+    t = start
+    while t < end:
+        length = min(rng.uniform(30, 600), end - t)
+        app = rng.choice(APPS)
+        storage.log_event("app_session", {"app_name": app, "bundle_id": f"com.example.{app}",
+                                          "start": t, "end": t + length, "duration": length}, ts=t + length)
+        if rng.random() < 0.2:
+            storage.log_event("idle", {"start": t, "end": t + length / 2, "duration": length / 2}, ts=t + length)
+        rollups.add_app_time(app, t, t + length)
+        for minute in range(int(t), int(t + length), 60):
+            rollups.add("keys", minute, rng.randint(0, 200))
+            rollups.add("clicks", minute, rng.randint(0, 20))
+            rollups.add("moves", minute, rng.randint(0, 50))
+        t += length
+    rollups.flush()
+    rollups.close()
+    storage.close()
+
+
+def timed_sync(client):
+    before = dict(client.stats)
+    t0 = time.perf_counter()
+    batches = client.sync_once()
+    elapsed = time.perf_counter() - t0
+    return (batches, client.stats["rows"] - before["rows"], client.stats["bytes_sent"] - before["bytes_sent"],
+            client.stats["bytes_raw"] - before["bytes_raw"], elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        now = time.time()
+        t0 = time.perf_counter()
+        add_activity(tmp, now - args.days * 86400, now - 7200, rng)
+        print(f"built {args.days} days of history in {time.perf_counter() - t0:.1f} s: "
+              f"{sqlite3.connect(os.path.join(tmp, 'rollups.db')).execute('SELECT COUNT(*) FROM rollups').fetchone()[0]:,} "
+              f"rollup rows")
+
+        collector = Collector(os.path.join(tmp, "collector.db"))
+        server = serve(collector, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/sync"
+        client = SyncClient(url, rollups_path=os.path.join(tmp, "rollups.db"),
+                            storage_path=os.path.join(tmp, "activity.log"),
+                            state_path=os.path.join(tmp, "sync.json"), lag=0, backoff=0.05)
+
+        print(f"{'sync':<16}{'batches':>8}{'rows':>10}{'sent (B)':>12}{'raw (B)':>12}{'time (ms)':>11}")
+        for label, new_until in (("first (full)", None), ("+1 hour", now - 3600), ("nothing new", None)):
+            if new_until:
+                add_activity(tmp, new_until - 3600, new_until, rng)
+            batches, rows, sent, raw, elapsed = timed_sync(client)
+            print(f"{label:<16}{batches:>8}{rows:>10,}{sent:>12,}{raw:>12,}{elapsed * 1000:>11.1f}")
+
+        # Outage: the sync gives up after its retries and the next one delivers
+        server.shutdown()
+        server.server_close()
+        add_activity(tmp, now - 3600, now - 3000, rng)
+        try:
+            client.sync_once()
+        except SyncError as e:
+            print(f"collector down: {e} after {client.stats['retries']} retries")
+        server = serve(collector, port=server.server_address[1])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        batches, rows, sent, raw, elapsed = timed_sync(client)
+        print(f"collector back: {batches} batches, {rows:,} rows delivered")
+
+        # Minute buckets expire on the device after two days; the collector keeps them
+        query = "SELECT COUNT(*), SUM(value) FROM rollups WHERE resolution != 'minute'"
+        expected = sqlite3.connect(os.path.join(tmp, "rollups.db")).execute(query).fetchone()
+        merged = collector.conn.execute(query).fetchone()
+        print(f"collector hour/day rollups match the device's: {tuple(expected) == tuple(merged)} "
+              f"({merged[0]:,} rows)")
+        server.shutdown()
+        server.server_close()
+        client.close()
+        collector.close()
+
+
+if __name__ == "__main__":
+    main()
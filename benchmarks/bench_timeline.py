@@ -0,0 +1,60 @@
+"""
+Benchmark — activity timeline queries against history size.
+
+Builds a Timeline from N days of synthetic history (app sessions of 30 s to
+10 min, idle periods between some of them, input every second of activity),
+then times per-app activity queries over the last hour, day and week. Query
+time should grow with the sessions inside the window, not with the history.
+
+Usage: python -m benchmarks.bench_timeline [--days 90]
+"""
+
+import argparse
+import random
+import time
+
+from activity_manager.timeline import Timeline
+
+APPS = ("Xcode", "Safari", "Terminal", "Mail", "Slack", "Music")
+
+
+def history(days, end):
+    """Stored-shape events covering ``days`` days before ``end``."""
+    rng = random.Random(1)
+    t = end - days * 86400
+    while t < end:
+        length = rng.uniform(30, 600)
+        yield {"time": t + length, "type": "app_session",
+               "details": {"app_name": rng.choice(APPS), "start": t, "end": t + length}}
+        if rng.random() < 0.2:
+            idle = rng.uniform(60, min(600, length))
+            yield {"time": t + length, "type": "idle", "details": {"start": t + length - idle, "end": t + length}}
+        for second in range(int(t), int(t + length), 5):
+            yield {"time": second, "type": "key", "details": {"count": rng.randint(1, 20)}}
+        t += length
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    now = time.time()
+    timeline = Timeline()
+    t0 = time.perf_counter()
+    timeline.load(history(args.days, now))
+    print(f"loaded {args.days} days: {len(timeline.sessions):,} sessions, {len(timeline.idle):,} idle periods, "
+          f"{len(timeline.inputs.seconds):,} input seconds in {time.perf_counter() - t0:.2f} s")
+
+    print(f"{'window':<10}{'sessions':>10}{'query (ms)':>12}")
+    for label, seconds in (("hour", 3600), ("day", 86400), ("week", 7 * 86400)):
+        sessions = len(timeline.get_sessions(now - seconds, now))
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            timeline.get_app_activity(now - seconds, now)
+        print(f"{label:<10}{sessions:>10,}{(time.perf_counter() - t0) / args.repeat * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
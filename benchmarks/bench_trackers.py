@@ -0,0 +1,102 @@
+"""
+Benchmark — push events through the real tracker callbacks and storage pipeline.
+
+Drives KeyboardTracker, MouseTracker, AppTracker and IdleTracker from a
+synthetic (default) or replayed event source and reports throughput plus
+p50/p99 per-callback latency, per event kind. ``--metrics`` turns on the
+MetricsRegistry instrumentation, to measure its overhead.
+
+Usage:
+    python -m benchmarks.bench_trackers [--events N] [--metrics]
+    python -m benchmarks.bench_trackers --replay logs
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from activity_manager.metrics import MetricsRegistry
+from activity_manager.storage.event_pipeline import EventPipeline
+from activity_manager.trackers.app_tracker import AppTracker
+from activity_manager.trackers.event_source import ReplayEventSource, SyntheticEventSource
+from activity_manager.trackers.idle_tracker import IdleTracker
+from activity_manager.trackers.keyboard_tracker import KeyboardTracker
+from activity_manager.trackers.mouse_tracker import MouseTracker
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def build_trackers(source, log_dir, pipeline, metrics=None):
+    path = lambda name: os.path.join(log_dir, name)  # noqa: E731
+    return [
+        KeyboardTracker(log_file=path("keyboard.log"), summary_file=path("summary.log"),
+                        metrics_file=path("typing.log"), pipeline=pipeline, source=source),
+        MouseTracker(log_file=path("mouse.log"), pipeline=pipeline, source=source, metrics=metrics),
+        AppTracker(log_file=path("apps.log"), session_file=path("app_sessions.log"), pipeline=pipeline,
+                   source=source, metrics=metrics),
+        IdleTracker(log_file=path("idle.log"), pipeline=pipeline, source=source, metrics=metrics),
+    ]
+
+
+def run(source, log_dir, idle_poll_every=1000, metrics=None):
+    pipeline = EventPipeline(max_queue=1_000_000, metrics=metrics)
+    pipeline.start()
+    source.metrics = metrics
+    trackers = build_trackers(source, log_dir, pipeline, metrics)
+    for tracker in trackers:
+        if not isinstance(tracker, IdleTracker):  # idle is polled below, not threaded
+            tracker.start()
+    idle = trackers[-1]
+
+    latencies = {}
+    perf = time.perf_counter_ns
+    count = 0
+    wall_start = time.perf_counter()
+    for kind, value, ts in source.events():
+        t0 = perf()
+        source.emit(kind, value, ts)
+        latencies.setdefault(kind, []).append(perf() - t0)
+        count += 1
+        if count % idle_poll_every == 0:
+            t0 = perf()
+            idle.poll(ts)
+            latencies.setdefault("idle poll", []).append(perf() - t0)
+    elapsed = time.perf_counter() - wall_start
+
+    drain_start = time.perf_counter()
+    pipeline.stop()
+    drain = time.perf_counter() - drain_start
+    return count, elapsed, drain, latencies, pipeline.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200000, help="synthetic events to generate")
+    parser.add_argument("--replay", metavar="LOG_DIR", help="replay existing JSON-lines logs instead")
+    parser.add_argument("--metrics", action="store_true", help="enable the metrics registry")
+    args = parser.parse_args()
+
+    source = ReplayEventSource(args.replay) if args.replay else SyntheticEventSource(count=args.events)
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics = MetricsRegistry(path=os.path.join(tmp, "metrics.json")) if args.metrics else None
+        count, elapsed, drain, latencies, stats = run(source, tmp, metrics=metrics)
+
+    print(f"events:      {count:,}")
+    print(f"throughput:  {count / elapsed:,.0f} events/s through callbacks")
+    print(f"drain:       {drain * 1000:.1f} ms to flush the pipeline "
+          f"({stats['written']:,} records, {stats['batches']:,} batches, {stats['dropped']} dropped)")
+    print(f"{'kind':<12}{'count':>10}{'p50 (us)':>12}{'p99 (us)':>12}{'max (us)':>12}")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(f"{kind:<12}{len(values):>10,}{percentile(values, 50) / 1000:>12.2f}"
+              f"{percentile(values, 99) / 1000:>12.2f}{values[-1] / 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
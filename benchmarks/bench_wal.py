@@ -0,0 +1,90 @@
+"""
+Benchmark — submit latency and durability of the write-ahead ring.
+
+Submits N records (storage events plus keyboard log lines) through the
+EventPipeline with the in-memory queue and with the ring under each fsync
+policy, reporting submit p50/p99 latency, throughput, drain time and msyncs.
+Then kills a child process mid-stream (``os._exit``, no cleanup, so nothing
+was drained) and reopens its ring to check every appended record is recovered.
+
+Usage: python -m benchmarks.bench_wal [--events N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from activity_manager.storage.event_pipeline import EventPipeline
+from activity_manager.storage.storage_manager import StorageManager
+from activity_manager.storage.wal_ring import FSYNC_POLICIES, WriteAheadRing
+from benchmarks.bench_trackers import percentile
+
+
+def run(tmp, events, fsync):
+    wal = WriteAheadRing(os.path.join(tmp, f"{fsync}.wal"), fsync=fsync) if fsync else None
+    pipeline = EventPipeline(max_queue=events * 2, wal=wal)
+    storage = StorageManager(path=os.path.join(tmp, f"{fsync}-activity.log"), pipeline=pipeline)
+    pipeline.start()
+    keyboard_log = os.path.join(tmp, f"{fsync}-keyboard.log")
+
+    latencies = []
+    perf = time.perf_counter_ns
+    now = time.time()
+    wall_start = time.perf_counter()
+    for i in range(events):
+        t0 = perf()
+        if i % 2:
+            storage.log_event("key", {"key": "a"}, now)
+        else:
+            pipeline.submit(keyboard_log, {"time": now, "event": "key", "key": "a"})
+        latencies.append(perf() - t0)
+    elapsed = time.perf_counter() - wall_start
+
+    drain_start = time.perf_counter()
+    pipeline.stop()
+    drain = time.perf_counter() - drain_start
+    storage.close()
+    latencies.sort()
+    stats = pipeline.get_stats()
+    assert stats["written"] == events, stats
+    return latencies, elapsed, drain, wal.syncs if wal else 0
+
+
+def crash(tmp, events):
+    """Append ``events`` records in a child that dies without draining; returns how many recover."""
+    path = os.path.join(tmp, "crash.wal")
+    pid = os.fork()
+    if pid == 0:
+        wal = WriteAheadRing(path, fsync="never")
+        for i in range(events):
+            wal.append(b"F/dev/null\0" + str(i).encode() + b"\n")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    wal = WriteAheadRing(path)
+    recovered = wal.recovered
+    payloads, _ = wal.read()
+    assert payloads[-1].endswith(f"{events - 1}\n".encode()), payloads[-1]
+    wal.close()
+    return recovered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'mode':<16}{'events/s':>12}{'p50 (us)':>10}{'p99 (us)':>10}{'drain (ms)':>12}{'msyncs':>8}")
+        for fsync in (None,) + FSYNC_POLICIES:
+            latencies, elapsed, drain, syncs = run(tmp, args.events, fsync)
+            print(f"{'queue' if fsync is None else 'ring/' + fsync:<16}{args.events / elapsed:>12,.0f}"
+                  f"{percentile(latencies, 50) / 1000:>10.2f}{percentile(latencies, 99) / 1000:>10.2f}"
+                  f"{drain * 1000:>12.1f}{syncs:>8}")
+
+        recovered = crash(tmp, args.events)
+        print(f"crash:  {recovered:,} of {args.events:,} records recovered after os._exit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+Headless capture daemon for Activity Manager.
+
+Runs the trackers without a GUI and serves their state over a Unix domain
+socket; ``main.py`` attaches to it (starting it if needed).
+"""
+
+from activity_manager.daemon import main
+
+
+if __name__ == "__main__":
+    main()
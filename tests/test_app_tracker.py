@@ -0,0 +1,55 @@
+"""App sessions run from one activation to the next, and the open one is closed on stop."""
+
+import json
+import time
+
+from activity_manager.rollups import RollupEngine
+from activity_manager.trackers.app_tracker import AppTracker
+from activity_manager.trackers.event_source import APP, EventSource
+
+T0 = time.time() - 600
+
+
+class AppSource(EventSource):
+    pushes_app_events = True
+
+
+class Storage:
+    def __init__(self):
+        self.events = []
+
+    def log_event(self, event_type, details, ts):
+        self.events.append((event_type, details, ts))
+
+
+def test_switches_close_sessions(tmp_path):
+    source, storage, rollups = AppSource(), Storage(), RollupEngine(path=None)
+    tracker = AppTracker(storage=storage, log_file=str(tmp_path / "apps.log"), source=source,
+                         session_file=str(tmp_path / "app_sessions.log"), rollups=rollups)
+    tracker.start()
+    assert tracker.get_current_session() is None
+
+    source.emit(APP, ("Xcode", "com.apple.dt.Xcode"), T0)
+    source.emit(APP, ("Xcode", "com.apple.dt.Xcode"), T0 + 5)  # still frontmost: no new session
+    source.emit(APP, ("Mail", "com.apple.mail"), T0 + 90)
+    name, bundle_id, since, _ = tracker.get_current_session()
+    assert (name, bundle_id, since) == ("Mail", "com.apple.mail", T0 + 90)
+    assert tracker.get_recent_apps() == ["Mail (com.apple.mail)", "Xcode (com.apple.dt.Xcode)"]
+    tracker.stop()
+
+    assert [(t, d.get("app_name"), ts) for t, d, ts in storage.events] == [
+        ("app_switch", "Xcode", T0),
+        ("app_session", "Xcode", T0 + 90),  # closed, and timed, by the switch
+        ("app_switch", "Mail", T0 + 90),
+        ("app_session", "Mail", storage.events[-1][2]),
+    ]
+    assert storage.events[1][1]["duration"] == 90.0
+    assert T0 + 600 <= storage.events[-1][2] <= time.time()  # closed by stop()
+    assert tracker.get_current_session() is None
+
+    with open(tmp_path / "app_sessions.log") as f:
+        sessions = [json.loads(line) for line in f]
+    assert (sessions[0]["app_name"], sessions[0]["duration"]) == ("Xcode", 90.0)
+    credited = sum(b.get("app:Xcode", 0) for _, b in rollups.query("minute", 0, time.time()))
+    assert round(credited, 6) == 90
+    assert source.subscribed_kinds() == set()
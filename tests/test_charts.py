@@ -0,0 +1,62 @@
+"""LTTB picks the same points as the reference algorithm, and charts come back at most a point per pixel."""
+
+import random
+import time
+
+from activity_manager.charts import TieredSeries, lttb
+from activity_manager.rollups import RollupEngine
+
+NOW = int(time.time())
+HOUR_START = NOW - NOW % 3600 - 3 * 3600
+
+
+def reference_lttb(xs, ys, threshold):
+    """Steinarsson's LTTB, written the plain way: every bucket average summed afresh."""
+    n = len(xs)
+    every = (n - 2) / (threshold - 2)
+    picked, a = [0], 0
+    for i in range(threshold - 2):
+        lo, hi = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[lo:hi]) / (hi - lo)
+        avg_y = sum(ys[lo:hi]) / (hi - lo)
+        areas = [abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+                 for j in range(int(i * every) + 1, lo)]
+        a = int(i * every) + 1 + areas.index(max(areas))
+        picked.append(a)
+    picked.append(n - 1)
+    return [xs[i] for i in picked], [ys[i] for i in picked]
+
+
+def test_lttb_matches_the_reference():
+    rng = random.Random(7)
+    for n, threshold in ((10, 3), (100, 7), (1000, 97), (1441, 800)):
+        xs = list(range(0, 60 * n, 60))
+        ys = [rng.randrange(200) for _ in range(n)]
+        assert lttb(xs, ys, threshold) == reference_lttb(xs, ys, threshold)
+
+
+def test_lttb_keeps_ends_and_spikes():
+    xs = list(range(500))
+    ys = [0] * 500
+    ys[123] = 900
+    ys[321] = -50
+    out_x, out_y = lttb(xs, ys, 20)
+    assert len(out_x) == 20 and (out_x[0], out_x[-1]) == (0, 499)
+    assert 123 in out_x and 321 in out_x and max(out_y) == 900
+    assert lttb(xs[:10], ys[:10], 10) == (xs[:10], ys[:10])  # nothing to reduce
+    assert lttb(xs, ys, 2) == (xs, ys)
+
+
+def test_chart_is_downsampled_to_its_width():
+    rollups = RollupEngine(path=None)
+    for minute in range(180):
+        rollups.add("keys", HOUR_START + minute * 60, 30)
+    rollups.add("keys", HOUR_START + 100 * 60, 3000)  # a burst LTTB must keep
+    charts = TieredSeries(rollups)
+
+    chart = charts.chart(HOUR_START, HOUR_START + 3 * 3600, width=30, now=NOW)
+    assert chart["tier"] == "5min"  # 180 minute buckets would be 6 a pixel
+    times, values = chart["series"]["keys_per_min"]
+    assert len(times) == len(values) == 30
+    assert times == sorted(times) and times[0] == HOUR_START
+    assert max(values) == (3000 + 5 * 30) * 60 / 300
@@ -0,0 +1,100 @@
+"""Clients get replies and updates over the daemon socket, also while a slow call runs."""
+
+import threading
+import time
+
+import pytest
+
+from activity_manager.daemon import CaptureDaemon
+from activity_manager.ipc import DaemonClient
+from activity_manager.metrics import MetricsRegistry
+from activity_manager.snapshot import EMPTY_SNAPSHOT
+from activity_manager.trackers.event_source import EVENT_COUNTERS, KEY
+
+
+class Manager:
+    """The part of TrackerManager the daemon serves; get_chart blocks until released."""
+
+    def __init__(self):
+        self.metrics = MetricsRegistry(path=None)
+        self.snapshot = EMPTY_SNAPSHOT
+        self.release = threading.Event()
+
+    def get_snapshot(self):
+        return self.snapshot
+
+    def get_rollups(self, hours=None, days=None):
+        return {"keys": self.metrics.counters.get(EVENT_COUNTERS[KEY], 0)}
+
+    def get_metrics(self):
+        return {"counters": dict(self.metrics.counters)}
+
+    def get_stats(self):
+        raise ValueError("no stats")
+
+    def get_chart(self, start, end, width=800):
+        self.release.wait(5)
+        return {"start": start, "end": end, "width": width}
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    manager = Manager()
+    daemon = CaptureDaemon(manager, socket_path=str(tmp_path / "d.sock"), tick=0.01, rollup_interval=0)
+    server = threading.Thread(target=daemon.serve_forever, daemon=True)
+    server.start()
+    while not daemon.running:
+        time.sleep(0.01)
+    yield daemon
+    manager.release.set()
+    daemon.stop()
+    server.join(5)
+
+
+def connect(daemon):
+    return DaemonClient(daemon.socket_path).connect()
+
+
+def wait_for(client, condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        client.poll()
+        time.sleep(0.01)
+
+
+def test_calls_and_updates_round_trip(daemon):
+    client = connect(daemon)
+    client.subscribe()
+    assert client.call("get_metrics") == {"counters": {}}
+    with pytest.raises(RuntimeError, match="ValueError: no stats"):
+        client.call("get_stats")
+    with pytest.raises(RuntimeError, match="unknown method 'close'"):
+        client.call("close")
+
+    daemon.manager.metrics.count(EVENT_COUNTERS[KEY], 3)
+    daemon.manager.snapshot = EMPTY_SNAPSHOT._replace(version=7, active_app="Xcode", recent_apps=(("Xcode", 5),))
+    wait_for(client, lambda: client.snapshot.version == 7 and client.events.get(KEY) == 3)
+    assert client.snapshot.active_app == "Xcode" and client.snapshot.recent_apps == (("Xcode", 5),)
+    assert client.rollups == {"keys": 3}
+    client.close()
+
+
+def test_slow_call_does_not_hold_up_other_clients(daemon):
+    slow, other = connect(daemon), connect(daemon)
+    other.subscribe()
+    results = []
+    caller = threading.Thread(target=lambda: results.append(slow.call("get_chart", 0, 60, 100)))
+    caller.start()
+    time.sleep(0.05)  # get_chart is now blocked on the worker thread
+
+    assert "counters" in other.call("get_metrics", timeout=1)
+    daemon.manager.snapshot = EMPTY_SNAPSHOT._replace(version=1, active_app="Mail")
+    wait_for(other, lambda: other.snapshot.active_app == "Mail")
+    assert not results
+
+    daemon.manager.release.set()
+    caller.join(5)
+    assert results == [{"start": 0, "end": 60, "width": 100}]
+    slow.close()
+    other.close()
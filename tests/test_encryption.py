@@ -0,0 +1,123 @@
+"""Encrypted storage reads back what was written and rejects tampered or foreign files."""
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from cryptography.exceptions import InvalidTag  # noqa: E402
+
+from activity_manager.storage.encryption import (  # noqa: E402
+    HEADER_SIZE,
+    ChunkCipher,
+    DecryptingReader,
+    EncryptedFile,
+    read_all,
+)
+from activity_manager.storage.file_storage import FileStorage  # noqa: E402
+
+KEY = bytes(range(32))
+
+
+def write_chunks(path, chunks):
+    f = EncryptedFile(path, ChunkCipher(KEY))
+    offsets = [f.write(chunk) for chunk in chunks]
+    f.close()
+    return offsets
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "keyboard.log")
+    offsets = write_chunks(path, ["a\nb", "c\n", b"d\n"])
+    assert offsets[0] == HEADER_SIZE
+    assert read_all(path, ChunkCipher(KEY)) == b"a\nbc\nd\n"
+    with open(path, "rb") as f:
+        assert b"a\nb" not in f.read()
+
+    with DecryptingReader(path, ChunkCipher(KEY), text=True) as reader:
+        assert list(reader) == ["a\n", "bc\n", "d\n"]
+    with DecryptingReader(path, ChunkCipher(KEY)) as reader:
+        reader.seek(offsets[2])
+        assert list(reader) == [b"d\n"]
+
+
+def test_storage_round_trip(tmp_path):
+    path = str(tmp_path / "activity.log")
+    storage = FileStorage(path, cipher=ChunkCipher(KEY))
+    storage.log_events([("2026-03-02T09:00:00", "key", {"key": "a"}),
+                        ("2026-03-02T09:01:00", "click", {"x": 1.0, "y": 2.0})])
+    storage.log_events([("2026-03-02T09:02:00", "key", {"key": "b"})])
+    storage.close()
+
+    with open(path, "rb") as f:
+        assert b'"key"' not in f.read()
+    events = list(FileStorage(path, cipher=ChunkCipher(KEY)).query("2026-03-02T09:01", "2026-03-02T10:00"))
+    assert [(e["time"], e["details"]) for e in events] == [
+        ("2026-03-02T09:01:00", {"x": 1.0, "y": 2.0}), ("2026-03-02T09:02:00", {"key": "b"})]
+
+
+def test_tampered_chunk_is_rejected(tmp_path):
+    path = str(tmp_path / "keyboard.log")
+    write_chunks(path, ["a\n", "b\n"])
+    with open(path, "r+b") as f:
+        f.seek(-1, 2)  # last byte of the last chunk's tag
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 1]))
+    with pytest.raises(InvalidTag):
+        read_all(path, ChunkCipher(KEY))
+
+
+def test_moved_chunk_is_rejected(tmp_path):
+    # A chunk is bound to its offset: the same bytes spliced elsewhere don't decrypt
+    path = str(tmp_path / "keyboard.log")
+    offsets = write_chunks(path, ["a\n", "b\n"])
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:HEADER_SIZE] + data[offsets[1]:] + data[offsets[0]:offsets[1]])
+    with pytest.raises(InvalidTag):
+        read_all(path, ChunkCipher(KEY))
+
+
+def test_wrong_key_and_torn_tail(tmp_path):
+    path = str(tmp_path / "keyboard.log")
+    write_chunks(path, ["a\n", "b\n"])
+    with pytest.raises(ValueError, match="different key"):
+        read_all(path, ChunkCipher(bytes(32)))
+
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 5)  # crash mid-write of the last chunk
+    assert read_all(path, ChunkCipher(KEY)) == b"a\n"
+
+
+def test_sqlite_batches_are_sealed_as_chunks(tmp_path):
+    import sqlite3
+
+    from activity_manager.storage.sqlite_storage import SQLiteStorage, query_db
+
+    path = str(tmp_path / "activity.db")
+    storage = SQLiteStorage(path, cipher=ChunkCipher(KEY))
+    storage.log_events([("2026-03-02T09:00:00", "key", {"key": "a"}),
+                        ("2026-03-02T09:03:00", "click", {"x": 1.0, "y": 2.0})])
+    storage.log_events([("2026-03-02T09:02:00", "key", {"key": "b"}),
+                        ("2026-03-02T09:01:00", "key", {"key": "c"})])
+    assert storage.fetch("key", "2026-03-02T09:01", "2026-03-02T10:00") == [
+        ("2026-03-02T09:01:00", {"key": "c"}), ("2026-03-02T09:02:00", {"key": "b"})]
+    storage.close()
+
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM activity").fetchone() == (0,)
+        chunks = db.execute("SELECT start, end, data FROM activity_chunks ORDER BY id").fetchall()
+    assert [chunk[:2] for chunk in chunks] == [("2026-03-02T09:00:00", "2026-03-02T09:03:00"),
+                                               ("2026-03-02T09:01:00", "2026-03-02T09:02:00")]
+    assert all(b'"key"' not in data for _, _, data in chunks)
+    events = query_db(path, "2026-03-02T09:00:30", "2026-03-02T10:00", cipher=ChunkCipher(KEY))
+    assert [e["time"][-5:-3] for e in events] == ["01", "02", "03"]  # merged across overlapping chunks
+
+    # A chunk is bound to its time range
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE activity_chunks SET end = '2026-03-02T09:04:00' WHERE id = 1")
+    with pytest.raises(InvalidTag):
+        list(query_db(path, "2026-03-02T09:00", "2026-03-02T10:00", cipher=ChunkCipher(KEY)))
+    with pytest.raises(ValueError, match="ChunkCipher"):
+        list(query_db(path, "2026-03-02T09:00", "2026-03-02T10:00"))
@@ -0,0 +1,57 @@
+"""Daily export rows are the same whichever backend stored the events."""
+
+import csv
+import datetime
+
+import pytest
+
+from activity_manager.export import export_report
+from activity_manager.storage.storage_manager import StorageManager
+
+DAY = datetime.date(2026, 3, 2)
+T0 = datetime.datetime(2026, 3, 2, 9, 0).timestamp()
+
+
+def iso(ts):
+    return datetime.datetime.fromtimestamp(ts).isoformat()
+
+
+def session(storage, app, start, end):
+    storage.log_event("app_session", {"app_name": app, "bundle_id": f"com.example.{app}", "start": iso(start),
+                                      "end": iso(end), "duration": round(end - start, 3)}, end)
+
+
+def fill(storage):
+    storage.log_event("app_switch", {"app_name": "Mail", "bundle_id": "com.example.Mail"}, T0)
+    for i in range(20):
+        storage.log_event("key", {"key": "a"}, T0 + i)
+    storage.log_event("key", {"key": "Key.space", "count": 30}, T0 + 30)  # collapsed auto-repeats
+    storage.log_event("click", {"x": 10.0, "y": 20.0}, T0 + 40)
+    storage.log_event("click", {"x": 10.0, "y": 20.0, "count": 7}, T0 + 41)  # coalesced burst
+    storage.log_event("scroll", {"x": 10.0, "y": 20.0, "count": 12}, T0 + 42)
+    storage.log_event("mouse_moves", {"count": 500}, T0 + 60)
+    storage.log_event("idle", {"start": iso(T0 + 100), "end": iso(T0 + 400), "duration": 300.0}, T0 + 400)
+    session(storage, "Mail", T0, T0 + 600)
+    session(storage, "Xcode", T0 + 600, T0 + 4200)
+    session(storage, "Mail", T0 + 4200, T0 + 4500.5)
+
+
+EXPECTED = {
+    "date": "2026-03-02", "keys": "50", "clicks": "8", "scrolls": "12", "mouse_moves": "500",
+    "idle_seconds": "300.0", "app_switches": "1", "first_activity": "09:00:00", "last_activity": "10:15:00",
+    "top_apps": "Xcode=3600s; Mail=900s",
+}
+
+
+@pytest.mark.parametrize("mode, name", [("file", "activity.log"), ("sqlite", "activity.db"),
+                                        ("binary", "activity.bin")])
+def test_export_day(tmp_path, mode, name):
+    path = str(tmp_path / name)
+    storage = StorageManager(mode=mode, path=path)
+    fill(storage)
+    storage.close()
+
+    csv_path = tmp_path / "report.csv"
+    assert export_report(mode, path, DAY, DAY + datetime.timedelta(days=1), str(csv_path), workers=1) == 1
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        assert list(csv.DictReader(f)) == [EXPECTED]
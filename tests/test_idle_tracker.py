@@ -0,0 +1,62 @@
+"""Idle intervals run from the last input before the threshold to the last input before resuming."""
+
+import time
+
+from activity_manager.rollups import RollupEngine
+from activity_manager.trackers.idle_tracker import IdleTracker
+
+T0 = time.time() - 3600
+
+
+class IdleSource:
+    def __init__(self):
+        self.idle = 0.0
+
+    def idle_seconds(self):
+        return self.idle
+
+
+class Storage:
+    def __init__(self):
+        self.events = []
+
+    def log_event(self, event_type, details, ts):
+        self.events.append((event_type, details, ts))
+
+
+def tracker(tmp_path, **kwargs):
+    source, storage, rollups = IdleSource(), Storage(), RollupEngine(path=None)
+    idle = IdleTracker(storage=storage, interval=10, idle_threshold=60, source=source,
+                       log_file=str(tmp_path / "idle.log"), rollups=rollups, **kwargs)
+    return idle, source, storage, rollups
+
+
+def test_idle_interval_spans_last_inputs(tmp_path):
+    idle, source, storage, rollups = tracker(tmp_path)
+
+    source.idle = 20
+    assert idle.poll(T0) == 10  # at most interval apart
+    source.idle = 55
+    assert idle.poll(T0 + 35) == 5  # can't turn idle for another 5 s
+    source.idle = 59.8
+    assert idle.poll(T0 + 39.8) == 0.5  # never below min_interval
+    source.idle = 65
+    assert idle.poll(T0 + 45) == 10  # idle: resume only needs noticing within interval
+    assert idle.get_current_idle()[0] == T0 - 20
+
+    source.idle = 3
+    idle.poll(T0 + 200)
+    assert idle.get_current_idle() is None
+    [(event_type, details, ts)] = storage.events
+    assert (event_type, ts, details["duration"]) == ("idle", T0 + 197, 217.0)
+    assert sum(b["idle_seconds"] for _, b in rollups.query("minute", 0, T0 + 300)) == 217.0
+    assert idle.samples == 5
+
+
+def test_idle_in_progress_is_closed_on_stop(tmp_path):
+    idle, source, storage, _ = tracker(tmp_path)
+    source.idle = 120
+    idle.poll(time.time())
+    idle.stop()
+    [(_, details, ts)] = storage.events
+    assert 119 <= details["duration"] <= 121 and ts <= time.time()
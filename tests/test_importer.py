@@ -0,0 +1,108 @@
+"""An interrupted import resumes where it stopped, and nothing is inserted or credited twice."""
+
+import datetime
+import json
+import sqlite3
+
+import pytest
+
+from activity_manager.importer import Importer, import_history, log_files
+from activity_manager.rollups import DAY, RollupEngine
+from activity_manager.storage.segments import LogRotation, SegmentedLog
+from activity_manager.storage.sqlite_storage import SQLiteStorage
+
+LINES = 400
+
+
+class Interrupted(Exception):
+    pass
+
+
+def write_keys(path, first, count):
+    with open(path, "a", encoding="utf-8") as f:
+        for i in range(first, first + count):
+            f.write(json.dumps({"timestamp": f"2026-03-02T09:{i // 60 % 60:02d}:{i % 60:02d}",
+                                "key": f"k{i}"}) + "\n")
+
+
+def imported(tmp_path):
+    with sqlite3.connect(tmp_path / "activity.db") as db:
+        keys = [json.loads(d)["key"] for (d,) in db.execute("SELECT details FROM activity ORDER BY id")]
+    with sqlite3.connect(tmp_path / "rollups.db") as db:
+        (credited,) = db.execute("SELECT SUM(value) FROM rollups WHERE resolution = ? AND metric = 'keys'",
+                                 (DAY,)).fetchone()
+    return keys, credited
+
+
+def run(tmp_path, stop_after=None):
+    importer = Importer(str(tmp_path / "activity.db"), str(tmp_path / "rollups.db"), workers=1, chunk_size=1024)
+
+    def progress(done, total, rows):
+        if done == stop_after:
+            raise Interrupted
+
+    try:
+        return importer.run(log_files(str(tmp_path / "logs")), progress=progress)
+    finally:
+        importer.close()
+
+
+@pytest.fixture
+def logs(tmp_path):
+    (tmp_path / "logs").mkdir()
+    path = tmp_path / "logs" / "keyboard.log"
+    write_keys(path, 0, LINES)
+    return path
+
+
+def test_interrupted_import_resumes(tmp_path, logs):
+    with pytest.raises(Interrupted):
+        run(tmp_path, stop_after=3)
+    keys, _ = imported(tmp_path)
+    assert 0 < len(keys) < LINES
+
+    assert run(tmp_path) == LINES - len(keys)
+    keys, credited = imported(tmp_path)
+    assert sorted(keys) == sorted(f"k{i}" for i in range(LINES))
+    assert credited == LINES
+
+
+def test_import_is_idempotent(tmp_path, logs):
+    assert import_history(str(tmp_path / "logs"), str(tmp_path / "activity.db"), str(tmp_path / "rollups.db"),
+                          workers=1) == (LINES, 0)
+    assert run(tmp_path) == 0
+
+    # New lines are picked up alone, also after the log was sealed and compressed
+    write_keys(logs, LINES, 10)
+    rotation = LogRotation(max_bytes=None, max_age=None, retention_days=None)
+    log = SegmentedLog(str(logs), rotation)
+    log.seal()
+    log.close()
+    log.compress_segment(rotation.queue.get_nowait()[1])
+    assert [path.endswith(".gz") for path, _ in log_files(str(tmp_path / "logs"))] == [True, False]
+
+    assert run(tmp_path) == 10
+    assert run(tmp_path) == 0
+    keys, credited = imported(tmp_path)
+    assert len(keys) == len(set(keys)) == LINES + 10
+    assert credited == LINES + 10
+
+
+def test_events_live_capture_holds_are_not_imported_again(tmp_path, logs):
+    # Live capture started at line 300: its rows and rollups already hold lines 300-399
+    live = datetime.datetime.fromisoformat("2026-03-02T09:05:00").timestamp()
+    engine = RollupEngine(str(tmp_path / "rollups.db"))
+    storage = SQLiteStorage(str(tmp_path / "activity.db"))
+    for i in range(300, LINES):
+        engine.add("keys", live + i - 300)
+        storage.log_event("key", {"key": f"k{i}"}, datetime.datetime.fromtimestamp(live + i - 300).isoformat())
+    engine.close()
+    storage.close()
+
+    assert run(tmp_path) == 300
+    keys, credited = imported(tmp_path)
+    assert sorted(keys) == sorted(f"k{i}" for i in range(LINES))
+    assert credited == LINES
+
+    write_keys(logs, LINES, 10)  # captured live as well
+    assert run(tmp_path) == 0
@@ -0,0 +1,92 @@
+"""Trackers and optional features are imported on first use, and a pipeline flush makes queued events readable."""
+
+import json
+import subprocess
+import sys
+import time
+
+import pytest
+
+from activity_manager.storage.event_pipeline import EventPipeline
+from activity_manager.storage.wal_ring import WriteAheadRing
+from activity_manager.tracker_manager import TrackerManager
+from activity_manager.trackers import registry
+
+PLUGIN = '''
+class BeepTracker:
+    def __init__(self, **shared):
+        self.shared = shared
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+'''
+
+
+def test_manager_imports_no_tracker_or_optional_module():
+    code = ("import sys, activity_manager.tracker_manager, activity_manager.daemon;"
+            "print(' '.join(sys.modules))")
+    loaded = set(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                check=True).stdout.split())
+    assert "activity_manager.tracker_manager" in loaded
+    lazy = [module for module, _ in registry.TRACKERS.values()] + [
+        "activity_manager.timeline", "activity_manager.charts", "activity_manager.sync",
+        "activity_manager.storage.wal_ring", "cryptography",
+    ]
+    assert loaded.isdisjoint(lazy)
+
+
+def test_plugin_is_imported_on_first_load(tmp_path, monkeypatch):
+    (tmp_path / "beep_plugin.py").write_text(PLUGIN)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(registry, "TRACKERS", dict(registry.TRACKERS))
+
+    registry.register_tracker("beep", "beep_plugin", "BeepTracker")
+    assert "beep" in registry.available_trackers()
+    assert "beep_plugin" not in sys.modules
+
+    tracker = registry.load_tracker("beep")(pipeline=None)
+    assert "beep_plugin" in sys.modules
+    assert tracker.shared == {"pipeline": None}
+    sys.modules.pop("beep_plugin")
+
+    with pytest.raises(ValueError, match="Unknown tracker: 'nope'"):
+        registry.load_tracker("nope")
+
+
+@pytest.mark.parametrize("journaled", [False, True])
+def test_flush_writes_what_was_submitted(tmp_path, journaled):
+    wal = WriteAheadRing(str(tmp_path / "pipeline.wal"), fsync="never") if journaled else None
+    pipeline = EventPipeline(batch_size=10_000, flush_interval=60, wal=wal)
+    assert not pipeline.flush()  # not running
+    pipeline.start()
+    path = str(tmp_path / "activity.log")
+    for i in range(100):
+        pipeline.submit(path, {"i": i})
+
+    assert pipeline.flush(timeout=5)
+    with open(path) as f:
+        assert [json.loads(line)["i"] for line in f] == list(range(100))
+    pipeline.stop()
+
+
+def test_timeline_is_built_on_first_query_with_queued_events(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "logs").mkdir()
+    manager = TrackerManager(storage_path="logs/activity.log", trackers=(), wal_path=None)
+    try:
+        now = time.time()
+        manager.storage.log_event("app_session", {"app_name": "Xcode", "bundle_id": "x", "start": now - 60,
+                                                  "end": now - 1, "duration": 59}, now - 1)
+        manager.storage.log_event("key", {"key": "a"}, now - 30)  # both still queued in the pipeline
+        assert manager.timeline is None
+
+        sessions = manager.get_timeline(hours=1)
+        assert [(s["app"], s["inputs"]) for s in sessions] == [("Xcode", 1)]
+        manager.storage.log_event("key", {"key": "b"})  # fed live from now on
+        assert manager.get_app_activity(hours=1)["Xcode"]["inputs"] == 1
+        assert manager.timeline.inputs.count(now, time.time() + 1) == 1
+    finally:
+        manager.close()
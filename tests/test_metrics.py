@@ -0,0 +1,57 @@
+"""MetricsRegistry counts, times and exports without locks or surprises."""
+
+import json
+
+import pytest
+
+from activity_manager.metrics import LatencyHistogram, MetricsRegistry
+
+
+def test_histogram_percentiles_are_bucket_midpoints():
+    histogram = LatencyHistogram()
+    for ns in [1000] * 98 + [1_000_000, 3_000_000]:
+        histogram.add(ns)
+    assert histogram.percentile(50) == 3 * 2 ** 8  # 1000 ns lands in [512, 1024)
+    assert histogram.percentile(99) == 3 * 2 ** 18  # 1 ms lands in [2**19, 2**20)
+    assert histogram.percentile(100) == 3_000_000  # capped at the largest observation
+    assert histogram.summary() == {"count": 100, "mean_us": 40.98, "p50_us": 0.77, "p99_us": 786.43,
+                                   "max_us": 3000.0}
+    assert LatencyHistogram().summary()["p99_us"] == 0.0
+
+
+def test_snapshot_reads_counters_rates_gauges_and_latencies():
+    metrics = MetricsRegistry(path=None)
+    metrics.count("events.key")
+    metrics.count("events.key", 4)
+    metrics.gauge("queue.depth", lambda: 7)
+    metrics.gauge("broken", lambda: 1 / 0)
+
+    def handler(fail):
+        if fail:
+            raise ValueError
+        return "done"
+
+    timed = metrics.timed("callback.handler", handler)
+    assert timed(False) == "done"
+    with pytest.raises(ValueError):
+        timed(True)  # still observed
+
+    metrics._rate_time -= 2.0  # two seconds since the previous rate update
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"events.key": 5}
+    assert 2.0 <= snapshot["rates"]["events.key"] <= 2.5
+    assert snapshot["gauges"] == {"queue.depth": 7, "broken": "error: division by zero"}
+    assert snapshot["latency"]["callback.handler"]["count"] == 2
+
+    metrics.count("events.key", 10)
+    assert metrics.snapshot()["rates"]["events.key"] == snapshot["rates"]["events.key"]  # under a second later
+
+
+def test_stop_exports_a_final_snapshot(tmp_path):
+    path = tmp_path / "metrics.json"
+    metrics = MetricsRegistry(path=str(path), interval=3600)
+    metrics.start()
+    metrics.count("events.click", 3)
+    metrics.stop()
+    assert json.loads(path.read_text())["counters"] == {"events.click": 3}
+    assert [p.name for p in tmp_path.iterdir()] == ["metrics.json"]  # replaced, no temporary left over
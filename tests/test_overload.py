@@ -0,0 +1,42 @@
+"""Coalescing keeps exact counts, and records the full pipeline refuses are counted as dropped."""
+
+from activity_manager.storage.event_pipeline import EventPipeline
+from activity_manager.trackers.event_source import CLICK, KEY_REPEAT, SCROLL, SyntheticEventSource
+from activity_manager.trackers.keyboard_tracker import KeyboardTracker
+from activity_manager.trackers.mouse_tracker import MouseTracker
+from activity_manager.trackers.overload import COALESCE, RECORD, Coalescer, OverloadPolicy
+
+
+def test_coalesce_counts_every_event():
+    coalescer = Coalescer(OverloadPolicy(COALESCE, interval=1.0))
+    records = []
+    for i in range(25):
+        ts = i * 0.1
+        count = coalescer.roll(ts)
+        if count:
+            records.append(count)
+        assert not coalescer.admit(ts)
+    records.append(coalescer.take())
+    assert records == [10, 10, 5]
+    assert coalescer.get_stats() == {"recorded": 0, "coalesced": 25, "dropped": 0}
+
+
+def test_refused_records_are_counted_as_dropped(tmp_path):
+    path = lambda name: str(tmp_path / name)  # noqa: E731
+    pipeline = EventPipeline(max_queue=3)  # never started: the queue fills after three records
+    source = SyntheticEventSource(count=0)
+    policies = {kind: OverloadPolicy(RECORD) for kind in (CLICK, SCROLL, KEY_REPEAT)}
+    keyboard = KeyboardTracker(log_file=path("keyboard.log"), summary_file=path("summary.log"),
+                               metrics_file=path("typing.log"), pipeline=pipeline, source=source,
+                               policies=policies)
+    mouse = MouseTracker(log_file=path("mouse.log"), pipeline=pipeline, source=source, policies=policies)
+    keyboard.start()
+    mouse.start()
+    for i in range(4):
+        source.emit(CLICK, (10.0, 20.0), 1000.0 + i)
+    for i in range(2):
+        source.emit(KEY_REPEAT, 0, 1010.0 + i)
+
+    assert mouse.get_overload_stats()[CLICK] == {"recorded": 4, "coalesced": 0, "dropped": 1}
+    assert keyboard.get_overload_stats()[KEY_REPEAT] == {"recorded": 2, "coalesced": 0, "dropped": 2}
+    assert pipeline.dropped == 3
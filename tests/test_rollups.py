@@ -0,0 +1,67 @@
+"""Rollup buckets add up at every resolution, and every changed row gets a new change sequence number."""
+
+import sqlite3
+import time
+
+from activity_manager.rollups import DAY, HOUR, MINUTE, RollupEngine, day_start
+
+NOW = int(time.time())
+HOUR_START = NOW - NOW % 3600 - 3600  # the previous hour: recent enough for every resolution
+
+
+def seqs(path):
+    with sqlite3.connect(path) as conn:
+        return {(resolution, bucket, metric): (value, seq) for resolution, bucket, metric, value, seq
+                in conn.execute("SELECT resolution, bucket, metric, value, seq FROM rollups")}
+
+
+def test_events_and_intervals_fill_every_resolution():
+    rollups = RollupEngine(path=None)
+    t = HOUR_START + 59
+    rollups.add("keys", t)
+    rollups.add("keys", t + 2, 3)  # next minute
+    rollups.add_interval("idle_seconds", t + 0.5, t + 61.5)  # spans three minutes
+    rollups.add_app_time("Xcode", t, t + 30)
+
+    assert rollups.query(MINUTE, HOUR_START, HOUR_START + 3600) == [
+        (HOUR_START, {"keys": 1, "idle_seconds": 0.5, "app:Xcode": 1}),
+        (HOUR_START + 60, {"keys": 3, "idle_seconds": 60.0, "app:Xcode": 29}),
+        (HOUR_START + 120, {"idle_seconds": 0.5}),
+    ]
+    assert rollups.query(HOUR, HOUR_START, HOUR_START + 1) == [
+        (HOUR_START, {"keys": 4, "idle_seconds": 61.0, "app:Xcode": 30})]
+    assert rollups.query(DAY, 0, NOW + 1)[-1][0] == day_start(HOUR_START)
+
+    totals = rollups.totals(hours=2, now=HOUR_START + 3600)
+    assert (totals["keys"], totals["idle_seconds"], totals["apps"]) == (4, 61.0, {"Xcode": 30})
+    assert rollups.totals(hours=1, now=HOUR_START + 3600)["keys"] == 0  # only the current hour
+    assert rollups.totals(days=1, now=HOUR_START)["keys"] == 4
+
+
+def test_changed_rows_get_new_sequence_numbers(tmp_path):
+    path = str(tmp_path / "rollups.db")
+    rollups = RollupEngine(path=path)
+    rollups.add("keys", HOUR_START)
+    rollups.add("clicks", HOUR_START)
+    rollups.flush()
+    first = seqs(path)
+    assert len(first) == 6  # two metrics at three resolutions
+    assert sorted(seq for _, seq in first.values()) == list(range(1, 7))
+
+    rollups.add("keys", HOUR_START + 1)
+    rollups.flush()  # the clicks buckets are dirty too but unchanged
+    second = seqs(path)
+    for key, (value, seq) in second.items():
+        if key[2] == "clicks":
+            assert (value, seq) == first[key]
+        else:
+            assert value == 2 and seq > 6
+    rollups.close()
+
+    # Written by a fresh engine (another process, say), the counter carries on
+    reopened = RollupEngine(path=path)
+    assert reopened.query(MINUTE, HOUR_START, HOUR_START + 1) == [(HOUR_START, {"keys": 2, "clicks": 1})]
+    reopened.add("scrolls", HOUR_START)
+    reopened.flush()
+    assert min(seq for key, (_, seq) in seqs(path).items() if key[2] == "scrolls") > 9
+    reopened.close()
@@ -0,0 +1,93 @@
+"""Compressed segments stay seekable, and readers survive a segment being compressed under them."""
+
+import datetime
+import gzip
+
+import pytest
+
+from activity_manager.storage.file_storage import FileStorage, query_log
+from activity_manager.storage.segments import (
+    BLOCK_BYTES,
+    LogRotation,
+    open_segment,
+    open_segment_at,
+    open_segment_binary,
+    read_blocks,
+    read_index,
+    segments_between,
+)
+
+T0 = datetime.datetime(2026, 3, 2, 9, 0).timestamp()
+
+
+def iso(ts):
+    return datetime.datetime.fromtimestamp(ts).isoformat()
+
+
+@pytest.fixture
+def sealed(tmp_path):
+    """A file log with one sealed, not yet compressed segment of ~3 hours of events, one per second."""
+    path = str(tmp_path / "activity.log")
+    rotation = LogRotation(max_bytes=None, max_age=None, retention_days=None)  # never started: compressed by hand
+    storage = FileStorage(path, rotation=rotation)
+    for minute in range(180):
+        storage.log_events([(iso(T0 + minute * 60 + s), "key", {"key": "a"}) for s in range(60)])
+    storage.log.seal()
+    storage.close()
+    log, entry = rotation.queue.get_nowait()
+    return path, log, entry
+
+
+def query(path, lo, hi):
+    return list(query_log(path, iso(T0 + lo), iso(T0 + hi)))
+
+
+def test_compressed_segment_is_seekable(sealed):
+    path, log, entry = sealed
+    before = query(path, 5000, 5100)
+    assert [e["time"] for e in before] == [iso(T0 + t) for t in range(5000, 5100)]
+
+    log.compress_segment(entry)
+    segment = segments_between(path)[0]
+    assert segment.endswith(".gz")
+    starts, members = read_blocks(segment)
+    assert len(starts) > 1 and all(b - a >= BLOCK_BYTES for a, b in zip(starts, starts[1:]))
+    with gzip.open(segment, "rb") as f, open_segment_binary(segment) as g:
+        assert f.read() == g.read()  # still one valid (multi-member) gzip file
+
+    # Entering at any index offset reads exactly what the plaintext holds there
+    _, offsets = read_index(segment)
+    with gzip.open(segment, "rb") as f:
+        plain = f.read()
+    for offset in offsets[::17]:
+        with open_segment_at(segment, offset) as f:
+            assert f.readline() == plain[offset:plain.index(b"\n", offset) + 1]
+    assert query(path, 5000, 5100) == before
+
+
+def test_reader_falls_back_to_compressed_segment(sealed):
+    path, log, entry = sealed
+    stale = segments_between(path)[0]  # listed before the compressor replaces it
+    log.compress_segment(entry)
+    assert not stale.endswith(".gz")
+
+    with open_segment(stale) as f:
+        assert f.readline().startswith('{"time": ')
+    with open_segment_binary(stale) as f:
+        assert f.readline().startswith(b'{"time": ')
+    _, offsets = read_index(stale)
+    with open_segment_at(stale, offsets[-1]) as f:
+        assert f.readline().startswith(b'{"time": "' + iso(T0 + 179 * 60).encode())
+
+
+@pytest.mark.parametrize("retention_days, kept", [(None, 1), (30, 0)])
+def test_old_segments_are_only_deleted_when_retention_is_set(tmp_path, retention_days, kept):
+    path = str(tmp_path / "activity.log")
+    rotation = LogRotation(retention_days=retention_days) if retention_days else LogRotation()
+    storage = FileStorage(path, rotation=rotation)
+    storage.log_events([(iso(T0 + s), "key", {"key": "a"}) for s in range(60)])  # months ago
+    storage.log.seal()
+    storage.close()
+
+    assert len(segments_between(path)) == kept + 1  # and the new active segment
+    assert len(query(path, 0, 60)) == 60 * kept
@@ -0,0 +1,43 @@
+"""Snapshots are swapped in whole, and their version only moves when the content changed."""
+
+import threading
+
+from activity_manager.snapshot import EMPTY_SNAPSHOT, SnapshotBuffer
+
+
+def snapshot(app, keys=()):
+    return EMPTY_SNAPSHOT._replace(version=-1, active_app=app, last_keys=tuple(keys))
+
+
+def test_publish_swaps_in_changed_snapshots_only():
+    states = iter([snapshot("Xcode"), snapshot("Xcode"), snapshot("Xcode", "ab"), snapshot("Mail")])
+    buffer = SnapshotBuffer(lambda: next(states))
+    assert buffer.get() is EMPTY_SNAPSHOT
+
+    first = buffer.publish()
+    assert buffer.get() is first and first == snapshot("Xcode")._replace(version=1)
+    assert buffer.publish() is first  # unchanged: no swap, same version
+
+    held = buffer.get()  # a reader keeps its snapshot while the next one is published
+    buffer.publish()
+    assert held is first and held.last_keys == ()
+    assert (buffer.get().version, buffer.get().last_keys) == (2, ("a", "b"))
+    assert buffer.publish() == snapshot("Mail")._replace(version=3)
+
+
+def test_publisher_survives_a_failing_build():
+    published = threading.Event()
+    calls = []
+
+    def build():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("tracker gone")
+        published.set()
+        return snapshot("Xcode")
+
+    buffer = SnapshotBuffer(build, interval=0.01)
+    buffer.start()
+    assert published.wait(5)
+    buffer.stop()
+    assert buffer.get().active_app == "Xcode" and not buffer.running
@@ -0,0 +1,153 @@
+"""Every storage backend returns the normalized event shape described in storage_manager."""
+
+import datetime
+import os
+
+import pytest
+
+from activity_manager.storage.binary_storage import (
+    HEADER,
+    MAGIC,
+    RECORD,
+    RECORD_V1,
+    WIDE,
+    BinaryLogReader,
+    BinaryStorage,
+    query_segment,
+)
+from activity_manager.storage.storage_manager import StorageManager, read_events
+
+T0 = datetime.datetime(2026, 3, 2, 9, 0).timestamp()
+
+
+def iso(ts):
+    return datetime.datetime.fromtimestamp(ts).isoformat()
+
+
+def interval(start, end, **details):
+    """Details the way app_tracker / idle_tracker build them."""
+    return {**details, "start": iso(start), "end": iso(end), "duration": round(end - start, 3)}
+
+
+# (ts, type, details) as the trackers log them
+EVENTS = [
+    (T0 + 0.25, "app_switch", {"app_name": "Xcode", "bundle_id": "com.apple.dt.Xcode"}),
+    (T0 + 1.5, "key", {"key": "a"}),
+    (T0 + 2.0, "key", {"key": "Key.backspace", "count": 14}),
+    (T0 + 3.125, "click", {"x": 512.5, "y": 300.0}),
+    (T0 + 3.5, "click", {"x": 0.0, "y": 0.0, "count": 9}),
+    (T0 + 4.0, "scroll", {"x": None, "y": None}),
+    (T0 + 5.0, "mouse_moves", {"count": 230}),
+    (T0 + 61.75, "idle", interval(T0 + 6.123456, T0 + 61.75)),
+    (T0 + 90.5, "app_session", interval(T0 + 0.25, T0 + 90.5, app_name="Xcode", bundle_id="com.apple.dt.Xcode")),
+    (T0 + 91.0, "app_session", interval(T0 + 90.5, T0 + 91.0, app_name="Finder", bundle_id=None)),
+    (T0 + 120.0, "typing", {"minute": iso(T0 + 60)[:16], "keys": 212, "bursts": 3, "burst_keys": 180,
+                            "burst_seconds": 41.2, "pauses": 4, "pause_seconds": 17.9,
+                            "intervals": [[20, 31], [21, 64]], "apps": {"Xcode": 212}}),
+]
+
+
+def expected():
+    return [{"time": iso(ts), "type": kind, "details": details} for ts, kind, details in EVENTS]
+
+
+@pytest.fixture(params=[("file", "activity.log"), ("sqlite", "activity.db"), ("binary", "activity.bin")])
+def backend(request, tmp_path):
+    mode, name = request.param
+    path = str(tmp_path / name)
+    storage = StorageManager(mode=mode, path=path)
+    for ts, kind, details in EVENTS:
+        storage.log_event(kind, details, ts)
+    storage.flush()
+    yield mode, path, storage
+    storage.close()
+
+
+def test_query_round_trips_details(backend):
+    _, _, storage = backend
+    assert list(storage.query(T0, T0 + 3600)) == expected()
+
+
+def test_read_events_round_trips_details(backend):
+    mode, path, _ = backend
+    assert list(read_events(mode, path, T0, T0 + 3600)) == expected()
+
+
+def test_read_events_filters_types(backend):
+    mode, path, _ = backend
+    events = list(read_events(mode, path, T0, T0 + 3600, types=("idle", "app_session")))
+    assert events == [e for e in expected() if e["type"] in ("idle", "app_session")]
+
+
+@pytest.mark.parametrize("mode, name", [("file", "activity.log"), ("binary", "activity.bin")])
+def test_late_records_are_found_at_window_edges(tmp_path, mode, name):
+    # The idle poll notices the return after later keys were logged: the idle record,
+    # timed at the last input, is written after them
+    storage = StorageManager(mode=mode, path=str(tmp_path / name))
+    for t in range(0, 640, 5):
+        storage.log_event("key", {"key": "a"}, T0 + t)
+    storage.log_event("idle", interval(T0 + 100, T0 + 595), T0 + 595)
+    for t in range(640, 1200, 5):
+        storage.log_event("key", {"key": "a"}, T0 + t)
+    storage.log_event("idle", interval(T0 + 1150, T0 + 1170), T0 + 1170)
+    storage.flush()
+
+    windows = [(T0 + 590, T0 + 596), (T0 + 595, T0 + 700), (T0 + 1165, T0 + 1171), (T0, T0 + 1200)]
+    for lo, hi in windows:
+        idle = [e["details"]["end"] for e in storage.query(lo, hi, types=("idle",))]
+        assert idle == [iso(t) for t in (T0 + 595, T0 + 1170) if lo <= t < hi]
+    storage.close()
+
+
+def test_version_1_segment_stays_readable(tmp_path):
+    path = str(tmp_path / "old.bin")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 1, RECORD_V1.size))
+    storage = BinaryStorage(path)
+    storage.log_event("key", {"key": "a", "count": 3}, iso(T0))
+    storage.log_event("idle", interval(T0, T0 + 30), iso(T0 + 30))
+    storage.close()
+
+    assert (os.path.getsize(path) - HEADER.size) == 2 * RECORD_V1.size  # appended in the file's format
+    assert list(query_segment(path, iso(T0), iso(T0 + 60))) == [
+        {"time": iso(T0), "type": "key", "details": {"key": "a", "count": 3}},
+        {"time": iso(T0 + 30), "type": "idle", "details": interval(T0, T0 + 30)},
+    ]
+
+
+def test_binary_records_stay_small_and_exact(tmp_path):
+    path = str(tmp_path / "activity.bin")
+    storage = BinaryStorage(path)
+    events = [(T0 + i * 0.1, "key", {"key": f"k{i}"}) for i in range(300)]  # ids past one byte
+    events += [
+        (T0 + 5000, "key", {"key": "k1", "count": 3}),  # a new time base, over 71 minutes on
+        (T0 + 5001, "typing", {"minute": "2026-03-02T10:23", "keys": 1, "bursts": 0, "burst_keys": 0,
+                               "burst_seconds": 1.234, "pauses": 0, "pause_seconds": 0.0,
+                               "intervals": [], "apps": {}}),  # not rounded like TypingMetrics: kept whole
+        (T0 + 5002, "switch", {"app_name": "Mail", "pid": 7}),
+    ]
+    storage.log_events(events[:150])
+    storage.log_events(events[150:])
+    storage.close()
+
+    assert os.path.getsize(path) == HEADER.size + len(events) * RECORD.size
+    reader = BinaryLogReader(path)
+    assert reader[299][1] >= WIDE and reader.bisect(int((T0 + 5000) * 1e9)) == 300
+    reader.close()
+    assert list(query_segment(path, iso(T0), iso(T0 + 6000))) == [
+        {"time": iso(ts), "type": kind, "details": details} for ts, kind, details in events]
+
+
+def test_binary_entries_of_lost_records_are_dropped(tmp_path):
+    path = str(tmp_path / "activity.bin")
+    storage = BinaryStorage(path)
+    storage.log_event("key", {"key": "a"}, T0)
+    storage.log_event("key", {"key": "b", "count": 5}, T0 + 1)
+    storage.close()
+    # A crash after the batch's extras were written, before its record was
+    os.truncate(path, os.path.getsize(path) - RECORD.size)
+
+    storage = BinaryStorage(path)
+    storage.log_event("key", {"key": "c"}, T0 + 2)
+    storage.close()
+    assert [e["details"] for e in query_segment(path, iso(T0), iso(T0 + 60))] == [{"key": "a"}, {"key": "c"}]
@@ -0,0 +1,139 @@
+"""Syncs ship only what changed, a collector applying a batch twice or late changes nothing, and failed posts back off."""
+
+import datetime
+import json
+import socket
+import threading
+import time
+import zlib
+
+import pytest
+
+from activity_manager import sync
+from activity_manager.collector import Collector, serve
+from activity_manager.rollups import RollupEngine, day_start
+from activity_manager.storage.file_storage import FileStorage
+from activity_manager.sync import SyncClient, SyncError
+
+NOW = int(time.time())
+T0 = NOW - NOW % 3600 - 3600  # recent enough for the rollups to keep its minute buckets
+
+
+def iso(ts):
+    return datetime.datetime.fromtimestamp(ts).isoformat()
+
+
+@pytest.fixture
+def collector(tmp_path):
+    """A collector serving on a free localhost port: (collector, url)."""
+    collector = Collector(str(tmp_path / "collector.db"))
+    server = serve(collector, port=0, token="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield collector, f"http://127.0.0.1:{server.server_address[1]}/sync"
+    server.shutdown()
+    server.server_close()
+    collector.close()
+
+
+@pytest.fixture
+def device(tmp_path):
+    """Rollups and stored sessions for one device: (rollups, storage, client options)."""
+    rollups = RollupEngine(path=str(tmp_path / "rollups.db"))
+    storage = FileStorage(str(tmp_path / "activity.log"))
+    options = {"rollups_path": rollups.path, "storage_path": storage.path, "token": "secret",
+               "state_path": str(tmp_path / "sync.json"), "lag": 0}
+    yield rollups, storage, options
+    storage.close()
+    rollups.close()
+
+
+def rows(collector, table):
+    return collector.conn.execute(f"SELECT * FROM {table} ORDER BY 2, 3").fetchall()
+
+
+def log_session(storage, app, start, end):
+    details = {"app_name": app, "bundle_id": app.lower(), "start": iso(start), "end": iso(end),
+               "duration": end - start}
+    storage.log_event("app_session", details, iso(end))
+
+
+def test_sync_sends_deltas_and_resends_are_idempotent(collector, device, monkeypatch):
+    collector, url = collector
+    rollups, storage, options = device
+    rollups.add("keys", T0, 5)
+    rollups.flush()
+    log_session(storage, "Xcode", T0, T0 + 60)
+    log_session(storage, "Mail", T0 + 60, T0 + 90)
+    client = SyncClient(url, **options)
+
+    # Every batch is posted twice, as if the first reply had been lost
+    post = client._post
+    monkeypatch.setattr(client, "_post", lambda body: (post(body), post(body))[1])
+    assert client.sync_once(now=T0 + 120) == 1
+    rollup_rows = rows(collector, "rollups")
+    assert [row[1:] for row in rollup_rows] == [("day", day_start(T0), "keys", 5.0),
+                                                ("hour", T0, "keys", 5.0), ("minute", T0, "keys", 5.0)]
+    assert [(app, start, end) for _, start, end, app, _ in rows(collector, "sessions")] == [
+        ("Xcode", T0, T0 + 60), ("Mail", T0 + 60, T0 + 90)]
+    assert client.sync_once(now=T0 + 180) == 0  # nothing changed
+
+    rollups.add("keys", T0)
+    rollups.flush()
+    log_session(storage, "Xcode", T0 + 90, T0 + 200)
+    assert client.sync_once(now=T0 + 240) == 1
+    assert client.stats["rows"] == 5 + 4  # the three changed buckets and one new session
+    assert {row[4] for row in rows(collector, "rollups")} == {6.0}
+    assert len(rows(collector, "sessions")) == 3
+    assert collector.devices()[0]["device"] == client.device
+    assert collector.devices()[0]["last_batch"] == 2
+    client.close()
+
+
+def test_stale_batch_is_acknowledged_but_not_applied(collector, device):
+    collector, url = collector
+    rollups, _, options = device
+    rollups.add("keys", T0, 5)
+    rollups.flush()
+    client = SyncClient(url, **options)
+    client.sync_once(now=T0)
+    client.sync_once(now=T0)  # nothing to send
+
+    rollups.add("keys", T0, 5)
+    rollups.flush()
+    client.sync_once(now=T0)  # batch 2
+    stale = {"device": client.device, "batch": 1, "rollups": [["minute", T0, "keys", 5.0]]}
+    assert client._post(zlib.compress(json.dumps(stale).encode())) == {"stale": True}
+    assert ("minute", T0, "keys", 10.0) in [row[1:] for row in rows(collector, "rollups")]
+    client.close()
+
+
+def test_failed_posts_back_off_and_keep_the_checkpoint(collector, device, monkeypatch):
+    collector, url = collector
+    rollups, _, options = device
+    rollups.add("keys", T0)
+    rollups.flush()
+
+    with socket.socket() as s:  # a port nobody listens on
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = SyncClient(f"http://127.0.0.1:{port}/sync", retries=4, backoff=0.5, max_backoff=1.5, **options)
+    delays = []
+    monkeypatch.setattr(sync.random, "uniform", lambda lo, hi: hi)
+    monkeypatch.setattr(client._stop, "wait", lambda delay: delays.append(delay))
+    with pytest.raises(SyncError, match="unreachable"):
+        client.sync_once(now=T0)
+    assert delays == [0.5, 1.0, 1.5]
+    assert (client.stats["retries"], client.stats["failures"]) == (4, 1)
+    assert client.state["seq"] == -1 and client.state["batch"] == 0
+
+    client.token = "wrong"  # client errors aren't retried
+    client.url = url
+    with pytest.raises(SyncError, match="HTTP 401"):
+        client.sync_once(now=T0)
+    assert len(delays) == 3
+
+    client.token = "secret"
+    assert client.sync_once(now=T0) == 1
+    assert len(rows(collector, "rollups")) == 3
+    client.close()
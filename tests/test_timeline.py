@@ -0,0 +1,56 @@
+"""Timeline queries join sessions, idle and input, whatever order the input arrives in."""
+
+from activity_manager import timeline
+from activity_manager.timeline import CountIndex, Timeline
+
+T0 = 1_772_442_000.0
+
+
+def session(app, start, end):
+    return "app_session", {"app_name": app, "start": T0 + start, "end": T0 + end}, T0 + end
+
+
+def test_sessions_split_active_and_idle():
+    tl = Timeline()
+    tl.add_event(*session("Xcode", 0, 600))
+    tl.add_event("idle", {"start": T0 + 100, "end": T0 + 400}, T0 + 400)
+    tl.add_event(*session("Mail", 600, 900))
+    for t in (10, 20, 700):
+        tl.add_event("key", {"key": "a"}, T0 + t)
+    tl.add_event("key", {"key": "a", "count": 5}, T0 + 710)  # collapsed auto-repeats
+
+    assert tl.get_sessions(T0 + 300, T0 + 800) == [
+        {"app": "Xcode", "start": T0 + 300, "end": T0 + 600, "active": 200.0, "idle": 100.0, "inputs": 0},
+        {"app": "Mail", "start": T0 + 600, "end": T0 + 800, "active": 200.0, "idle": 0.0, "inputs": 6},
+    ]
+    activity = tl.get_app_activity(T0, T0 + 900, open_session=("Safari", T0 + 900, T0 + 960))
+    assert list(activity) == ["Xcode", "Mail"]
+    assert activity["Xcode"] == {"active": 300.0, "idle": 300.0, "sessions": 1, "inputs": 2, "inputs_per_min": 0.4}
+    assert activity["Mail"]["inputs"] == 6
+    assert "Safari" not in activity  # open session is outside the window
+
+
+def test_out_of_order_input_is_counted():
+    tl = Timeline()
+    tl.add_event(*session("Xcode", 0, 60))
+    tl.add_event("key", {"key": "a"}, T0 + 30)
+    tl.add_event("click", {"x": 1, "y": 2, "count": 4}, T0 + 10)  # coalesced, stamped at its last click
+    tl.add_event("scroll", {"x": 1, "y": 2}, T0 + 30.5)
+    tl.add_event("key", {"key": "b"}, T0 + 5)
+    assert tl.get_sessions(T0, T0 + 60)[0]["inputs"] == 7
+    assert tl.inputs.count(T0, T0 + 11) == 5
+    assert tl.inputs.count(T0 + 11, T0 + 60) == 2
+
+    tl.load([{"time": T0 + 20, "type": "key", "details": {"key": "c"}}])
+    assert tl.get_sessions(T0, T0 + 60)[0]["inputs"] == 8
+
+
+def test_late_counts_fold_into_the_index(monkeypatch):
+    monkeypatch.setattr(timeline, "LATE_FOLD", 8)
+    index = CountIndex()
+    index.add(T0 + 100)
+    for t in range(20):
+        index.add(T0 + t, 2)  # all earlier than the newest second
+        assert index.count(T0, T0 + 101) == 1 + 2 * (t + 1)
+    assert len(index.seconds) > 1 and len(index._late) < 8
+    assert index.count(T0 + 5, T0 + 10) == 10
@@ -0,0 +1,159 @@
+"""Records journaled in the write-ahead ring survive crashes and are only released once durable."""
+
+import datetime
+import json
+import time
+
+from activity_manager.storage.event_pipeline import EventPipeline
+from activity_manager.storage.wal_ring import HEADER_SIZE, RECORD, WriteAheadRing
+from activity_manager.trackers.event_source import KEY, MOVE, SyntheticEventSource
+from activity_manager.trackers.keyboard_tracker import KeyboardTracker
+from activity_manager.trackers.mouse_tracker import MouseTracker
+
+
+def crash(ring):
+    """Drop the mapping without applying or advancing anything, as a killed process would."""
+    ring.mm.flush()
+    ring.mm.close()
+
+
+def test_replay_stops_at_torn_write(tmp_path):
+    wal_path = str(tmp_path / "pipeline.wal")
+    log_path = str(tmp_path / "keyboard.log")
+    ring = WriteAheadRing(wal_path, capacity=64 * 1024, fsync="never")
+    pipeline = EventPipeline(wal=ring)  # never started: records stay in the ring
+    for i in range(3):
+        torn = ring.head
+        assert pipeline.submit(log_path, {"key": i})
+    crash(ring)
+
+    # The third record's payload was only partly copied when the process died
+    with open(wal_path, "r+b") as f:
+        f.seek(HEADER_SIZE + torn + RECORD.size + 2)
+        f.write(b"\xff\xff")
+
+    ring = WriteAheadRing(wal_path, fsync="never")
+    assert ring.recovered == 2
+    assert ring.head == torn
+    pipeline = EventPipeline(wal=ring)
+    pipeline.start()
+    pipeline.submit(log_path, {"key": 3})  # overwrites the torn record
+    pipeline.stop()
+
+    with open(log_path, encoding="utf-8") as f:
+        assert [json.loads(line)["key"] for line in f] == [0, 1, 3]
+    assert WriteAheadRing(wal_path, fsync="never").recovered == 0
+
+
+def test_unknown_backend_is_dropped_not_replayed_twice(tmp_path):
+    class Sink:
+        def __init__(self):
+            self.records = []
+
+        def log_events(self, records):
+            self.records.extend(records)
+
+    wal_path = str(tmp_path / "pipeline.wal")
+    ring = WriteAheadRing(wal_path, capacity=64 * 1024, fsync="never")
+    pipeline = EventPipeline(wal=ring)
+    kept, gone = Sink(), Sink()
+    pipeline.register(kept, "Sink")
+    pipeline.register(gone, "Gone")
+    pipeline.submit(kept, ("2026-03-02T09:00:00", "key", {"key": "a"}))
+    pipeline.submit(gone, ("2026-03-02T09:00:01", "key", {"key": "b"}))
+    crash(ring)
+
+    sink = Sink()
+    pipeline = EventPipeline(wal=WriteAheadRing(wal_path, fsync="never"))
+    pipeline.register(sink, "Sink")  # "Gone" was not registered again before start()
+    pipeline.start()
+    pipeline.stop()
+
+    assert sink.records == [("2026-03-02T09:00:00", "key", {"key": "a"})]
+    assert pipeline.dropped == 1
+    assert WriteAheadRing(wal_path, fsync="never").recovered == 0
+
+
+class SyncedSink:
+    def __init__(self, fail=False):
+        self.records = []
+        self.syncs = 0
+        self.fail = fail
+
+    def log_events(self, records):
+        self.records.extend(records)
+
+    def sync(self):
+        if self.fail:
+            raise OSError("disk gone")
+        self.syncs += 1
+
+
+def test_tail_waits_for_durable_storage(tmp_path):
+    wal_path = str(tmp_path / "pipeline.wal")
+    records = [(f"2026-03-02T09:00:0{i}", "key", {"key": "a"}) for i in range(3)]
+
+    sink = SyncedSink(fail=True)
+    pipeline = EventPipeline(wal=WriteAheadRing(wal_path, capacity=64 * 1024, fsync="batch"))
+    pipeline.register(sink, "storage")
+    pipeline.start()
+    for record in records:
+        pipeline.submit(sink, record)
+    pipeline.stop()
+    assert sink.records == records  # applied, but never made durable: kept in the ring
+
+    sink = SyncedSink()
+    pipeline = EventPipeline(wal=WriteAheadRing(wal_path, fsync="batch"))
+    pipeline.register(sink, "storage")
+    pipeline.start()
+    pipeline.stop()
+    assert sink.records == records and sink.syncs >= 1
+    assert WriteAheadRing(wal_path, fsync="batch").recovered == 0
+
+
+def test_file_targets_are_synced_before_the_tail_advances(tmp_path):
+    wal_path = str(tmp_path / "pipeline.wal")
+    ring = WriteAheadRing(wal_path, capacity=64 * 1024, fsync="interval", fsync_interval=3600)
+    pipeline = EventPipeline(wal=ring, flush_interval=0.01)
+    pipeline.start()
+    pipeline.submit(str(tmp_path / "mouse.log"), {"event": "click"})
+    for _ in range(100):
+        if ring.applied > ring.tail:
+            break
+        time.sleep(0.01)
+    assert ring.applied > ring.tail  # written, but no checkpoint is due for an hour
+    pipeline.stop()
+    assert ring.tail == ring.applied == ring.head
+
+
+def test_buffered_tracker_state_is_flushed_without_new_events(tmp_path):
+    pipeline = EventPipeline(flush_interval=0.01)
+    source = SyntheticEventSource(count=0)
+    mouse = MouseTracker(log_file=str(tmp_path / "mouse.log"), flush_interval=0.05,
+                         pipeline=pipeline, source=source)
+    keyboard = KeyboardTracker(log_file=str(tmp_path / "keyboard.log"), flush_interval=0.05,
+                               summary_file=str(tmp_path / "summary.log"), pipeline=pipeline, source=source)
+    pipeline.start()
+    mouse.start()
+    keyboard.start()
+    now = time.time()
+    for i in range(5):
+        source.emit(MOVE, (i, i), now)
+    source.emit(KEY, 0, now)  # "a"
+
+    def written(name):
+        try:
+            with open(tmp_path / name, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    deadline = time.monotonic() + 5
+    while not (written("mouse.log") and written("summary.log")) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert json.loads(written("mouse.log")) == {"ts": datetime.datetime.fromtimestamp(now).isoformat(),
+                                                  "event": "mouse_moves", "count": 5}
+    assert written("summary.log").strip() == "a"
+    mouse.stop()
+    keyboard.stop()
+    pipeline.stop()